@@ -0,0 +1,483 @@
+"""
+Precomputed Adjacency Graph of Neighbouring Ahupuaa
+
+The map app and analytics keep asking which ahupuaa border a given one, and
+which features lie on a moku's border. Answering that at runtime means pulling
+geometries and testing every pair. This module builds the adjacency graph once
+during the import pass instead, without pairwise geometry tests:
+
+  - segment matching: ahupuaa in the source layer share boundary vertices
+    exactly, so every boundary segment is keyed by its rounded end points.
+    All segments are sorted together once, and a segment used by two features
+    makes them neighbours, with its length added to their shared border. This
+    finds almost every neighbour.
+  - MBR sweep with vertex matching: features are swept in order of their west
+    edge, and only pairs whose bounding boxes overlap are compared. Pairs that
+    share no segment but do share vertices are neighbours too. This covers
+    borders where one side has extra vertices (T-junctions), with the length
+    taken from the segments whose end points both lie on the other feature,
+    and features that touch at a single corner (shared length 0).
+
+Both steps are O(n log n) sorts, and each feature is compared only with the
+few features whose boxes overlap its own. During the pass the builder keeps
+each feature's rounded vertices as 8-byte integer keys (read straight from
+PackedGeometry arrays), and it drops them once the graph is built.
+
+The graph is stored as one item per moku, next to the aggregate items:
+  - ADJACENCY#MOKU / MOKUPUNI#<mokupuni>#MOKU#<moku>
+Each item maps every AhupuaaPK in the moku to its neighbours and shared
+border lengths in metres, lists the moku's border features (those with a
+neighbour in another moku) and totals the border shared with each
+neighbouring moku. A feature's neighbours are one GetItem using the
+MokupuniName and MokuName on its item.
+
+A moku whose item would outgrow the chunking threshold keeps its border
+summary in the item and spreads the Features map over part items, placing
+each feature by a CRC-32 of its AhupuaaPK:
+  - ADJACENCY#MOKU / MOKUPUNI#<mokupuni>#MOKU#<moku>#PART#0000
+The moku item records FeaturePartCount, so a reader needs one more GetItem.
+
+Usage:
+  python adjacency.py ahupuaa.geojson -o adjacency.json
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import math
+import zlib
+
+import numpy as np
+
+from capacity_planner import ITEM_SIZE_LIMIT, item_size
+from geojson_transform import format_hierarchical_key, iter_features
+from hierarchy_aggregates import VERTEX_PRECISION, pack_vertices, ring_edges, unpack_vertices
+from item_chunking import CHUNK_THRESHOLD_BYTES
+
+logger = logging.getLogger(__name__)
+
+ADJACENCY_MOKU_PK = 'ADJACENCY#MOKU'
+EARTH_RADIUS_METERS = 6371008.8
+SWEEP_TOLERANCE = 10 ** -VERTEX_PRECISION  # Boxes closer than this still count as overlapping
+
+
+def format_feature_part_sk(moku_key, part_index):
+    """
+    Formats the sort key of an adjacency part item.
+
+    Args:
+        moku_key: HierarchySK of the moku
+        part_index: Zero-based part number
+
+    Returns:
+        str: Part sort key
+    """
+    return f"{moku_key}#PART#{part_index:04d}"
+
+
+def feature_part_index(ahupuaa_pk, part_count):
+    """
+    Returns the adjacency part holding a feature's neighbours.
+
+    Args:
+        ahupuaa_pk: AhupuaaPK of the feature
+        part_count: Number of parts the moku's features are spread over
+
+    Returns:
+        int: Zero-based part number
+    """
+    return zlib.crc32(ahupuaa_pk.encode('utf-8')) % part_count
+
+
+def split_adjacency_item(item, threshold=CHUNK_THRESHOLD_BYTES):
+    """
+    Moves the Features map of an oversized adjacency item into part items.
+
+    Args:
+        item: Adjacency item in low-level attribute format
+        threshold: Item size in bytes above which the item is split
+
+    Returns:
+        list: [item] when it fits, otherwise [head, part, part, ...]
+    """
+    size = item_size(item)
+    if size <= threshold:
+        return [item]
+
+    head = dict(item)
+    feature_map = head.pop('Features')['M']
+    moku_key = item['HierarchySK']['S']
+
+    part_count = max(2, math.ceil(size / threshold))
+    while True:
+        maps = [{} for _ in range(part_count)]
+        for pk, neighbours in feature_map.items():
+            maps[feature_part_index(pk, part_count)][pk] = neighbours
+        parts = [
+            {
+                'AhupuaaPK': item['AhupuaaPK'],
+                'HierarchySK': {'S': format_feature_part_sk(moku_key, part_index)},
+                'ItemType': {'S': 'AdjacencyPart'},
+                'Features': {'M': part_map},
+                'Metadata': item['Metadata']
+            }
+            for part_index, part_map in enumerate(maps)
+        ]
+        largest = max(item_size(part) for part in parts)
+        # Hashing can leave one part heavier than the rest; spread thinner until all fit
+        if largest <= threshold or part_count >= len(feature_map):
+            break
+        part_count *= 2
+
+    if largest > ITEM_SIZE_LIMIT:
+        logger.warning(
+            f"Adjacency part of {moku_key} is still {largest} bytes after splitting")
+
+    head['FeaturePartCount'] = {'N': str(part_count)}
+    logger.info(
+        f"Split adjacency item for {moku_key} ({size} bytes) into {part_count} feature parts")
+
+    return [head] + parts
+
+
+def segment_length(a, b):
+    """
+    Returns the great-circle length of a segment.
+
+    Args:
+        a: (lng, lat) start point
+        b: (lng, lat) end point
+
+    Returns:
+        float: Length in metres
+    """
+    lng1, lat1, lng2, lat2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(h)))
+
+
+def segment_lengths(starts, stops):
+    """
+    Returns the great-circle lengths of segments given as vertex keys.
+
+    Args:
+        starts: int64 array of start vertex keys
+        stops: int64 array of end vertex keys
+
+    Returns:
+        numpy.ndarray: Lengths in metres
+    """
+    lng1, lat1 = map(np.radians, unpack_vertices(starts))
+    lng2, lat2 = map(np.radians, unpack_vertices(stops))
+    h = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.minimum(1.0, np.sqrt(h)))
+
+
+def _contains(sorted_keys, keys):
+    found = np.searchsorted(sorted_keys, keys)
+    return sorted_keys[np.minimum(found, len(sorted_keys) - 1)] == keys
+
+
+def _partial_length(feature, vertices):
+    starts, stops = ring_edges(feature['Vertices'], feature['RingEnds'])
+    on_other = _contains(vertices, starts) & _contains(vertices, stops)
+    return float(segment_lengths(starts[on_other], stops[on_other]).sum())
+
+
+class AdjacencyBuilder:
+    """
+    Accumulates feature boundaries during the import pass and builds the adjacency graph.
+    """
+
+    def __init__(self):
+        self.features = []
+        self.shared = {}
+
+    def add(self, feature, item):
+        """
+        Adds one feature's boundary.
+
+        Args:
+            feature: GeoJSON feature as parsed from the source file
+            item: DynamoDB item built for the feature
+        """
+        vertices, ring_ends = pack_vertices(feature.get('geometry'))
+        bounds = None
+        if len(vertices):
+            lngs, lats = unpack_vertices(vertices)
+            bounds = (float(lngs.min()), float(lats.min()), float(lngs.max()), float(lats.max()))
+
+        self.features.append({
+            'AhupuaaPK': item['AhupuaaPK']['S'],
+            'AhupuaaName': item['AhupuaaName']['S'],
+            'MokuKey': format_hierarchical_key(item['MokupuniName']['S'], item['MokuName']['S']),
+            'Mokupuni': item['MokupuniName']['S'],
+            'Moku': item['MokuName']['S'],
+            'Bounds': bounds,
+            'Vertices': vertices,
+            'RingEnds': ring_ends
+        })
+
+    def _match_segments(self):
+        """
+        Finds neighbours that share whole boundary segments.
+
+        Every feature's segments are sorted together, so the features using
+        a segment end up next to each other.
+        """
+        edges = [ring_edges(f['Vertices'], f['RingEnds']) for f in self.features]
+        owners = np.repeat(np.arange(len(edges), dtype=np.int64), [len(e[0]) for e in edges])
+        if not len(owners):
+            return
+        starts = np.concatenate([e[0] for e in edges])
+        stops = np.concatenate([e[1] for e in edges])
+        del edges
+
+        # Reordered one array at a time to keep a single extra copy alive
+        order = np.lexsort((owners, stops, starts))
+        starts = starts[order]
+        stops = stops[order]
+        owners = owners[order]
+        del order
+        shared = np.flatnonzero((starts[1:] == starts[:-1]) & (stops[1:] == stops[:-1]) &
+                                (owners[1:] != owners[:-1]))
+        if not len(shared):
+            return
+
+        # Sum the shared lengths per pair of features, the lower index first
+        pairs = owners[shared] * len(self.features) + owners[shared + 1]
+        pairs, inverse = np.unique(pairs, return_inverse=True)
+        lengths = np.bincount(inverse, weights=segment_lengths(starts[shared], stops[shared]))
+        for pair, length in zip(pairs.tolist(), lengths.tolist()):
+            self.shared[divmod(pair, len(self.features))] = length
+
+    def _sweep(self):
+        """
+        Finds neighbours that share vertices but no whole segment.
+
+        Returns:
+            int: Number of neighbour pairs added
+        """
+        order = sorted((i for i, f in enumerate(self.features) if f['Bounds']),
+                       key=lambda i: self.features[i]['Bounds'][0])
+        unique_vertices = {}
+
+        def vertices_of(i):
+            if i not in unique_vertices:
+                unique_vertices[i] = np.unique(self.features[i]['Vertices'])
+            return unique_vertices[i]
+
+        added = 0
+        active = []
+        for i in order:
+            min_lng, min_lat, max_lng, max_lat = self.features[i]['Bounds']
+            still_active = []
+            for j in active:
+                if self.features[j]['Bounds'][2] >= min_lng - SWEEP_TOLERANCE:
+                    still_active.append(j)
+                else:
+                    # Swept past, so its vertices are no longer needed
+                    unique_vertices.pop(j, None)
+            active = still_active
+            for j in active:
+                other = self.features[j]['Bounds']
+                if other[1] > max_lat + SWEEP_TOLERANCE or other[3] < min_lat - SWEEP_TOLERANCE:
+                    continue
+                pair = (j, i) if j < i else (i, j)
+                if pair in self.shared:
+                    continue
+                common = np.intersect1d(vertices_of(i), vertices_of(j), assume_unique=True)
+                if not len(common):
+                    continue
+                self.shared[pair] = max(_partial_length(self.features[i], common),
+                                        _partial_length(self.features[j], common))
+                added += 1
+            active.append(i)
+        return added
+
+    def build_graph(self):
+        """
+        Builds the graph and returns every feature's neighbours.
+
+        The features' vertices are dropped afterwards, so this runs once per builder.
+
+        Returns:
+            dict: AhupuaaPK to a list of (neighbour index, shared metres), longest border first
+        """
+        self._match_segments()
+        swept = self._sweep()
+        for feature in self.features:
+            del feature['Vertices'], feature['RingEnds']
+
+        neighbours = {i: [] for i in range(len(self.features))}
+        for (a, b), length in self.shared.items():
+            neighbours[a].append((b, length))
+            neighbours[b].append((a, length))
+
+        logger.info(
+            f"Adjacency: {len(self.shared)} neighbour pairs among {len(self.features)} "
+            f"features ({swept} found by the MBR sweep)")
+        return {self.features[i]['AhupuaaPK']: sorted(found, key=lambda n: -n[1])
+                for i, found in neighbours.items()}
+
+    def build_items(self, data_version):
+        """
+        Builds one adjacency item per moku.
+
+        Args:
+            data_version: Import version stamped into the item metadata
+
+        Returns:
+            list: DynamoDB items in low-level attribute format
+        """
+        graph = self.build_graph()
+        metadata = {
+            'M': {
+                'DataVersion': {'N': str(data_version)},
+                'LastUpdated': {'S': datetime.datetime.now().isoformat()},
+            }
+        }
+
+        districts = {}
+        for feature in self.features:
+            districts.setdefault(feature['MokuKey'], []).append(feature)
+
+        items = []
+        for moku_key, features in sorted(districts.items()):
+            feature_map = {}
+            border_features = []
+            neighbour_moku = {}
+            for feature in features:
+                found = graph[feature['AhupuaaPK']]
+                feature_map[feature['AhupuaaPK']] = {'L': [
+                    {
+                        'M': {
+                            'AhupuaaPK': {'S': self.features[n]['AhupuaaPK']},
+                            'AhupuaaName': {'S': self.features[n]['AhupuaaName']},
+                            'MokuKey': {'S': self.features[n]['MokuKey']},
+                            'SharedLength': {'N': str(round(length, 1))}
+                        }
+                    } for n, length in found
+                ]}
+
+                outside = [(n, length) for n, length in found
+                           if self.features[n]['MokuKey'] != moku_key]
+                if outside:
+                    border_features.append({'S': feature['AhupuaaPK']})
+                for n, length in outside:
+                    other_key = self.features[n]['MokuKey']
+                    neighbour_moku[other_key] = neighbour_moku.get(other_key, 0.0) + length
+
+            item = {
+                'AhupuaaPK': {'S': ADJACENCY_MOKU_PK},
+                'HierarchySK': {'S': moku_key},
+                'ItemType': {'S': 'Adjacency'},
+                # Not MokuName/MokupuniName, which would put the item in their GSIs
+                'AggregateName': {'S': features[0]['Moku']},
+                'ParentName': {'S': features[0]['Mokupuni']},
+                'Features': {'M': feature_map},
+                'BorderFeatures': {'L': border_features},
+                'NeighbourMoku': {'L': [
+                    {
+                        'M': {
+                            'MokuKey': {'S': other_key},
+                            'SharedLength': {'N': str(round(length, 1))}
+                        }
+                    } for other_key, length in sorted(neighbour_moku.items(), key=lambda m: -m[1])
+                ]},
+                'Metadata': metadata
+            }
+
+            items.extend(split_adjacency_item(item))
+
+        return items
+
+
+def get_neighbours(client, table_name, mokupuni, moku, ahupuaa_pk):
+    """
+    Reads a feature's neighbours from its moku's adjacency item, or from the
+    part item holding them when the moku was split.
+
+    Args:
+        client: boto3 DynamoDB client
+        table_name: Name of the DynamoDB table
+        mokupuni: MokupuniName of the feature
+        moku: MokuName of the feature
+        ahupuaa_pk: AhupuaaPK of the feature
+
+    Returns:
+        list: Neighbour dicts with AhupuaaPK, AhupuaaName, MokuKey and
+        SharedLength, longest border first, or None if the feature is unknown
+    """
+    moku_key = format_hierarchical_key(mokupuni, moku)
+    item = client.get_item(
+        TableName=table_name,
+        Key={
+            'AhupuaaPK': {'S': ADJACENCY_MOKU_PK},
+            'HierarchySK': {'S': moku_key}
+        },
+        ProjectionExpression='Features.#pk, FeaturePartCount',
+        ExpressionAttributeNames={'#pk': ahupuaa_pk}).get('Item', {})
+
+    if 'FeaturePartCount' in item:
+        part_index = feature_part_index(ahupuaa_pk, int(item['FeaturePartCount']['N']))
+        item = client.get_item(
+            TableName=table_name,
+            Key={
+                'AhupuaaPK': {'S': ADJACENCY_MOKU_PK},
+                'HierarchySK': {'S': format_feature_part_sk(moku_key, part_index)}
+            },
+            ProjectionExpression='Features.#pk',
+            ExpressionAttributeNames={'#pk': ahupuaa_pk}).get('Item', {})
+
+    neighbours = item.get('Features', {}).get('M', {}).get(ahupuaa_pk)
+    if neighbours is None:
+        return None
+    return [
+        {
+            'AhupuaaPK': n['M']['AhupuaaPK']['S'],
+            'AhupuaaName': n['M']['AhupuaaName']['S'],
+            'MokuKey': n['M']['MokuKey']['S'],
+            'SharedLength': float(n['M']['SharedLength']['N'])
+        } for n in neighbours['L']
+    ]
+
+
+def parse_arguments():
+    """
+    Parse command line arguments for the script.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Compute the adjacency graph of the ahupuaa in a source file')
+    parser.add_argument('source', help='GeoJSON, GeoParquet or Arrow IPC file')
+    parser.add_argument('-o', '--output', help='Write the graph to this JSON file')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from geojson_transform import build_feature_item
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+
+    builder = AdjacencyBuilder()
+    for feature_index, source_feature in enumerate(iter_features(args.source)):
+        builder.add(source_feature, build_feature_item(source_feature, feature_index, 0))
+
+    adjacency_graph = {
+        pk: [{'AhupuaaPK': builder.features[n]['AhupuaaPK'],
+              'SharedLength': round(length, 1)} for n, length in found]
+        for pk, found in builder.build_graph().items()
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(adjacency_graph, f, indent=2)
+    else:
+        print(json.dumps(adjacency_graph, indent=2))
@@ -0,0 +1,369 @@
+"""
+Microbenchmarks for the Per-Feature Transform Hot Path
+
+Times the geojson_transform functions that run once or more for every
+feature: replace_floats, simplify_coordinates, guess_centroid_from_geometry,
+extract_bounds_from_geometry, format_hierarchical_key, JSON serialization with
+custom_json_encoder, the FeatureHash computation and build_feature_item as a
+whole.
+
+Each function runs over a matrix of Polygon and MultiPolygon fixtures from 10
+to 100k vertices. The fixtures are made by resampling the example_field.json
+ring, so they keep the shape and coordinate precision of the real data.
+Coordinates are Decimals, as ijson yields them. replace_floats is also timed on
+float coordinates, as the GeoParquet reader yields them, and simplification,
+serialization, the FeatureHash and build_feature_item are also timed on the
+PackedGeometry the streaming parser yields (the *_packed cases).
+
+guess_centroid_from_geometry and extract_bounds_from_geometry only handle
+Polygon geometry, so they are timed on Polygon fixtures only.
+
+Results can be saved as a JSON baseline and later runs compared against it,
+so regressions show up as numbers. The exit code is 1 when any case is slower
+than the baseline by more than the threshold.
+
+Usage:
+  python benchmark_transforms.py --save baseline.json
+  python benchmark_transforms.py --compare baseline.json --threshold 0.1
+  python benchmark_transforms.py --sizes 10 1000 --filter simplify
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+from decimal import Decimal
+
+from geojson_transform import (TRANSFORM_VERSION, build_feature_item, compute_feature_hash,
+                               custom_json_encoder, extract_bounds_from_geometry,
+                               format_hierarchical_key, guess_centroid_from_geometry,
+                               geometry_json, replace_floats, simplify_coordinates,
+                               simplify_geometry)
+from streaming_parser import iter_packed_features
+
+logger = logging.getLogger(__name__)
+
+EXAMPLE_FEATURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'example_field.json')
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+GEOMETRY_KINDS = ['Polygon', 'MultiPolygon']
+MULTIPOLYGON_PARTS = 4  # Polygons a MultiPolygon fixture is split into
+DEFAULT_MIN_TIME = 0.05  # Seconds each timed repeat runs for at least
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10  # Slowdown reported as a regression
+
+
+def load_example_feature(path=EXAMPLE_FEATURE):
+    """
+    Loads the example feature with its ring as Decimals, as ijson would parse it.
+
+    Args:
+        path: Path to example_field.json
+
+    Returns:
+        tuple: (feature without geometry, exterior ring)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        example = json.load(f, parse_float=Decimal)
+
+    ring = json.loads(example['coordinates_str'], parse_float=Decimal)[0]
+    feature = {
+        'type': 'Feature',
+        'id': example['id'],
+        'properties': example['properties']
+    }
+    return feature, ring
+
+
+def resample_ring(ring, vertices):
+    """
+    Resamples a closed ring to a vertex count by walking its outline.
+
+    Args:
+        ring: Closed ring of [lng, lat] pairs
+        vertices: Number of vertices wanted, including the closing one
+
+    Returns:
+        list: Closed ring of Decimal [lng, lat] pairs
+    """
+    points = [(float(lng), float(lat)) for lng, lat in ring]
+    lengths = [0.0]
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        lengths.append(lengths[-1] + ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5)
+
+    total = lengths[-1]
+    count = max(4, vertices) - 1
+    resampled = []
+    segment = 0
+    for i in range(count):
+        distance = total * i / count
+        while lengths[segment + 1] < distance:
+            segment += 1
+        span = lengths[segment + 1] - lengths[segment]
+        t = (distance - lengths[segment]) / span if span else 0.0
+        (x0, y0), (x1, y1) = points[segment], points[segment + 1]
+        # Round like the source data (about 14 decimal places) so Decimals stay realistic
+        resampled.append([Decimal(repr(round(x0 + (x1 - x0) * t, 14))),
+                          Decimal(repr(round(y0 + (y1 - y0) * t, 14)))])
+
+    resampled.append(list(resampled[0]))
+    return resampled
+
+
+def build_fixture(feature, ring, kind, vertices):
+    """
+    Builds a feature of a geometry kind and total vertex count.
+
+    Args:
+        feature: Example feature without geometry
+        ring: Example exterior ring
+        kind: 'Polygon' or 'MultiPolygon'
+        vertices: Total vertices across all rings
+
+    Returns:
+        dict: GeoJSON feature
+    """
+    fixture = dict(feature)
+    if kind == 'Polygon':
+        fixture['geometry'] = {'type': 'Polygon', 'coordinates': [resample_ring(ring, vertices)]}
+        return fixture
+
+    polygons = []
+    part = resample_ring(ring, max(4, vertices // MULTIPOLYGON_PARTS))
+    for i in range(MULTIPOLYGON_PARTS):
+        # Shift each copy east so the parts don't overlap
+        offset = Decimal('0.02') * i
+        polygons.append([[[lng + offset, lat] for lng, lat in part]])
+    fixture['geometry'] = {'type': 'MultiPolygon', 'coordinates': polygons}
+    return fixture
+
+
+def to_floats(obj):
+    """
+    Converts Decimals to floats, as the GeoParquet reader would yield them.
+
+    Args:
+        obj: Nested lists and dicts
+
+    Returns:
+        The same structure with floats
+    """
+    if isinstance(obj, list):
+        return [to_floats(i) for i in obj]
+    if isinstance(obj, dict):
+        return {k: to_floats(v) for k, v in obj.items()}
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return obj
+
+
+def to_packed(fixture):
+    """
+    Parses a fixture back with the streaming parser, as a packed import would see it.
+
+    Args:
+        fixture: GeoJSON feature
+
+    Returns:
+        dict: The feature with its geometry as a PackedGeometry
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.geojson', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': [fixture]}, f,
+                  default=custom_json_encoder)
+        f.flush()
+        return next(iter_packed_features(f.name))
+
+
+def benchmark_cases(feature, ring, sizes, kinds):
+    """
+    Lists the benchmark cases for a fixture matrix.
+
+    Args:
+        feature: Example feature without geometry
+        ring: Example exterior ring
+        sizes: Vertex counts
+        kinds: Geometry kinds
+
+    Yields:
+        tuple: (case name, vertex count, callable)
+    """
+    properties = feature['properties']
+    yield ('format_hierarchical_key', 0,
+           lambda: format_hierarchical_key(properties['mokupuni'], properties['moku']))
+
+    for kind in kinds:
+        for size in sizes:
+            fixture = build_fixture(feature, ring, kind, size)
+            geometry = fixture['geometry']
+            float_geometry = to_floats(geometry)
+            packed_fixture = to_packed(fixture)
+            packed_geometry = packed_fixture['geometry']
+            suffix = f"[{kind}-{size}]"
+
+            # Bind the fixture through default arguments so each lambda keeps its own
+            yield f"replace_floats{suffix}", size, lambda g=geometry: replace_floats(g)
+            yield f"replace_floats_float{suffix}", size, lambda g=float_geometry: replace_floats(g)
+            yield (f"simplify_coordinates{suffix}", size,
+                   lambda g=geometry: simplify_coordinates(g['coordinates']))
+            yield (f"simplify_geometry_packed{suffix}", size,
+                   lambda g=packed_geometry: simplify_geometry(g))
+            if kind == 'Polygon':
+                # Both return None straight away for any other type
+                yield (f"guess_centroid_from_geometry{suffix}", size,
+                       lambda g=geometry: guess_centroid_from_geometry(g))
+                yield (f"extract_bounds_from_geometry{suffix}", size,
+                       lambda g=geometry: extract_bounds_from_geometry(g))
+            yield (f"json_dumps{suffix}", size,
+                   lambda g=geometry: json.dumps(g, default=custom_json_encoder))
+            yield f"geometry_json_packed{suffix}", size, lambda g=packed_geometry: geometry_json(g)
+            yield f"compute_feature_hash{suffix}", size, lambda f=fixture: compute_feature_hash(f)
+            yield (f"compute_feature_hash_packed{suffix}", size,
+                   lambda f=packed_fixture: compute_feature_hash(f))
+            yield f"build_feature_item{suffix}", size, lambda f=fixture: build_feature_item(f, 0, 0)
+            yield (f"build_feature_item_packed{suffix}", size,
+                   lambda f=packed_fixture: build_feature_item(f, 0, 0))
+
+
+def time_case(function, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT):
+    """
+    Times a callable, running it enough times per repeat to be measurable.
+
+    Args:
+        function: Callable to time
+        min_time: Seconds each repeat runs for at least
+        repeat: Number of timed repeats
+
+    Returns:
+        dict: Seconds (fastest per call), Median (per call) and Loops per repeat
+    """
+    timer = timeit.Timer(function)
+    loops = 1
+    while True:
+        elapsed = timer.timeit(loops)
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    timings = [elapsed / loops] + [t / loops for t in timer.repeat(repeat - 1, loops)]
+    return {'Seconds': min(timings), 'Median': statistics.median(timings), 'Loops': loops}
+
+
+def run_benchmarks(sizes=None, kinds=None, name_filter=None, min_time=DEFAULT_MIN_TIME,
+                   repeat=DEFAULT_REPEAT):
+    """
+    Runs the benchmark matrix.
+
+    Args:
+        sizes: Vertex counts (default: DEFAULT_SIZES)
+        kinds: Geometry kinds (default: GEOMETRY_KINDS)
+        name_filter: Only run cases whose name contains this text
+        min_time: Seconds each repeat runs for at least
+        repeat: Number of timed repeats
+
+    Returns:
+        dict: Baseline document with Metadata and Results keyed by case name
+    """
+    feature, ring = load_example_feature()
+    results = {}
+    for name, size, function in benchmark_cases(feature, ring, sizes or DEFAULT_SIZES,
+                                                kinds or GEOMETRY_KINDS):
+        if name_filter and name_filter not in name:
+            continue
+        result = time_case(function, min_time, repeat)
+        result['Vertices'] = size
+        results[name] = result
+        per_vertex = f", {result['Seconds'] / size * 1e9:.1f} ns/vertex" if size else ""
+        logger.info(f"{name}: {result['Seconds'] * 1e6:.2f} us{per_vertex}")
+
+    return {
+        'Metadata': {
+            'Created': datetime.datetime.now().isoformat(),
+            'Python': platform.python_version(),
+            'Platform': platform.platform(),
+            'TransformVersion': TRANSFORM_VERSION
+        },
+        'Results': results
+    }
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares a run against a saved baseline.
+
+    Args:
+        baseline: Baseline document from run_benchmarks
+        current: Baseline document of this run
+        threshold: Relative slowdown reported as a regression
+
+    Returns:
+        list: Names of the cases that regressed
+    """
+    regressions = []
+    for name, result in current['Results'].items():
+        previous = baseline['Results'].get(name)
+        if not previous:
+            continue
+        ratio = result['Seconds'] / previous['Seconds']
+        line = (f"{name}: {previous['Seconds'] * 1e6:.2f} -> {result['Seconds'] * 1e6:.2f} us "
+                f"({ratio:.2f}x)")
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            logger.warning(f"REGRESSION {line}")
+        else:
+            logger.info(line)
+
+    if baseline['Metadata'].get('Python') != current['Metadata']['Python']:
+        logger.warning(
+            f"Baseline was recorded on Python {baseline['Metadata'].get('Python')}, "
+            f"this run is {current['Metadata']['Python']}")
+    return regressions
+
+
+def parse_arguments():
+    """
+    Parse command line arguments for the script.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the per-feature transform functions')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help=f'Vertex counts (default: {DEFAULT_SIZES})')
+    parser.add_argument('--kinds', nargs='+', choices=GEOMETRY_KINDS, default=GEOMETRY_KINDS,
+                        help='Geometry kinds (default: both)')
+    parser.add_argument('--filter', help='Only run cases whose name contains this text')
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME,
+                        help=f'Seconds per timed repeat (default: {DEFAULT_MIN_TIME})')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'Timed repeats per case (default: {DEFAULT_REPEAT})')
+    parser.add_argument('--save', help='Write the results as a baseline JSON file')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Relative slowdown counted as a regression (default: {DEFAULT_THRESHOLD})')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+
+    run = run_benchmarks(args.sizes, args.kinds, args.filter, args.min_time, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2, sort_keys=True)
+        logger.info(f"Saved {len(run['Results'])} results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressed = compare_results(json.load(f), run, args.threshold)
+        if regressed:
+            logger.error(f"{len(regressed)} cases regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
@@ -0,0 +1,405 @@
+"""
+Pre-flight Capacity Planner for the Ahupuaa GeoJSON Import
+
+Computes the DynamoDB size of every item the importer writes and of its
+projection into each global secondary index, estimates the write capacity
+consumed by the base table and every GSI, and scales provisioned throughput so
+an import finishes within a target duration. The capacity recorded from
+describe_table before scaling is what gets restored afterwards.
+
+Sizes follow the DynamoDB item size rules: attribute names and string values
+count their UTF-8 bytes, numbers take one byte per two significant digits plus
+one, and maps and lists add three bytes plus one byte per element.
+"""
+
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+ITEM_SIZE_LIMIT = 400 * 1024  # DynamoDB maximum item size in bytes
+WRITE_UNIT_BYTES = 1024  # One WCU writes up to 1 KB
+GSI_STORAGE_OVERHEAD = 100  # Bytes DynamoDB adds to every index entry for storage
+CAPACITY_HEADROOM = 1.2  # Extra capacity on top of the estimate for retries and skew
+MAX_CAPACITY_UNITS = 40000  # Default per-table provisioned throughput quota
+
+# GSI layout from Terraform/aws_dynamodb, used when no table description is available
+DEFAULT_INDEX_DEFINITIONS = {
+    'AhupuaaIndex': {
+        'HashKey': 'AhupuaaName', 'RangeKey': None,
+        'ProjectionType': 'ALL', 'NonKeyAttributes': []
+    },
+    'MokuIndex': {
+        'HashKey': 'MokuName', 'RangeKey': 'HierarchySK',
+        'ProjectionType': 'ALL', 'NonKeyAttributes': []
+    },
+    'GeospatialIndex': {
+        'HashKey': 'Geohash', 'RangeKey': 'AhupuaaPK',
+        'ProjectionType': 'ALL', 'NonKeyAttributes': []
+    },
+    'MokupuniIndex': {
+        'HashKey': 'MokupuniName', 'RangeKey': 'HierarchySK',
+        'ProjectionType': 'ALL', 'NonKeyAttributes': []
+    },
+    'ZoomLevelIndex': {
+        'HashKey': 'ZoomLevel', 'RangeKey': 'Geohash',
+        'ProjectionType': 'INCLUDE',
+        'NonKeyAttributes': ['SimplifiedBoundaries', 'AhupuaaName', 'MokupuniName']
+    },
+    'GeoBoundingBoxIndex': {
+        'HashKey': 'GeohashPrefix', 'RangeKey': 'AhupuaaPK',
+        'ProjectionType': 'INCLUDE',
+        'NonKeyAttributes': ['SimplifiedBoundaries', 'AhupuaaName', 'MokupuniName', 'MokuName']
+    },
+    'HilbertIndex': {
+        'HashKey': 'HilbertBucket', 'RangeKey': 'HilbertIndex',
+        'ProjectionType': 'INCLUDE',
+        'NonKeyAttributes': ['SimplifiedBoundaries', 'AhupuaaName', 'MokupuniName', 'MokuName',
+                             'MBR', 'MinZoom', 'MaxZoom']
+    }
+}
+DEFAULT_TABLE_KEYS = ['AhupuaaPK', 'HierarchySK']
+
+
+def number_size(value):
+    """
+    Computes the stored size of a DynamoDB number.
+
+    Args:
+        value: Number in its DynamoDB string form
+
+    Returns:
+        int: Size in bytes
+    """
+    digits = value.lstrip('-+').lower().split('e')[0].replace('.', '')
+    significant = digits.strip('0')
+    return math.ceil(max(len(significant), 1) / 2) + 1
+
+
+def attribute_value_size(value):
+    """
+    Computes the stored size of a low-level DynamoDB attribute value.
+
+    Args:
+        value: Attribute value such as {'S': '...'} or {'M': {...}}
+
+    Returns:
+        int: Size in bytes, excluding the attribute name
+    """
+    (type_name, data), = value.items()
+
+    if type_name == 'S':
+        return len(data.encode('utf-8'))
+    elif type_name == 'N':
+        return number_size(data)
+    elif type_name == 'B':
+        return len(data)
+    elif type_name in ('BOOL', 'NULL'):
+        return 1
+    elif type_name == 'SS':
+        return sum(len(s.encode('utf-8')) for s in data)
+    elif type_name == 'NS':
+        return sum(number_size(n) for n in data)
+    elif type_name == 'BS':
+        return sum(len(b) for b in data)
+    elif type_name == 'M':
+        return 3 + sum(len(k.encode('utf-8')) + attribute_value_size(v) + 1
+                       for k, v in data.items())
+    elif type_name == 'L':
+        return 3 + sum(attribute_value_size(v) + 1 for v in data)
+
+    raise ValueError(f"Unsupported DynamoDB attribute type: {type_name}")
+
+
+def item_size(item):
+    """
+    Computes the stored size of a DynamoDB item.
+
+    Args:
+        item: Item in low-level attribute format
+
+    Returns:
+        int: Size in bytes
+    """
+    return sum(len(name.encode('utf-8')) + attribute_value_size(value)
+               for name, value in item.items())
+
+
+def write_units(size):
+    """
+    Converts an item size into the write capacity units a put consumes.
+
+    Args:
+        size: Item size in bytes
+
+    Returns:
+        int: Write capacity units
+    """
+    return max(1, math.ceil(size / WRITE_UNIT_BYTES))
+
+
+def parse_index_definitions(table_description):
+    """
+    Extracts the key schema and projection of every GSI from describe_table.
+
+    Args:
+        table_description: The 'Table' element of a describe_table response
+
+    Returns:
+        dict: Index name mapped to HashKey, RangeKey, ProjectionType and NonKeyAttributes
+    """
+    indexes = {}
+    for index in table_description.get('GlobalSecondaryIndexes', []):
+        keys = {k['KeyType']: k['AttributeName'] for k in index['KeySchema']}
+        projection = index.get('Projection', {})
+        indexes[index['IndexName']] = {
+            'HashKey': keys.get('HASH'),
+            'RangeKey': keys.get('RANGE'),
+            'ProjectionType': projection.get('ProjectionType', 'ALL'),
+            'NonKeyAttributes': projection.get('NonKeyAttributes', [])
+        }
+    return indexes
+
+
+def project_item(item, index, table_keys=DEFAULT_TABLE_KEYS):
+    """
+    Builds the entry an item produces in a GSI.
+
+    Args:
+        item: Item in low-level attribute format
+        index: Index definition as returned by parse_index_definitions
+        table_keys: Attribute names of the base table primary key
+
+    Returns:
+        dict: Projected item, or None when the item is not indexed (sparse index)
+    """
+    if index['HashKey'] not in item:
+        return None
+    if index['RangeKey'] and index['RangeKey'] not in item:
+        return None
+
+    if index['ProjectionType'] == 'ALL':
+        return item
+
+    names = set(table_keys) | {index['HashKey']}
+    if index['RangeKey']:
+        names.add(index['RangeKey'])
+    if index['ProjectionType'] == 'INCLUDE':
+        names.update(index['NonKeyAttributes'])
+
+    return {name: value for name, value in item.items() if name in names}
+
+
+class WriteCapacityEstimator:
+    """
+    Accumulates item and index entry sizes for a planned import.
+    """
+
+    def __init__(self, index_definitions=None, table_keys=DEFAULT_TABLE_KEYS):
+        self.index_definitions = index_definitions or DEFAULT_INDEX_DEFINITIONS
+        self.table_keys = table_keys
+        self.totals = {
+            name: {'Items': 0, 'Bytes': 0, 'WriteUnits': 0, 'MaxItemBytes': 0}
+            for name in [None] + list(self.index_definitions)
+        }
+        self.oversized_items = []
+
+    def _record(self, target, size):
+        totals = self.totals[target]
+        totals['Items'] += 1
+        totals['Bytes'] += size
+        totals['WriteUnits'] += write_units(size)
+        totals['MaxItemBytes'] = max(totals['MaxItemBytes'], size)
+
+    def add(self, item):
+        """
+        Records the base table write and every GSI write caused by putting an item.
+
+        Args:
+            item: Item in low-level attribute format
+
+        Returns:
+            int: Size of the item in bytes
+        """
+        size = item_size(item)
+        self._record(None, size)
+
+        if size > ITEM_SIZE_LIMIT:
+            self.oversized_items.append(
+                (item.get('AhupuaaPK', {}).get('S'), size))
+
+        for name, index in self.index_definitions.items():
+            projected = project_item(item, index, self.table_keys)
+            if projected is not None:
+                self._record(name, item_size(projected))
+
+        return size
+
+    def log_summary(self):
+        """Logs the estimated size and write cost for the table and every GSI"""
+        for name, totals in self.totals.items():
+            label = f"GSI {name}" if name else "Base table"
+            storage = totals['Bytes']
+            if name:
+                storage += totals['Items'] * GSI_STORAGE_OVERHEAD
+            logger.info(
+                f"{label}: {totals['Items']} items, {storage / (1024*1024):.2f} MB, "
+                f"{totals['WriteUnits']} WCU total, largest item {totals['MaxItemBytes']} bytes")
+
+        for pk, size in self.oversized_items:
+            logger.warning(
+                f"Item {pk} is {size} bytes, over the {ITEM_SIZE_LIMIT} byte DynamoDB limit")
+
+
+def describe_capacity(table_description):
+    """
+    Records the provisioned capacity of a table and each of its GSIs.
+
+    Args:
+        table_description: The 'Table' element of a describe_table response
+
+    Returns:
+        dict: Capacity with 'Table' and 'Indexes' entries, or None for on-demand tables
+    """
+    billing_mode = table_description.get(
+        'BillingModeSummary', {}).get('BillingMode', 'PROVISIONED')
+    if billing_mode == 'PAY_PER_REQUEST':
+        return None
+
+    def units(throughput):
+        return {
+            'ReadCapacityUnits': throughput['ReadCapacityUnits'],
+            'WriteCapacityUnits': throughput['WriteCapacityUnits']
+        }
+
+    return {
+        'Table': units(table_description['ProvisionedThroughput']),
+        'Indexes': {
+            index['IndexName']: units(index['ProvisionedThroughput'])
+            for index in table_description.get('GlobalSecondaryIndexes', [])
+        }
+    }
+
+
+def plan_capacity(estimator, current_capacity, target_seconds, headroom=CAPACITY_HEADROOM):
+    """
+    Computes the write capacity needed to finish an import within a target duration.
+
+    Capacity is never planned below the current provisioned value, and read
+    capacity is left untouched.
+
+    Args:
+        estimator: WriteCapacityEstimator populated with the planned items
+        current_capacity: Capacity as returned by describe_capacity
+        target_seconds: Desired import duration in seconds
+        headroom: Multiplier applied on top of the estimated WCU rate
+
+    Returns:
+        dict: Planned capacity in the same shape as describe_capacity
+    """
+    def needed(totals, current):
+        rate = math.ceil(totals['WriteUnits'] * headroom / max(target_seconds, 1))
+        return {
+            'ReadCapacityUnits': current['ReadCapacityUnits'],
+            'WriteCapacityUnits': min(MAX_CAPACITY_UNITS,
+                                      max(current['WriteCapacityUnits'], rate))
+        }
+
+    return {
+        'Table': needed(estimator.totals[None], current_capacity['Table']),
+        'Indexes': {
+            name: needed(estimator.totals[name], current)
+            for name, current in current_capacity['Indexes'].items()
+            if name in estimator.totals
+        }
+    }
+
+
+def log_capacity_plan(current_capacity, planned_capacity):
+    """Logs the current and planned write capacity side by side"""
+    logger.info(
+        f"Base table WCU: {current_capacity['Table']['WriteCapacityUnits']} -> "
+        f"{planned_capacity['Table']['WriteCapacityUnits']}")
+    for name, planned in planned_capacity['Indexes'].items():
+        current = current_capacity['Indexes'][name]
+        logger.info(
+            f"GSI {name} WCU: {current['WriteCapacityUnits']} -> {planned['WriteCapacityUnits']}")
+
+
+def wait_for_table_active(client, table_name, wait_time=600):
+    """
+    Waits until a table and all of its GSIs report ACTIVE.
+
+    Args:
+        client: boto3 DynamoDB client
+        table_name: Name of the DynamoDB table
+        wait_time: Maximum time to wait in seconds
+
+    Returns:
+        bool: True if everything became active in time
+    """
+    start_time = time.time()
+    while time.time() - start_time < wait_time:
+        table = client.describe_table(TableName=table_name)['Table']
+        statuses = [table['TableStatus']] + [
+            index['IndexStatus'] for index in table.get('GlobalSecondaryIndexes', [])]
+        if all(status == 'ACTIVE' for status in statuses):
+            return True
+        time.sleep(5)
+
+    logger.error(
+        f"Table {table_name} and its indexes did not become active within {wait_time} seconds")
+    return False
+
+
+def apply_capacity(client, table_name, capacity, current_capacity):
+    """
+    Updates the provisioned throughput of a table and its GSIs.
+
+    Only values that differ from the current capacity are sent, since DynamoDB
+    rejects updates that do not change anything. An update that was accepted
+    but did not finish in time still changes what is billed, so callers that
+    raised capacity must restore it whenever the update was sent.
+
+    Args:
+        client: boto3 DynamoDB client
+        table_name: Name of the DynamoDB table
+        capacity: Desired capacity in the shape returned by describe_capacity
+        current_capacity: Capacity currently provisioned
+
+    Returns:
+        tuple: (sent, active) - whether DynamoDB accepted the update, and whether
+            the table and its GSIs are active at the new capacity
+    """
+    update_kwargs = {'TableName': table_name}
+
+    if capacity['Table'] != current_capacity['Table']:
+        update_kwargs['ProvisionedThroughput'] = capacity['Table']
+
+    index_updates = [
+        {'Update': {'IndexName': name, 'ProvisionedThroughput': units}}
+        for name, units in capacity['Indexes'].items()
+        if units != current_capacity['Indexes'].get(name)
+    ]
+    if index_updates:
+        update_kwargs['GlobalSecondaryIndexUpdates'] = index_updates
+
+    if len(update_kwargs) == 1:
+        logger.info("Provisioned capacity already matches, nothing to update")
+        return False, True
+
+    # DynamoDB rejects an update while a previous one is still in progress
+    if not wait_for_table_active(client, table_name):
+        return False, False
+
+    try:
+        client.update_table(**update_kwargs)
+    except Exception as e:
+        logger.error(f"Failed to update table capacity: {e}")
+        return False, False
+
+    if not wait_for_table_active(client, table_name):
+        return True, False
+    logger.info("Table and GSI capacity updated successfully")
+    return True, True
@@ -0,0 +1,234 @@
+"""
+Compact Catalog Items for the Ahupuaa List Endpoint
+
+The list-all endpoint only needs a few dozen bytes per ahupuaa (key, names,
+centroid, priority), but a Scan reads through every full geometry item to get
+them. The importer therefore also writes the whole catalog as a handful of
+compressed shard items, versioned with DATA_VERSION, plus a pointer item naming
+the current version and its shard count. Readers fetch the pointer with one
+GetItem and the shards with BatchGetItem. Test imports write no catalog, so
+the pointer never moves to a catalog of only the --limit features.
+
+Keys:
+  - CATALOG#CURRENT          / POINTER    (DataVersion, ShardCount, RecordCount)
+  - CATALOG#<DATA_VERSION>   / SHARD#0000 (zlib-compressed JSON records)
+"""
+
+import datetime
+import json
+import logging
+import math
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+CATALOG_POINTER_PK = 'CATALOG#CURRENT'
+CATALOG_POINTER_SK = 'POINTER'
+CATALOG_SHARD_BYTES = 300 * 1024  # Compressed payload budget, well under the 400 KB item limit
+CATALOG_FIELDS = ['AhupuaaPK', 'AhupuaaName', 'MokupuniName', 'MokuName',
+                  'Lat', 'Lng', 'DisplayPriority']
+BATCH_GET_SIZE = 100  # DynamoDB BatchGetItem limit
+
+
+def format_catalog_pk(data_version):
+    """
+    Formats the partition key holding the catalog shards of a version.
+
+    Args:
+        data_version: Import version the catalog belongs to
+
+    Returns:
+        str: Catalog partition key
+    """
+    return f"CATALOG#{data_version}"
+
+
+def format_shard_sk(shard_index):
+    """
+    Formats the sort key of a catalog shard.
+
+    Args:
+        shard_index: Zero-based shard number
+
+    Returns:
+        str: Shard sort key
+    """
+    return f"SHARD#{shard_index:04d}"
+
+
+def pack_records(records):
+    """
+    Packs catalog records into a compressed payload.
+
+    Args:
+        records: List of records ordered as CATALOG_FIELDS
+
+    Returns:
+        bytes: zlib-compressed JSON
+    """
+    payload = json.dumps({'Fields': CATALOG_FIELDS, 'Records': records},
+                         ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(payload.encode('utf-8'), 9)
+
+
+def unpack_records(data):
+    """
+    Unpacks a compressed catalog payload.
+
+    Args:
+        data: Bytes produced by pack_records
+
+    Returns:
+        list: Records as dicts keyed by field name
+    """
+    payload = json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+    fields = payload['Fields']
+    return [dict(zip(fields, record)) for record in payload['Records']]
+
+
+def shard_records(records, max_bytes=CATALOG_SHARD_BYTES):
+    """
+    Splits records into packed shards that each fit the byte budget.
+
+    Args:
+        records: List of records ordered as CATALOG_FIELDS
+        max_bytes: Maximum compressed size of one shard
+
+    Returns:
+        list: Packed shard payloads, in record order
+    """
+    packed = pack_records(records)
+    if len(packed) <= max_bytes or len(records) <= 1:
+        return [packed]
+
+    # Split evenly by the overshoot, then re-check each part
+    parts = max(2, math.ceil(len(packed) / max_bytes))
+    size = math.ceil(len(records) / parts)
+    shards = []
+    for start in range(0, len(records), size):
+        shards.extend(shard_records(records[start:start + size], max_bytes))
+    return shards
+
+
+class CatalogBuilder:
+    """
+    Collects one compact record per feature item during the import pass.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def add(self, item):
+        """
+        Adds the catalog record for a feature item.
+
+        Args:
+            item: DynamoDB item built for the feature
+        """
+        centroid = item.get('Centroid', {}).get('M')
+        self.records.append([
+            item['AhupuaaPK']['S'],
+            item['AhupuaaName']['S'],
+            item['MokupuniName']['S'],
+            item['MokuName']['S'],
+            float(centroid['Lat']['N']) if centroid else None,
+            float(centroid['Lng']['N']) if centroid else None,
+            int(item['DisplayPriority']['N'])
+        ])
+
+    def build_items(self, data_version):
+        """
+        Builds the shard items and the pointer item for a catalog version.
+
+        The pointer is returned last so it can be written once every shard exists.
+
+        Args:
+            data_version: Import version the catalog belongs to
+
+        Returns:
+            tuple: (list of shard items, pointer item)
+        """
+        # Same ordering the list endpoint returns
+        records = sorted(self.records, key=lambda r: (r[2], r[3], r[1]))
+        last_updated = {'S': datetime.datetime.now().isoformat()}
+
+        shard_items = [
+            {
+                'AhupuaaPK': {'S': format_catalog_pk(data_version)},
+                'HierarchySK': {'S': format_shard_sk(shard_index)},
+                'ItemType': {'S': 'Catalog'},
+                'Records': {'B': payload},
+                'Metadata': {
+                    'M': {
+                        'DataVersion': {'N': str(data_version)},
+                        'LastUpdated': last_updated,
+                    }
+                }
+            }
+            for shard_index, payload in enumerate(shard_records(records))
+        ]
+
+        pointer_item = {
+            'AhupuaaPK': {'S': CATALOG_POINTER_PK},
+            'HierarchySK': {'S': CATALOG_POINTER_SK},
+            'ItemType': {'S': 'Catalog'},
+            'DataVersion': {'N': str(data_version)},
+            'ShardCount': {'N': str(len(shard_items))},
+            'RecordCount': {'N': str(len(records))},
+            'LastUpdated': last_updated
+        }
+
+        return shard_items, pointer_item
+
+
+def load_catalog(client, table_name):
+    """
+    Loads the current catalog with one GetItem and a few BatchGetItem calls.
+
+    Args:
+        client: boto3 DynamoDB client
+        table_name: Name of the DynamoDB table
+
+    Returns:
+        list: Catalog records as dicts keyed by field name, or None if no catalog exists
+    """
+    pointer = client.get_item(
+        TableName=table_name,
+        Key={
+            'AhupuaaPK': {'S': CATALOG_POINTER_PK},
+            'HierarchySK': {'S': CATALOG_POINTER_SK}
+        }
+    ).get('Item')
+    if not pointer:
+        return None
+
+    data_version = pointer['DataVersion']['N']
+    keys = [
+        {
+            'AhupuaaPK': {'S': format_catalog_pk(data_version)},
+            'HierarchySK': {'S': format_shard_sk(shard_index)}
+        }
+        for shard_index in range(int(pointer['ShardCount']['N']))
+    ]
+
+    shards = {}
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        request = {table_name: {'Keys': keys[start:start + BATCH_GET_SIZE]}}
+        while request:
+            response = client.batch_get_item(RequestItems=request)
+            for item in response['Responses'].get(table_name, []):
+                shards[item['HierarchySK']['S']] = item['Records']['B']
+            request = response.get('UnprocessedKeys')
+            if request:
+                time.sleep(0.2)
+
+    if len(shards) != len(keys):
+        logger.error(
+            f"Catalog version {data_version} is missing {len(keys) - len(shards)} shards")
+        return None
+
+    records = []
+    for key in keys:
+        records.extend(unpack_records(shards[key['HierarchySK']['S']]))
+    return records
@@ -0,0 +1,344 @@
+"""
+Per-Version Change Manifests for the Ahupuaa Data
+
+Every feature item carries Metadata.DataVersion and Metadata.FeatureHash, but
+nothing records which features a reload actually changed, so clients re-download
+whole regions after every republish. After each import the importer compares
+the new feature hashes against the state of the previous version and writes one
+compact manifest item listing the added, changed and removed AhupuaaPKs with
+their new hashes. Each manifest names its predecessor, so the chain can be
+replayed to the state of any version and diffed into the minimal fetch set
+between two versions.
+
+Manifests live in the home table (the one Terraform manages) so they survive
+blue/green table switches and table clears:
+  - MANIFEST / VERSION#<DATA_VERSION>  (PreviousVersion, counts, zlib-compressed changes)
+
+Usage:
+  python change_manifest.py --table AhupuaaGIS --from 1718000000 [--to 1719000000]
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import sys
+import zlib
+
+from capacity_planner import ITEM_SIZE_LIMIT, item_size
+from versioned_import import dataset_digest
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PK = 'MANIFEST'
+
+
+def format_manifest_sk(data_version):
+    """
+    Formats the sort key of a manifest, zero-padded so versions sort in order.
+
+    Args:
+        data_version: Import version the manifest describes
+
+    Returns:
+        str: Manifest sort key
+    """
+    return f"VERSION#{int(data_version):012d}"
+
+
+def diff_feature_hashes(previous_hashes, feature_hashes):
+    """
+    Compares two versions of the dataset feature by feature.
+
+    Args:
+        previous_hashes: Dict of AhupuaaPK to FeatureHash of the previous version
+        feature_hashes: Dict of AhupuaaPK to FeatureHash of the new version
+
+    Returns:
+        dict: Added and Changed (dicts of AhupuaaPK to new hash) and Removed
+        (sorted list of AhupuaaPK)
+    """
+    added = {}
+    changed = {}
+    for pk, feature_hash in feature_hashes.items():
+        previous = previous_hashes.get(pk)
+        if previous is None:
+            added[pk] = feature_hash
+        elif previous != feature_hash:
+            changed[pk] = feature_hash
+
+    removed = sorted(pk for pk in previous_hashes if pk not in feature_hashes)
+    return {'Added': added, 'Changed': changed, 'Removed': removed}
+
+
+def apply_changes(state, changes):
+    """
+    Applies one manifest's changes to a dataset state in place.
+
+    Args:
+        state: Dict of AhupuaaPK to FeatureHash
+        changes: Changes as returned by diff_feature_hashes
+    """
+    state.update(changes['Added'])
+    state.update(changes['Changed'])
+    for pk in changes['Removed']:
+        state.pop(pk, None)
+
+
+def build_manifest_item(data_version, previous_version, changes, feature_hashes):
+    """
+    Builds the manifest item for an import version.
+
+    Args:
+        data_version: Import version the manifest describes
+        previous_version: Version the changes are relative to, or None for the first
+        changes: Changes as returned by diff_feature_hashes
+        feature_hashes: Dict of AhupuaaPK to FeatureHash of the new version
+
+    Returns:
+        dict: DynamoDB item in low-level attribute format
+    """
+    payload = json.dumps(changes, sort_keys=True, separators=(',', ':'))
+
+    item = {
+        'AhupuaaPK': {'S': MANIFEST_PK},
+        'HierarchySK': {'S': format_manifest_sk(data_version)},
+        'ItemType': {'S': 'Manifest'},
+        'DataVersion': {'N': str(data_version)},
+        'AddedCount': {'N': str(len(changes['Added']))},
+        'ChangedCount': {'N': str(len(changes['Changed']))},
+        'RemovedCount': {'N': str(len(changes['Removed']))},
+        'FeatureCount': {'N': str(len(feature_hashes))},
+        'DatasetDigest': {'S': dataset_digest(feature_hashes)},
+        'Changes': {'B': zlib.compress(payload.encode('utf-8'), 9)},
+        'LastUpdated': {'S': datetime.datetime.now().isoformat()}
+    }
+
+    if previous_version is not None:
+        item['PreviousVersion'] = {'N': str(previous_version)}
+
+    return item
+
+
+def parse_manifest_item(item):
+    """
+    Decodes a manifest item.
+
+    Args:
+        item: Manifest item in low-level attribute format
+
+    Returns:
+        dict: DataVersion, PreviousVersion (or None), DatasetDigest and Changes
+    """
+    return {
+        'DataVersion': int(item['DataVersion']['N']),
+        'PreviousVersion': int(item['PreviousVersion']['N']) if 'PreviousVersion' in item else None,
+        'DatasetDigest': item['DatasetDigest']['S'],
+        'Changes': json.loads(zlib.decompress(bytes(item['Changes']['B'])).decode('utf-8'))
+    }
+
+
+def load_manifest_chain(client, table_name):
+    """
+    Reads every manifest and keeps the unbroken chain ending at the latest one.
+
+    Args:
+        client: boto3 DynamoDB client
+        table_name: Name of the home table
+
+    Returns:
+        list: Parsed manifests, oldest first
+    """
+    query_kwargs = {
+        'TableName': table_name,
+        'KeyConditionExpression': 'AhupuaaPK = :pk',
+        'ExpressionAttributeValues': {':pk': {'S': MANIFEST_PK}},
+        'ConsistentRead': True
+    }
+
+    manifests = []
+    while True:
+        response = client.query(**query_kwargs)
+        manifests.extend(parse_manifest_item(item) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    # Walk back from the latest manifest so a stray version cannot break the chain
+    by_version = {m['DataVersion']: m for m in manifests}
+    chain = []
+    current = manifests[-1] if manifests else None
+    while current:
+        chain.append(current)
+        current = by_version.get(current['PreviousVersion'])
+        if current is None and chain[-1]['PreviousVersion'] is not None:
+            logger.warning(
+                f"Manifest chain is broken before version {chain[-1]['DataVersion']}; "
+                "older versions are not available")
+
+    chain.reverse()
+    return chain
+
+
+def replay_chain(chain, data_version=None):
+    """
+    Rebuilds the feature hashes of a version by replaying the manifest chain.
+
+    Args:
+        chain: Manifests as returned by load_manifest_chain
+        data_version: Version to rebuild, or None for the latest
+
+    Returns:
+        dict: AhupuaaPK to FeatureHash, or None if the version is not in the chain
+    """
+    state = {}
+    for manifest in chain:
+        # The oldest manifest in a broken chain is relative to a state we don't have
+        if manifest is chain[0] and manifest['PreviousVersion'] is not None:
+            return None
+        apply_changes(state, manifest['Changes'])
+        if dataset_digest(state) != manifest['DatasetDigest']:
+            logger.error(
+                f"Replayed state does not match the digest of version {manifest['DataVersion']}")
+            return None
+        if manifest['DataVersion'] == data_version:
+            return state
+
+    return state if data_version is None and chain else None
+
+
+def compute_fetch_set(chain, from_version, to_version=None):
+    """
+    Works out the minimal set of features a client holding one version must
+    fetch and drop to reach another.
+
+    A feature that changed several times is fetched once, and one that was
+    added and removed again in between is never mentioned. A client with no
+    known version (or one older than the chain) gets a full fetch.
+
+    Args:
+        chain: Manifests as returned by load_manifest_chain
+        from_version: Version the client holds, or None
+        to_version: Version to reach, or None for the latest
+
+    Returns:
+        dict: FromVersion, ToVersion, Fetch (AhupuaaPK to hash) and Remove
+        (list of AhupuaaPK, or None when the client must discard everything),
+        or None if to_version is unknown
+    """
+    if not chain:
+        logger.error("No change manifests found")
+        return None
+
+    target_version = to_version if to_version is not None else chain[-1]['DataVersion']
+    target_state = replay_chain(chain, target_version)
+    if target_state is None:
+        logger.error(f"Version {target_version} is not in the manifest chain")
+        return None
+
+    source_state = None
+    if from_version is not None and from_version <= target_version:
+        source_state = replay_chain(chain, from_version)
+
+    if source_state is None:
+        if from_version is not None:
+            logger.info(
+                f"Version {from_version} is not in the manifest chain, returning a full fetch")
+        return {
+            'FromVersion': None,
+            'ToVersion': target_version,
+            'Fetch': target_state,
+            'Remove': None
+        }
+
+    changes = diff_feature_hashes(source_state, target_state)
+    fetch = dict(changes['Added'])
+    fetch.update(changes['Changed'])
+    return {
+        'FromVersion': from_version,
+        'ToVersion': target_version,
+        'Fetch': fetch,
+        'Remove': changes['Removed']
+    }
+
+
+def write_change_manifest(client, table_name, data_version, feature_hashes):
+    """
+    Diffs a completed import against the latest manifest and writes its manifest.
+
+    Args:
+        client: boto3 DynamoDB client
+        table_name: Name of the home table
+        data_version: Import version just completed
+        feature_hashes: Dict of AhupuaaPK to FeatureHash recorded during the import
+
+    Returns:
+        bool: True if the manifest was written
+    """
+    try:
+        chain = load_manifest_chain(client, table_name)
+        previous_version = chain[-1]['DataVersion'] if chain else None
+        previous_hashes = replay_chain(chain) if chain else {}
+        if previous_hashes is None:
+            # Start a fresh chain rather than chaining onto a state we can't rebuild
+            logger.warning("Previous manifests cannot be replayed, starting a new chain")
+            previous_version = None
+            previous_hashes = {}
+
+        changes = diff_feature_hashes(previous_hashes, feature_hashes)
+        item = build_manifest_item(data_version, previous_version, changes, feature_hashes)
+
+        size = item_size(item)
+        if size > ITEM_SIZE_LIMIT:
+            logger.error(
+                f"Change manifest for version {data_version} is {size} bytes, over the item limit")
+            return False
+
+        client.put_item(
+            TableName=table_name,
+            Item=item,
+            ConditionExpression='attribute_not_exists(AhupuaaPK)'
+        )
+
+        logger.info(
+            f"Wrote change manifest for version {data_version} ({size} bytes): "
+            f"{len(changes['Added'])} added, {len(changes['Changed'])} changed, "
+            f"{len(changes['Removed'])} removed since {previous_version or 'nothing'}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Failed to write change manifest for version {data_version}: {e}")
+        return False
+
+
+def parse_arguments():
+    """
+    Parse command line arguments for the script.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Compute the features to fetch between two data versions')
+    parser.add_argument('--table', type=str, default='AhupuaaGIS',
+                        help='Home table holding the manifests (default: AhupuaaGIS)')
+    parser.add_argument('--from', dest='from_version', type=int,
+                        help='Version the client holds (omit for a full fetch)')
+    parser.add_argument('--to', dest='to_version', type=int,
+                        help='Version to reach (default: latest)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    import boto3
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+
+    manifest_chain = load_manifest_chain(boto3.client('dynamodb'), args.table)
+    fetch_set = compute_fetch_set(manifest_chain, args.from_version, args.to_version)
+    if fetch_set is None:
+        sys.exit(1)
+
+    print(json.dumps(fetch_set, indent=2, sort_keys=True))
@@ -0,0 +1,389 @@
+"""
+Memory-Mappable Dataset Snapshot for the Ahupuaa Data
+
+The whole dataset is small enough to sit in memory, so the importer can emit a
+single versioned binary snapshot next to the DynamoDB load. Any service can
+mmap it at startup and answer lookups by PK, island or bounding box without
+warming a cache one query at a time.
+
+Layout (little-endian):
+  - Header: magic, format version, LOD count, DATA_VERSION, record count and
+    the offsets of each section
+  - Record table: fixed-width records sorted by (mokupuni, PK) holding string
+    references, centroid, bounds, zoom range, priority and one geometry blob
+    reference per level of detail
+  - PK index: record numbers sorted by PK, for binary search
+  - String table: UTF-8 strings addressed by (offset, length)
+  - Geometry blobs: the GeoJSON strings stored in the items, addressed by
+    (offset, length); identical blobs are stored once
+
+Usage:
+  python dataset_snapshot.py ahupuaa.snapshot --pk AHUPUAA#1
+  python dataset_snapshot.py ahupuaa.snapshot --island Maui
+  python dataset_snapshot.py ahupuaa.snapshot --bbox -156.7 20.5 -156.0 21.0 --zoom 10
+"""
+
+import argparse
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'AHUSNAP1'
+SNAPSHOT_FORMAT_VERSION = 1
+# Levels of detail, lowest first
+LOD_ATTRIBUTES = ['LowDetailBoundaries', 'SimplifiedBoundaries',
+                  'HighDetailBoundaries', 'FullGeometry']
+
+# magic, format version, LOD count, data version, record count, reserved,
+# record table, PK index, string table and blob offsets, file size
+HEADER = struct.Struct('<8sHHQII5Q')
+# PK, HierarchySK, AhupuaaName, MokupuniName, MokuName string refs (offset, length),
+# centroid lat/lng, bounds min lng/lat and max lng/lat, min zoom, max zoom,
+# priority, padding, then (offset, length) per level of detail
+RECORD = struct.Struct('<10I6d4B' + 'II' * len(LOD_ATTRIBUTES))
+INDEX_ENTRY = struct.Struct('<I')
+STRING_FIELDS = ['AhupuaaPK', 'HierarchySK', 'AhupuaaName', 'MokupuniName', 'MokuName']
+
+
+def _number(item, *path):
+    value = item
+    for name in path:
+        value = value.get(name, {})
+        value = value.get('M', value)
+    return float(value['N']) if 'N' in value else math.nan
+
+
+class SnapshotWriter:
+    """
+    Collects feature items during the import pass and writes the snapshot file.
+    """
+
+    def __init__(self, data_version):
+        self.data_version = data_version
+        self.items = []
+
+    def add_item(self, item):
+        """
+        Adds a complete (not split) feature item to the snapshot.
+
+        Args:
+            item: DynamoDB item in low-level attribute format
+        """
+        self.items.append({
+            'Strings': [item[name]['S'] for name in STRING_FIELDS],
+            'Numbers': [
+                _number(item, 'Centroid', 'Lat'),
+                _number(item, 'Centroid', 'Lng'),
+                _number(item, 'Bounds', 'Southwest', 'Lng'),
+                _number(item, 'Bounds', 'Southwest', 'Lat'),
+                _number(item, 'Bounds', 'Northeast', 'Lng'),
+                _number(item, 'Bounds', 'Northeast', 'Lat')
+            ],
+            'Zoom': [int(item.get('MinZoom', {}).get('N', 0)),
+                     int(item.get('MaxZoom', {}).get('N', 0)),
+                     int(item.get('DisplayPriority', {}).get('N', 0))],
+            'Geometry': [item.get(name, {}).get('S') for name in LOD_ATTRIBUTES]
+        })
+
+    def write(self, path):
+        """
+        Writes the snapshot atomically (temporary file, then rename).
+
+        Args:
+            path: Destination file path
+
+        Returns:
+            int: Size of the written file in bytes
+        """
+        records = sorted(self.items, key=lambda r: (
+            r['Strings'][3].encode('utf-8'), r['Strings'][0].encode('utf-8')))
+
+        strings = bytearray()
+        string_refs = {}
+        blobs = bytearray()
+        blob_refs = {None: (0, 0)}
+
+        def string_ref(value):
+            if value not in string_refs:
+                data = value.encode('utf-8')
+                string_refs[value] = (len(strings), len(data))
+                strings.extend(data)
+            return string_refs[value]
+
+        def blob_ref(value):
+            if value not in blob_refs:
+                data = value.encode('utf-8')
+                blob_refs[value] = (len(blobs), len(data))
+                blobs.extend(data)
+            return blob_refs[value]
+
+        record_table = bytearray()
+        for record in records:
+            refs = [n for value in record['Strings'] for n in string_ref(value)]
+            lods = [n for value in record['Geometry'] for n in blob_ref(value)]
+            record_table.extend(RECORD.pack(
+                *refs, *record['Numbers'], *record['Zoom'], 0, *lods))
+
+        pk_order = sorted(range(len(records)),
+                          key=lambda i: records[i]['Strings'][0].encode('utf-8'))
+        pk_index = b''.join(INDEX_ENTRY.pack(i) for i in pk_order)
+
+        records_offset = HEADER.size
+        index_offset = records_offset + len(record_table)
+        strings_offset = index_offset + len(pk_index)
+        blobs_offset = strings_offset + len(strings)
+        file_size = blobs_offset + len(blobs)
+
+        header = HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(LOD_ATTRIBUTES),
+            self.data_version, len(records), 0,
+            records_offset, index_offset, strings_offset, blobs_offset, file_size)
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            for section in (header, record_table, pk_index, strings, blobs):
+                f.write(section)
+        os.replace(temp_path, path)
+
+        logger.info(
+            f"Wrote snapshot {path}: {len(records)} features, "
+            f"{len(blob_refs) - 1} geometry blobs, {file_size / (1024*1024):.2f} MB")
+        return file_size
+
+
+class DatasetSnapshot:
+    """
+    Read-only, memory-mapped view of a snapshot file.
+
+    Lookups read fixed-width records straight from the mapping; geometry is
+    only decoded when asked for.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        (magic, format_version, lod_count, self.data_version, self.record_count, _,
+         self._records_offset, self._index_offset, self._strings_offset,
+         self._blobs_offset, file_size) = HEADER.unpack_from(self._view, 0)
+
+        if magic != SNAPSHOT_MAGIC or format_version != SNAPSHOT_FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {SNAPSHOT_FORMAT_VERSION} snapshot")
+        if lod_count != len(LOD_ATTRIBUTES) or file_size != len(self._mmap):
+            self.close()
+            raise ValueError(f"{path} is truncated or was written with different LODs")
+
+    def close(self):
+        """Releases the memory mapping"""
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.record_count
+
+    def _string_bytes(self, offset, length):
+        start = self._strings_offset + offset
+        return self._view[start:start + length]
+
+    def _unpack(self, index):
+        return RECORD.unpack_from(self._view, self._records_offset + index * RECORD.size)
+
+    def _field_bytes(self, index, field):
+        position = STRING_FIELDS.index(field) * 2
+        fields = self._unpack(index)
+        return bytes(self._string_bytes(fields[position], fields[position + 1]))
+
+    def record(self, index):
+        """
+        Decodes the record at a position in the record table.
+
+        Args:
+            index: Record number
+
+        Returns:
+            dict: Record fields, with geometry left as blob references
+        """
+        fields = self._unpack(index)
+        record = {
+            name: bytes(self._string_bytes(fields[i * 2], fields[i * 2 + 1])).decode('utf-8')
+            for i, name in enumerate(STRING_FIELDS)
+        }
+        lat, lng, min_lng, min_lat, max_lng, max_lat = fields[10:16]
+        record.update({
+            'Index': index,
+            'Centroid': None if math.isnan(lat) else {'Lat': lat, 'Lng': lng},
+            'Bounds': None if math.isnan(min_lng) else [min_lng, min_lat, max_lng, max_lat],
+            'MinZoom': fields[16],
+            'MaxZoom': fields[17],
+            'DisplayPriority': fields[18]
+        })
+        return record
+
+    def geometry_bytes(self, index, lod='SimplifiedBoundaries'):
+        """
+        Returns a zero-copy view of a record's geometry JSON.
+
+        Args:
+            index: Record number
+            lod: One of LOD_ATTRIBUTES
+
+        Returns:
+            memoryview: UTF-8 GeoJSON, or None if the level is absent
+        """
+        position = 20 + LOD_ATTRIBUTES.index(lod) * 2
+        fields = self._unpack(index)
+        offset, length = fields[position], fields[position + 1]
+        if not length:
+            return None
+        start = self._blobs_offset + offset
+        return self._view[start:start + length]
+
+    def geometry(self, index, lod='SimplifiedBoundaries'):
+        """
+        Returns a record's geometry as a GeoJSON string.
+
+        Args:
+            index: Record number
+            lod: One of LOD_ATTRIBUTES
+
+        Returns:
+            str: GeoJSON geometry, or None if the level is absent
+        """
+        data = self.geometry_bytes(index, lod)
+        return bytes(data).decode('utf-8') if data is not None else None
+
+    def find(self, ahupuaa_pk):
+        """
+        Looks up a feature by AhupuaaPK with a binary search over the PK index.
+
+        Args:
+            ahupuaa_pk: Partition key, e.g. AHUPUAA#1
+
+        Returns:
+            dict: Record, or None if not found
+        """
+        target = ahupuaa_pk.encode('utf-8')
+        low, high = 0, self.record_count
+        while low < high:
+            middle = (low + high) // 2
+            index, = INDEX_ENTRY.unpack_from(
+                self._view, self._index_offset + middle * INDEX_ENTRY.size)
+            value = self._field_bytes(index, 'AhupuaaPK')
+            if value < target:
+                low = middle + 1
+            elif value > target:
+                high = middle
+            else:
+                return self.record(index)
+        return None
+
+    def by_island(self, mokupuni):
+        """
+        Returns every feature on an island; records are sorted by mokupuni so
+        this is a contiguous range found with a binary search.
+
+        Args:
+            mokupuni: Island name
+
+        Returns:
+            list: Records
+        """
+        target = mokupuni.encode('utf-8')
+        low, high = 0, self.record_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._field_bytes(middle, 'MokupuniName') < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        records = []
+        index = low
+        while index < self.record_count and self._field_bytes(index, 'MokupuniName') == target:
+            records.append(self.record(index))
+            index += 1
+        return records
+
+    def in_bbox(self, min_lng, min_lat, max_lng, max_lat, zoom=None):
+        """
+        Returns the features whose bounds intersect a bounding box.
+
+        Args:
+            min_lng, min_lat, max_lng, max_lat: Bounding box in degrees
+            zoom: Optional map zoom level; features outside their zoom range are skipped
+
+        Returns:
+            list: Records
+        """
+        records = []
+        for index in range(self.record_count):
+            fields = self._unpack(index)
+            f_min_lng, f_min_lat, f_max_lng, f_max_lat = fields[12:16]
+            if math.isnan(f_min_lng):
+                continue
+            if f_min_lng > max_lng or f_max_lng < min_lng or \
+                    f_min_lat > max_lat or f_max_lat < min_lat:
+                continue
+            if zoom is not None and not fields[16] <= zoom <= fields[17]:
+                continue
+            records.append(self.record(index))
+        return records
+
+
+def parse_arguments():
+    """
+    Parse command line arguments for the snapshot reader.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Query an Ahupuaa dataset snapshot')
+    parser.add_argument('snapshot', help='Snapshot file written by the importer')
+    parser.add_argument('--pk', help='Look up a feature by AhupuaaPK')
+    parser.add_argument('--island', help='List the features on a mokupuni')
+    parser.add_argument('--bbox', type=float, nargs=4,
+                        metavar=('MIN_LNG', 'MIN_LAT', 'MAX_LNG', 'MAX_LAT'),
+                        help='List the features intersecting a bounding box')
+    parser.add_argument('--zoom', type=int, help='Zoom level filter for --bbox')
+    parser.add_argument('--lod', choices=LOD_ATTRIBUTES,
+                        help='Include the geometry at this level of detail')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+
+    with DatasetSnapshot(args.snapshot) as snapshot:
+        logger.info(
+            f"Snapshot version {snapshot.data_version} with {len(snapshot)} features")
+
+        if args.pk:
+            found = snapshot.find(args.pk)
+            results = [found] if found else []
+        elif args.island:
+            results = snapshot.by_island(args.island)
+        elif args.bbox:
+            results = snapshot.in_bbox(*args.bbox, zoom=args.zoom)
+        else:
+            results = []
+
+        for record in results:
+            if args.lod:
+                record[args.lod] = snapshot.geometry(record['Index'], args.lod)
+            print(json.dumps(record, ensure_ascii=False))
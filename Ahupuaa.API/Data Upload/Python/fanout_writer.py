@@ -0,0 +1,325 @@
+"""
+One-Pass Fan-Out Writes to Several Ahupuaa Tables
+
+Loading dev, staging and prod used to mean running the whole parse and
+transform pipeline once per environment. With fan-out, the importer builds
+each item once and hands every batch to a FanoutWriter. The writer copies the
+batch onto one queue per target table. Each target has its own credentials
+profile, region, worker pool, retry loop and write budget:
+
+  - a token bucket refills at the target's WCU budget, and each BatchWriteItem
+    first takes the base-table write units of its items (retried items are
+    charged again), so a small dev table is not flooded while prod loads at
+    full speed
+  - unprocessed items are retried with exponential backoff; a batch still
+    failing after MAX_RETRIES marks the target failed, and its remaining
+    batches are dropped without holding up the other targets
+  - queues are bounded, so the slowest healthy target paces the import
+    instead of buffering the whole dataset in memory
+
+Writes are asynchronous. flush() waits until every queued batch is written,
+and the importer calls it before any write that must land after earlier ones
+(the catalog pointer) and at the end. report() returns per-target run
+statistics.
+
+Targets are given as "TABLE[,profile=NAME][,region=REGION][,wcu=N][,workers=N]",
+for example:
+  --target AhupuaaGIS_dev,profile=dev,wcu=100 --target AhupuaaGIS_prod,profile=prod
+"""
+
+import logging
+import queue
+import threading
+import time
+
+import boto3
+
+from capacity_planner import item_size, write_units
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 25  # DynamoDB BatchWriteItem limit
+DEFAULT_TARGET_WORKERS = 10  # Writer threads per target
+QUEUE_BATCHES_PER_WORKER = 4  # Queued batches per writer thread before the import waits
+MAX_RETRIES = 10  # Attempts per batch before the target is marked failed
+
+
+def parse_target_spec(spec):
+    """
+    Parses a --target value.
+
+    Args:
+        spec: "TABLE[,profile=NAME][,region=REGION][,wcu=N][,workers=N]"
+
+    Returns:
+        dict: Table, Profile, Region, WCU (None for unlimited) and Workers
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    table, *options = [part.strip() for part in spec.split(',')]
+    if not table or '=' in table:
+        raise ValueError(f"Target '{spec}' must start with a table name")
+
+    target = {'Table': table, 'Profile': None, 'Region': None, 'WCU': None,
+              'Workers': DEFAULT_TARGET_WORKERS}
+    for option in options:
+        name, _, value = option.partition('=')
+        name = name.strip().lower()
+        if name == 'profile':
+            target['Profile'] = value
+        elif name == 'region':
+            target['Region'] = value
+        elif name == 'wcu':
+            target['WCU'] = float(value)
+        elif name == 'workers':
+            target['Workers'] = int(value)
+        else:
+            raise ValueError(f"Unknown target option '{name}' in '{spec}'")
+    return target
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket holding at most one second of budget.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, tokens):
+        """
+        Blocks until the tokens are available and takes them.
+
+        A request larger than the bucket waits for a full bucket and drives it
+        negative, so oversized batches still get through at the budgeted rate.
+
+        Args:
+            tokens: Write units to take
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= min(tokens, self.rate):
+                    self.tokens -= tokens
+                    return waited
+                delay = (min(tokens, self.rate) - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class WriteTarget:
+    """
+    One destination table with its own client, queue, workers and budget.
+    """
+
+    def __init__(self, spec, client=None):
+        self.table = spec['Table']
+        self.profile = spec['Profile']
+        self.region = spec['Region']
+        self.wcu = spec['WCU']
+        self.workers = max(1, spec['Workers'])
+        self.client = client or boto3.Session(
+            profile_name=self.profile, region_name=self.region).client('dynamodb')
+        self.bucket = TokenBucket(self.wcu) if self.wcu else None
+        self.queue = queue.Queue(maxsize=self.workers * QUEUE_BATCHES_PER_WORKER)
+        self.failed = threading.Event()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.stats = {'Items': 0, 'Batches': 0, 'WriteUnits': 0, 'Retries': 0,
+                      'UnprocessedItems': 0, 'Errors': 0, 'DroppedItems': 0,
+                      'BudgetWaitSeconds': 0.0}
+        self.started = None
+        self.finished = None
+
+    @property
+    def name(self):
+        return f"{self.table} ({self.profile or 'default'}/{self.region or 'default'})"
+
+    def start(self):
+        """Starts the writer threads"""
+        self.started = time.time()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, daemon=True,
+                                      name=f"fanout-{self.table}-{i}")
+            thread.start()
+            self.threads.append(thread)
+
+    def _count(self, **increments):
+        with self.lock:
+            for name, value in increments.items():
+                self.stats[name] += value
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            try:
+                if batch is None:
+                    return
+                if self.failed.is_set():
+                    self._count(DroppedItems=len(batch))
+                elif not self._write_batch(batch):
+                    self._count(DroppedItems=len(batch))
+                    with self.lock:
+                        first_failure = not self.failed.is_set()
+                        self.failed.set()
+                    if first_failure:
+                        logger.error(f"Target {self.name} failed; its remaining batches are dropped")
+            finally:
+                self.queue.task_done()
+
+    def _write_batch(self, batch):
+        pending = batch
+        for attempt in range(MAX_RETRIES):
+            units = sum(write_units(item_size(r['PutRequest']['Item'])) for r in pending)
+            if self.bucket:
+                self._count(BudgetWaitSeconds=self.bucket.take(units))
+            try:
+                response = self.client.batch_write_item(RequestItems={self.table: pending})
+            except Exception as e:
+                logger.error(f"Batch error on {self.name}: {e}")
+                self._count(Errors=1, Retries=1)
+                time.sleep(min(2 ** attempt * 0.5, 5.0))
+                continue
+
+            unprocessed = response.get('UnprocessedItems', {}).get(self.table, [])
+            self._count(WriteUnits=units, Items=len(pending) - len(unprocessed))
+            if not unprocessed:
+                self._count(Batches=1)
+                return True
+
+            self._count(Retries=1, UnprocessedItems=len(unprocessed))
+            pending = unprocessed
+            time.sleep(min(2 ** attempt * 0.1, 1.0))
+
+        return False
+
+    def put(self, batch):
+        """
+        Queues a batch, waiting while the queue is full.
+
+        Args:
+            batch: Up to BATCH_SIZE PutRequests
+        """
+        if self.failed.is_set():
+            self._count(DroppedItems=len(batch))
+            return
+        self.queue.put(batch)
+
+    def stop(self):
+        """Waits for the queue to drain and stops the writer threads"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.finished = time.time()
+
+    def report(self):
+        """
+        Summarizes the target's run.
+
+        Returns:
+            dict: Target settings, counters, Seconds and Status. BudgetWaitSeconds
+            is summed over the writer threads.
+        """
+        end = self.finished or time.time()
+        seconds = end - self.started if self.started else 0.0
+        with self.lock:
+            stats = dict(self.stats)
+        stats.update({
+            'Table': self.table,
+            'Profile': self.profile,
+            'Region': self.region,
+            'WCU': self.wcu,
+            'Seconds': round(seconds, 2),
+            'ItemsPerSecond': round(stats['Items'] / seconds, 2) if seconds else 0.0,
+            'BudgetWaitSeconds': round(stats['BudgetWaitSeconds'], 2),
+            'Status': 'Failed' if self.failed.is_set() else 'Succeeded'
+        })
+        return stats
+
+
+class FanoutWriter:
+    """
+    Writes every batch to each of several target tables.
+    """
+
+    def __init__(self, targets):
+        """
+        Args:
+            targets: WriteTarget instances
+        """
+        self.targets = list(targets)
+        for target in self.targets:
+            target.start()
+
+    def __call__(self, batch_items):
+        """
+        Queues PutRequests for every healthy target.
+
+        Args:
+            batch_items: List of PutRequests, any length
+
+        Returns:
+            bool: False once every target has failed
+        """
+        batches = [batch_items[i:i + BATCH_SIZE]
+                   for i in range(0, len(batch_items), BATCH_SIZE)]
+        for target in self.targets:
+            for batch in batches:
+                target.put(batch)
+        return any(not t.failed.is_set() for t in self.targets)
+
+    def flush(self):
+        """
+        Waits until every queued batch has been written or dropped.
+
+        Returns:
+            bool: True if at least one target is still healthy
+        """
+        for target in self.targets:
+            target.queue.join()
+        return any(not t.failed.is_set() for t in self.targets)
+
+    def close(self):
+        """Flushes and stops every target's writer threads"""
+        for target in self.targets:
+            target.stop()
+
+    def healthy_targets(self):
+        """
+        Lists the targets that received every batch.
+
+        Returns:
+            list: WriteTarget instances that have not failed
+        """
+        return [t for t in self.targets if not t.failed.is_set()]
+
+    def report(self):
+        """
+        Logs and returns the per-target run reports.
+
+        Returns:
+            list: One report dict per target
+        """
+        reports = [target.report() for target in self.targets]
+        for r in reports:
+            logger.info(
+                f"Target {r['Table']} ({r['Profile'] or 'default'}/{r['Region'] or 'default'}): "
+                f"{r['Status']}, {r['Items']} items in {r['Seconds']}s "
+                f"({r['ItemsPerSecond']} items/sec), {r['WriteUnits']} WCU, "
+                f"{r['Retries']} retries, {r['UnprocessedItems']} unprocessed, "
+                f"{r['Errors']} errors, {r['DroppedItems']} dropped, "
+                f"{r['BudgetWaitSeconds']}s of writer time waiting on a "
+                f"{r['WCU'] or 'unlimited'} WCU budget")
+        return reports
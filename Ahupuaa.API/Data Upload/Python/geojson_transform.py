@@ -0,0 +1,676 @@
+"""
+Feature Transform Helpers for the Ahupuaa GeoJSON Import
+
+Converts a single GeoJSON feature into the DynamoDB item written by the
+importer: hierarchical keys, geohashes, bounds, centroid, simplified geometry
+levels, rendering hints and client caching metadata.
+
+These helpers do not touch AWS, so planning and offline tools can build the
+exact items the importer would write without a table or credentials.
+
+Requirements:
+  - ijson, geohash2 (pyarrow and numpy for GeoParquet/Arrow input)
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+from decimal import Decimal
+
+import geohash2  # For geohash generation
+import ijson
+
+from capacity_planner import item_size
+from streaming_parser import PackedGeometry, count_geojson_features, iter_packed_features
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever build_feature_item output changes, so cached items are rebuilt
+TRANSFORM_VERSION = 2
+# Simplification factor for map rendering (lower = more simplified)
+SIMPLIFIED_COORDS_FACTOR = 0.01
+# Geometry detail levels that can share one stored copy. SimplifiedBoundaries
+# comes first and is always kept, since the GSIs project it.
+GEOMETRY_LEVEL_ATTRIBUTES = ['SimplifiedBoundaries', 'LowDetailBoundaries',
+                             'HighDetailBoundaries', 'FullGeometry']
+# Read with geoparquet_reader (pyarrow is only needed for these)
+COLUMNAR_EXTENSIONS = ('.parquet', '.geoparquet', '.arrow', '.feather', '.ipc', '.arrows')
+# Stands in for a packed geometry while the rest of a feature is serialized
+GEOMETRY_PLACEHOLDER = '\x00packed-geometry\x00'
+
+
+def iter_features(filename, columns=None, packed=False):
+    """
+    Streams the features of a GeoJSON FeatureCollection one at a time.
+
+    GeoParquet and Arrow IPC files (by extension) are read with
+    geoparquet_reader and yield the same GeoJSON-shaped features.
+
+    Args:
+        filename: Path to the GeoJSON, GeoParquet or Arrow IPC file
+        columns: Property columns to read from columnar files, or None for all
+        packed: Parse GeoJSON with streaming_parser, yielding Polygon and
+            MultiPolygon geometry as PackedGeometry
+
+    Yields:
+        dict: GeoJSON feature
+    """
+    if filename.lower().endswith(COLUMNAR_EXTENSIONS):
+        from geoparquet_reader import iter_columnar_features
+        yield from iter_columnar_features(filename, columns)
+        return
+
+    if packed:
+        yield from iter_packed_features(filename)
+        return
+
+    with open(filename, 'rb') as f:
+        yield from ijson.items(f, 'features.item')
+
+
+def count_features(filename):
+    """
+    Counts the features of a source file, from metadata where the format has it.
+
+    Args:
+        filename: Path to the GeoJSON, GeoParquet or Arrow IPC file
+
+    Returns:
+        int: Number of features
+    """
+    if filename.lower().endswith(COLUMNAR_EXTENSIONS):
+        from geoparquet_reader import count_columnar_features
+        return count_columnar_features(filename)
+
+    return count_geojson_features(filename)
+
+
+def iter_polygons(geometry):
+    """
+    Yields the rings of each polygon in a Polygon or MultiPolygon geometry.
+
+    Args:
+        geometry: GeoJSON geometry object
+
+    Yields:
+        list: Rings of one polygon, exterior ring first
+    """
+    if not geometry or 'coordinates' not in geometry:
+        return
+    if geometry.get('type') == 'Polygon':
+        yield geometry['coordinates']
+    elif geometry.get('type') == 'MultiPolygon':
+        yield from geometry['coordinates']
+
+
+def replace_floats(obj):
+    """
+    Recursively converts all float values to Decimal for DynamoDB compatibility.
+    Uses precise string conversion to avoid floating-point issues.
+
+    Args:
+        obj: The object to process (list, dict, float, or other)
+
+    Returns:
+        The object with floats replaced by Decimal
+    """
+    if isinstance(obj, list):
+        return [replace_floats(i) for i in obj]
+    elif isinstance(obj, dict):
+        return {k: replace_floats(v) for k, v in obj.items()}
+    elif isinstance(obj, float):
+        # Use string with sufficient precision to maintain accuracy
+        # but trim unnecessary trailing zeros
+        s = f"{obj:.10f}".rstrip('0').rstrip('.') if obj != 0 else '0'
+        return Decimal(s)
+    else:
+        return obj
+
+
+def simplify_coordinates(coordinates, factor=SIMPLIFIED_COORDS_FACTOR):
+    """
+    Simplifies coordinate arrays for more efficient mobile rendering.
+
+    Args:
+        coordinates: GeoJSON coordinates array (can be nested)
+        factor: Simplification factor (lower = more simplified)
+
+    Returns:
+        Simplified coordinates
+    """
+    if isinstance(coordinates, list):
+        if all(isinstance(x, (int, float, Decimal)) for x in coordinates):
+            # This is a single coordinate pair, return as is
+            return coordinates
+        elif len(coordinates) > 100:  # Only simplify if many points
+            # This is a list of coordinates or nested lists
+            # Keep only a subset of points based on the factor
+            # For polygon boundaries, we preserve the shape while reducing points
+            step = max(1, int(1/factor))
+            # Always keep first and last point for polygons to ensure closure
+            if len(coordinates) > 2:
+                simplified = [coordinates[0]] + \
+                    coordinates[1:-1:step] + [coordinates[-1]]
+                return simplified
+
+        # For nested structures, recursively simplify
+        return [simplify_coordinates(c, factor) for c in coordinates]
+
+    return coordinates
+
+
+def simplify_geometry(geometry, factor=SIMPLIFIED_COORDS_FACTOR):
+    """
+    Simplifies a geometry's coordinates with simplify_coordinates.
+
+    Args:
+        geometry: GeoJSON geometry object or PackedGeometry
+        factor: Simplification factor (lower = more simplified)
+
+    Returns:
+        Geometry of the same kind with only 'type' and 'coordinates'
+    """
+    if isinstance(geometry, PackedGeometry):
+        return geometry.simplified(factor)
+    return {
+        'type': geometry['type'],
+        'coordinates': simplify_coordinates(geometry['coordinates'], factor)
+    }
+
+
+def geometry_json(geometry):
+    """
+    Serializes a geometry for storage, without expanding packed coordinates.
+
+    Args:
+        geometry: GeoJSON geometry object or PackedGeometry
+
+    Returns:
+        str: GeoJSON text
+    """
+    if isinstance(geometry, PackedGeometry):
+        return geometry.to_json()
+    return json.dumps(geometry, default=custom_json_encoder)
+
+
+def format_hierarchical_key(mokupuni, moku):
+    """
+    Formats a hierarchical sort key for the DynamoDB schema.
+
+    Args:
+        mokupuni: Island name
+        moku: District name
+
+    Returns:
+        str: Formatted hierarchical key
+    """
+    # Clean and standardize names
+    mokupuni = (mokupuni or "Unknown").strip()
+    moku = (moku or "Unknown").strip()
+
+    return f"MOKUPUNI#{mokupuni}#MOKU#{moku}"
+
+
+def guess_centroid_from_geometry(geometry):
+    """
+    Estimates a centroid from GeoJSON geometry when not explicitly provided.
+
+    Args:
+        geometry: GeoJSON geometry object
+
+    Returns:
+        dict: Centroid with lat/lng or None if can't be determined
+    """
+    try:
+        if geometry['type'] == 'Polygon':
+            # Average the coordinates of the first (exterior) ring
+            coordinates = geometry['coordinates'][0]
+            lat_sum = lng_sum = 0
+            for coord in coordinates:
+                lng_sum += float(coord[0])
+                lat_sum += float(coord[1])
+
+            return {
+                'lat': Decimal(str(lat_sum / len(coordinates))),
+                'lng': Decimal(str(lng_sum / len(coordinates)))
+            }
+        elif geometry['type'] == 'Point':
+            # Point is already a centroid
+            return {
+                'lat': Decimal(str(geometry['coordinates'][1])),
+                'lng': Decimal(str(geometry['coordinates'][0]))
+            }
+        else:
+            return None
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def extract_bounds_from_geometry(geometry):
+    """
+    Extracts bounding box from GeoJSON geometry.
+
+    Args:
+        geometry: GeoJSON geometry object
+
+    Returns:
+        dict: Bounds with northeast and southwest corners or None
+    """
+    try:
+        if geometry['type'] == 'Polygon':
+            # Find min/max coordinates
+            coordinates = geometry['coordinates'][0]
+            lats = [float(c[1]) for c in coordinates]
+            lngs = [float(c[0]) for c in coordinates]
+
+            return {
+                'northeast': {
+                    'lat': Decimal(str(max(lats))),
+                    'lng': Decimal(str(max(lngs)))
+                },
+                'southwest': {
+                    'lat': Decimal(str(min(lats))),
+                    'lng': Decimal(str(min(lngs)))
+                }
+            }
+        else:
+            return None
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def custom_json_encoder(obj):
+    """
+    Custom JSON encoder that handles Decimal objects properly.
+
+    Args:
+        obj: Object to encode
+
+    Returns:
+        Properly serialized value
+    """
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, PackedGeometry):
+        return obj.to_geojson()
+    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+
+def canonical_feature_parts(feature):
+    """
+    Serializes a feature with sorted keys, the form its hashes are computed over.
+
+    A packed geometry is serialized on its own, so hashes can be updated part
+    by part instead of from one more copy of the whole feature text.
+
+    Args:
+        feature: GeoJSON feature as parsed from the source file
+
+    Returns:
+        list: Strings that join into the canonical feature JSON, the same for
+        nested and packed geometry
+    """
+    geometry = feature.get('geometry')
+    if not isinstance(geometry, PackedGeometry):
+        return [json.dumps(feature, sort_keys=True, default=custom_json_encoder)]
+
+    text = json.dumps(dict(feature, geometry=GEOMETRY_PLACEHOLDER), sort_keys=True,
+                      default=custom_json_encoder)
+    before, _, after = text.partition(json.dumps(GEOMETRY_PLACEHOLDER))
+    return [before, geometry.to_json(sort_keys=True), after]
+
+
+def compute_feature_hash(feature):
+    """
+    Computes the content hash stored in Metadata.FeatureHash for client caching.
+
+    Args:
+        feature: GeoJSON feature as parsed from the source file
+
+    Returns:
+        str: Hex MD5 digest of the canonical feature JSON
+    """
+    digest = hashlib.md5()
+    for part in canonical_feature_parts(feature):
+        digest.update(part.encode())
+    return digest.hexdigest()
+
+
+def feature_identity(feature, feature_index):
+    """
+    Extracts the key and names the importer assigns to a feature.
+
+    Args:
+        feature: GeoJSON feature
+        feature_index: Position of the feature in the source file, used for fallbacks
+
+    Returns:
+        dict: FeatureId, AhupuaaPK, AhupuaaName, MokuName and MokupuniName
+    """
+    properties = feature.get('properties', {})
+
+    # Extract ahupuaa, moku, and mokupuni names with fallbacks
+    feature_id = feature.get(
+        'id', str(properties.get('objectid', f"{feature_index}")))
+
+    return {
+        'FeatureId': feature_id,
+        'AhupuaaPK': f"AHUPUAA#{feature_id}",
+        'AhupuaaName': properties.get(
+            'ahupuaa', properties.get('name', f"Ahupuaa_{feature_index}")),
+        'MokuName': properties.get('moku', 'Unknown'),
+        'MokupuniName': properties.get('mokupuni', 'Unknown')
+    }
+
+
+def build_feature_item(feature, feature_index, data_version):
+    """
+    Builds the DynamoDB item (low-level attribute format) for a GeoJSON feature.
+
+    Args:
+        feature: GeoJSON feature
+        feature_index: Position of the feature in the source file, used for fallbacks
+        data_version: Import version stamped into the item metadata
+
+    Returns:
+        dict: DynamoDB item ready to be wrapped in a PutRequest
+    """
+    # Extract key information
+    properties = feature.get('properties', {})
+    identity = feature_identity(feature, feature_index)
+    feature_id = identity['FeatureId']
+    ahupuaa_pk = identity['AhupuaaPK']
+    ahupuaa_name = identity['AhupuaaName']
+    moku_name = identity['MokuName']
+    mokupuni_name = identity['MokupuniName']
+
+    # Structure primary key
+    hierarchy_sk = format_hierarchical_key(
+        mokupuni_name, moku_name)
+
+    # Process geometry
+    geometry = replace_floats(feature.get('geometry') or {})
+
+    # Generate or extract bounds
+    bounds = feature.get('bounds')
+    if not bounds and geometry:
+        bounds = extract_bounds_from_geometry(geometry)
+
+    # Generate or extract centroid
+    centroid = None
+    if 'centroid_geopoint' in feature and isinstance(feature['centroid_geopoint'], dict):
+        centroid = feature['centroid_geopoint']
+    elif geometry:
+        centroid = guess_centroid_from_geometry(geometry)
+
+    # Generate geohash from centroid
+    geohash = feature.get('geohash')
+    if not geohash and centroid:
+        try:
+            # Generate geohash from centroid
+            geohash = geohash2.encode(
+                float(centroid['lat']),
+                float(centroid['lng']),
+                precision=7
+            )
+        except Exception as e:
+            logger.warning(
+                f"Could not generate geohash for feature {feature_id}: {e}")
+            geohash = "0000000"  # Default placeholder
+    elif not geohash:
+        geohash = "0000000"  # Default when no centroid available
+
+    # First 3 chars for bounding box queries
+    geohash_prefix = geohash[:3]
+
+    # Create simplified geometry for mobile rendering
+    simplified_geometry = None
+    if geometry and 'coordinates' in geometry:
+        simplified_geometry = simplify_geometry(geometry)
+
+    # Default zoom level - can be adjusted later based on feature size
+    zoom_level = 10
+
+    # Create item for DynamoDB that matches your schema
+    item = {
+        # Primary key - matching your Terraform schema
+        'AhupuaaPK': {'S': ahupuaa_pk},
+        'HierarchySK': {'S': hierarchy_sk},
+
+        # Attributes used in GSIs
+        'AhupuaaName': {'S': ahupuaa_name},
+        'MokupuniName': {'S': mokupuni_name},
+        'MokuName': {'S': moku_name},
+        'Geohash': {'S': geohash},
+        'GeohashPrefix': {'S': geohash_prefix},
+        'ZoomLevel': {'N': str(zoom_level)},
+
+        # Store simplified GeoJSON for faster mobile rendering
+        'SimplifiedBoundaries': {'S': geometry_json(simplified_geometry or geometry)}
+    }
+
+    # Add non-key attributes
+    if centroid:
+        item['Centroid'] = {
+            'M': {
+                'Lat': {'N': str(centroid['lat'])},
+                'Lng': {'N': str(centroid['lng'])}
+            }
+        }
+
+    # Add MapKit annotation point
+    if centroid:
+        item['AnnotationPoint'] = {
+            'S': json.dumps({
+                'coordinate': [float(centroid['lng']), float(centroid['lat'])],
+                'title': ahupuaa_name,
+                'subtitle': f"{moku_name}, {mokupuni_name}"
+            })
+        }
+
+    # Add display priority based on feature size or importance
+    area = properties.get(
+        'gisacres', properties.get('st_areashape', 0))
+    try:
+        area_value = float(area)
+        # Large areas get higher priority (will be displayed at lower zoom levels)
+        priority = min(10, max(1, int(area_value / 10000)))
+    except (ValueError, TypeError):
+        priority = 5  # Default priority
+
+    item['DisplayPriority'] = {
+        'N': str(priority)}
+
+    if bounds:
+        item['Bounds'] = {
+            'M': {
+                'Northeast': {
+                    'M': {
+                        'Lat': {'N': str(bounds['northeast']['lat'])},
+                        'Lng': {'N': str(bounds['northeast']['lng'])}
+                    }
+                },
+                'Southwest': {
+                    'M': {
+                        'Lat': {'N': str(bounds['southwest']['lat'])},
+                        'Lng': {'N': str(bounds['southwest']['lng'])}
+                    }
+                }
+            }
+        }
+
+    # Add MBR (Minimum Bounding Rectangle) as a separate attribute
+    if bounds:
+        item['MBR'] = {
+            'S': json.dumps([
+                [float(bounds['southwest']['lng']),
+                 float(bounds['southwest']['lat'])],
+                [float(bounds['northeast']['lng']),
+                 float(bounds['northeast']['lat'])]
+            ])
+        }
+
+    # Add zoom level range based on feature size
+    if bounds:
+        # Calculate approximate size in degrees
+        size_deg = max(
+            float(bounds['northeast']['lat']) -
+            float(bounds['southwest']['lat']),
+            float(bounds['northeast']['lng']) -
+            float(bounds['southwest']['lng'])
+        )
+
+        # Set min/max zoom based on feature size
+        min_zoom = 5  # Default for large features
+        max_zoom = 16  # Default for detailed view
+
+        if size_deg < 0.01:  # Very small features
+            min_zoom = 12
+        elif size_deg < 0.05:  # Small features
+            min_zoom = 10
+        elif size_deg < 0.2:  # Medium features
+            min_zoom = 8
+
+        item['MinZoom'] = {
+            'N': str(min_zoom)}
+        item['MaxZoom'] = {
+            'N': str(max_zoom)}
+
+    # Add geometry type
+    if 'type' in geometry:
+        item['GeometryType'] = {
+            'S': geometry['type']}
+
+    # Add full geometry (can be used for detailed analysis)
+    item['FullGeometry'] = {
+        'S': geometry_json(geometry)}
+
+    # Add style properties for the map
+    item['StyleProperties'] = {
+        'M': {
+            'FillColor': {'S': '#A3C1AD'},   # Default fill color
+            # Default border color
+            'BorderColor': {'S': '#2A6041'},
+            # Default border width
+            'BorderWidth': {'N': '2'}
+        }
+    }
+
+    # Create multiple simplification levels
+    if geometry and 'coordinates' in geometry:
+        # High simplification (low detail for low zoom levels)
+        low_geometry = simplify_geometry(geometry, factor=0.005)
+
+        # Low simplification (high detail for high zoom levels)
+        high_geometry = simplify_geometry(geometry, factor=0.03)
+
+        item['LowDetailBoundaries'] = {'S': geometry_json(low_geometry)}
+
+        item['HighDetailBoundaries'] = {'S': geometry_json(high_geometry)}
+
+    # Add rendering hints for iOS
+    item['iOSRenderingHints'] = {
+        'M': {
+            'StrokeWidth': {'N': '2'},
+            'FillOpacity': {'N': '0.5'},
+            'StrokeOpacity': {'N': '0.8'},
+            # Use priority for z-index
+            'ZIndex': {'N': str(priority)},
+            # Solid line by default
+            'LineDashPattern': {'S': '[0]'},
+            # Lighter color when selected
+            'SelectedFillColor': {'S': '#C1E1AD'},
+            # Darker stroke when selected
+            'SelectedStrokeColor': {'S': '#205841'},
+        }
+    }
+
+    # Add original properties from GeoJSON
+    if properties:
+        properties_map = {}
+        for key, value in replace_floats(properties).items():
+            # bool before int, since True and False are ints too
+            if isinstance(value, str):
+                properties_map[key] = {'S': value}
+            elif isinstance(value, bool):
+                properties_map[key] = {'BOOL': value}
+            elif isinstance(value, (int, Decimal)):
+                properties_map[key] = {'N': str(value)}
+            elif value is None:
+                properties_map[key] = {'NULL': True}
+            else:
+                # Convert complex types to string
+                properties_map[key] = {'S': json.dumps(
+                    value, default=custom_json_encoder)}
+
+        item['Properties'] = {
+            'M': properties_map}
+
+    # Add metadata for client caching
+    item['Metadata'] = {
+        'M': {
+            'DataVersion': {'N': str(data_version)},
+            'FeatureHash': {'S': compute_feature_hash(feature)},
+            'LastUpdated': {'S': datetime.datetime.now().isoformat()},
+        }
+    }
+
+    return item
+
+
+def dedupe_geometry_levels(item):
+    """
+    Stores each distinct geometry level of an item once.
+
+    Small rings come back from simplify_coordinates unchanged, so several
+    levels are often byte-identical. Each repeated level is dropped and
+    recorded in GeometryRefs as a reference to the level that holds the same
+    string.
+
+    Args:
+        item: DynamoDB item in low-level attribute format
+
+    Returns:
+        tuple: (item with repeated levels replaced by references, bytes saved)
+    """
+    stored = {}
+    refs = {}
+    for name in GEOMETRY_LEVEL_ATTRIBUTES:
+        value = item.get(name, {}).get('S')
+        if value is None:
+            continue
+        if value in stored:
+            refs[name] = {'S': stored[value]}
+        else:
+            stored[value] = name
+
+    if not refs:
+        return item, 0
+
+    deduped = {k: v for k, v in item.items() if k not in refs}
+    deduped['GeometryRefs'] = {'M': refs}
+    return deduped, item_size(item) - item_size(deduped)
+
+
+def resolve_geometry_refs(item):
+    """
+    Restores the geometry levels of an item written with dedupe_geometry_levels.
+
+    Args:
+        item: DynamoDB item in low-level attribute format
+
+    Returns:
+        dict: Item with every geometry level present and no GeometryRefs
+    """
+    if not item or 'GeometryRefs' not in item:
+        return item
+
+    resolved = {k: v for k, v in item.items() if k != 'GeometryRefs'}
+    for name, target in item['GeometryRefs']['M'].items():
+        if target['S'] in resolved:
+            resolved[name] = resolved[target['S']]
+        else:
+            logger.warning(
+                f"Geometry level {name} of {item['AhupuaaPK']['S']} references missing {target['S']}")
+    return resolved
@@ -0,0 +1,426 @@
+"""
+Per-Cell Clipped Geometry Fragments for Large Ahupuaa
+
+Large ahupuaa run from the mountains to the sea and cover many map cells.
+A zoomed-in view that touches one of them still fetches its whole
+FullGeometry string, even when the viewport shows only a sliver. This stage
+clips each feature's full geometry against the geohash grid at a configurable
+precision and stores every non-empty piece as a small fragment item:
+
+  - CELL#<geohash> / <feature AhupuaaPK>#<geohash>  (ItemType Fragment, Geometry, feature names)
+
+A zoomed-in viewport then maps to a handful of cells. One Query per cell
+returns just the geometry inside it. Where a feature is too dense for one
+small item per cell, its piece is split again into child geohash cells under
+the same partition, named by the child geohash in the sort key. Features that fit in a single cell are
+not fragmented, since the fragment would be the whole geometry. The feature
+item records FragmentPrecision, so readers know its fragments exist.
+
+Clipping is Sutherland-Hodgman against each cell rectangle, vectorized with
+NumPy, one ring at a time. Holes are clipped like exterior rings. Fragment
+outlines include the cell edges, so renderers should take strokes from the
+feature's own boundary levels and use fragments for fills and detail.
+
+Fragments are opt-in: the importer writes them only with --fragment-precision
+(5 is a good start). Each large feature then adds several fragment items,
+and readers that Scan the whole table pay read capacity for them. The API's
+scans keep only items without an ItemType, so fragments never reach their
+results, but the scans cost more while fragments are stored.
+
+Usage:
+  python geometry_fragments.py --table AhupuaaGIS --bbox -156.70 20.85 -156.60 20.95 -o view.geojson
+"""
+
+import argparse
+import json
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import geohash2
+import numpy as np
+
+from capacity_planner import ITEM_SIZE_LIMIT, item_size
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FRAGMENT_PRECISION = 0  # The importer writes no fragments unless asked to
+FRAGMENT_PRECISION = 5  # Geohash cells about 4.9 x 4.9 km
+FRAGMENT_SOURCE_ATTRIBUTE = 'FullGeometry'
+FRAGMENT_COORD_DECIMALS = 7  # About 1 cm, plenty for rendering
+FRAGMENT_MAX_BYTES = 64 * 1024  # Larger fragments are split into the 32 child cells
+MAX_SUBDIVISION_DEPTH = 2  # Child cell levels below the import precision
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+MAX_VIEWPORT_CELLS = 64  # Wider viewports should use the simplified levels instead
+MAX_WORKERS = 10  # Parallel cell queries when reading a viewport
+
+
+def format_cell_pk(geohash):
+    """
+    Formats the partition key of a cell's fragments.
+
+    Args:
+        geohash: Geohash of the cell
+
+    Returns:
+        str: Partition key
+    """
+    return f"CELL#{geohash}"
+
+
+def cell_size(precision):
+    """
+    Returns the size of a geohash cell.
+
+    Args:
+        precision: Geohash length
+
+    Returns:
+        tuple: (width, height) in degrees
+    """
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 360.0 / (1 << lng_bits), 180.0 / (1 << lat_bits)
+
+
+def covering_cells(min_lng, min_lat, max_lng, max_lat, precision=FRAGMENT_PRECISION):
+    """
+    Lists the geohash cells that intersect a bounding box.
+
+    Args:
+        min_lng: West edge
+        min_lat: South edge
+        max_lng: East edge
+        max_lat: North edge
+        precision: Geohash length
+
+    Returns:
+        list: (geohash, (min lng, min lat, max lng, max lat)) per cell
+    """
+    width, height = cell_size(precision)
+    cells = []
+    for iy in range(math.floor((min_lat + 90) / height), math.floor((max_lat + 90) / height) + 1):
+        cell_min_lat = iy * height - 90
+        for ix in range(math.floor((min_lng + 180) / width),
+                        math.floor((max_lng + 180) / width) + 1):
+            cell_min_lng = ix * width - 180
+            geohash = geohash2.encode(cell_min_lat + height / 2, cell_min_lng + width / 2,
+                                      precision=precision)
+            cells.append((geohash, (cell_min_lng, cell_min_lat,
+                                    cell_min_lng + width, cell_min_lat + height)))
+    return cells
+
+
+def _clip_half_plane(points, axis, bound, keep_above):
+    inside = points[:, axis] >= bound if keep_above else points[:, axis] <= bound
+    if inside.all():
+        return points
+    if not inside.any():
+        return points[:0]
+
+    # Edge i runs from point i-1 to point i; crossings get an intersection point
+    previous = np.roll(points, 1, axis=0)
+    previous_inside = np.roll(inside, 1)
+    crosses = inside != previous_inside
+
+    delta = points[:, axis] - previous[:, axis]
+    t = np.divide(bound - previous[:, axis], delta, out=np.zeros_like(delta), where=crosses)
+    intersections = previous + (points - previous) * t[:, None]
+    intersections[:, axis] = bound
+
+    # Per edge: the intersection (if it crosses), then the end point (if inside)
+    candidates = np.stack([intersections, points], axis=1)
+    keep = np.stack([crosses, inside], axis=1)
+    return candidates[keep]
+
+
+def clip_ring(ring, bounds):
+    """
+    Clips a ring to a rectangle (Sutherland-Hodgman).
+
+    Args:
+        ring: Closed ring as an (n, 2) array
+        bounds: (min lng, min lat, max lng, max lat)
+
+    Returns:
+        numpy.ndarray: Closed clipped ring, or None if less than a triangle remains
+    """
+    points = ring[:-1] if len(ring) > 1 and np.array_equal(ring[0], ring[-1]) else ring
+    min_lng, min_lat, max_lng, max_lat = bounds
+    for axis, bound, keep_above in ((0, min_lng, True), (0, max_lng, False),
+                                    (1, min_lat, True), (1, max_lat, False)):
+        points = _clip_half_plane(points, axis, bound, keep_above)
+        if len(points) < 3:
+            return None
+
+    return np.vstack([points, points[:1]])
+
+
+def _polygons(geometry):
+    if geometry.get('type') == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry.get('type') == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+def _ring_bounds(ring):
+    return ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max()
+
+
+def cell_bounds(geohash):
+    """
+    Returns the rectangle of a geohash cell.
+
+    Args:
+        geohash: Geohash of the cell
+
+    Returns:
+        tuple: (min lng, min lat, max lng, max lat)
+    """
+    lat, lng, lat_error, lng_error = geohash2.decode_exactly(geohash)
+    return lng - lng_error, lat - lat_error, lng + lng_error, lat + lat_error
+
+
+def clip_polygons(polygons, bounds):
+    """
+    Clips polygons to a rectangle.
+
+    Args:
+        polygons: (rings, exterior bounds) per polygon, rings as (n, 2) arrays
+        bounds: (min lng, min lat, max lng, max lat)
+
+    Returns:
+        list: The pieces inside, in the same form
+    """
+    min_lng, min_lat, max_lng, max_lat = bounds
+    pieces = []
+    for rings, (r_min_lng, r_min_lat, r_max_lng, r_max_lat) in polygons:
+        if r_min_lng > max_lng or r_max_lng < min_lng or r_min_lat > max_lat or r_max_lat < min_lat:
+            continue
+        exterior = clip_ring(rings[0], bounds)
+        if exterior is None:
+            continue
+        holes = [h for h in (clip_ring(r, bounds) for r in rings[1:]) if h is not None]
+        pieces.append(([exterior] + holes, _ring_bounds(exterior)))
+    return pieces
+
+
+def polygons_to_geometry(polygons):
+    """
+    Converts clipped polygons to a GeoJSON geometry.
+
+    Args:
+        polygons: (rings, exterior bounds) per polygon
+
+    Returns:
+        dict: GeoJSON Polygon or MultiPolygon
+    """
+    coordinates = [[np.round(r, FRAGMENT_COORD_DECIMALS).tolist() for r in rings]
+                   for rings, _ in polygons]
+    if len(coordinates) == 1:
+        return {'type': 'Polygon', 'coordinates': coordinates[0]}
+    return {'type': 'MultiPolygon', 'coordinates': coordinates}
+
+
+def _cell_pieces(polygons, geohash, bounds, depth=0):
+    clipped = clip_polygons(polygons, bounds)
+    if not clipped:
+        return []
+
+    geometry = json.dumps(polygons_to_geometry(clipped), separators=(',', ':'))
+    if len(geometry) <= FRAGMENT_MAX_BYTES or depth >= MAX_SUBDIVISION_DEPTH:
+        return [(geohash, geometry)]
+
+    # Too dense for one item: split into the 32 child cells, clipping only what is left
+    return [piece for child in (geohash + c for c in GEOHASH_ALPHABET)
+            for piece in _cell_pieces(clipped, child, cell_bounds(child), depth + 1)]
+
+
+def build_fragment_items(item, precision=FRAGMENT_PRECISION):
+    """
+    Clips a feature item's full geometry into per-cell fragment items.
+
+    A cell whose fragment is larger than FRAGMENT_MAX_BYTES is split further
+    into child geohash cells. The pieces stay in the partition of the cell at
+    the import precision, so readers still query one partition per cell.
+    Marks the feature item with FragmentPrecision when fragments are returned.
+
+    Args:
+        item: Feature item in low-level attribute format, before geometry dedupe
+        precision: Geohash length of the cells
+
+    Returns:
+        list: Fragment items, empty when the feature fits in one cell, has no
+        polygon geometry or would produce an item over the size limit
+    """
+    if FRAGMENT_SOURCE_ATTRIBUTE not in item:
+        return []
+    geometry = json.loads(item[FRAGMENT_SOURCE_ATTRIBUTE]['S'])
+
+    polygons = []
+    for polygon in _polygons(geometry):
+        rings = [np.asarray([c[:2] for c in ring], dtype=np.float64)
+                 for ring in polygon if len(ring) >= 4]
+        if rings:
+            polygons.append((rings, _ring_bounds(rings[0])))
+    if not polygons:
+        return []
+
+    cells = covering_cells(min(b[0] for _, b in polygons), min(b[1] for _, b in polygons),
+                           max(b[2] for _, b in polygons), max(b[3] for _, b in polygons),
+                           precision)
+    if len(cells) < 2:
+        return []
+
+    feature_pk = item['AhupuaaPK']['S']
+    fragments = []
+    for geohash, bounds in cells:
+        for piece_geohash, piece_geometry in _cell_pieces(polygons, geohash, bounds):
+            fragment = {
+                'AhupuaaPK': {'S': format_cell_pk(geohash)},
+                'HierarchySK': {'S': f"{feature_pk}#{piece_geohash}"},
+                'ItemType': {'S': 'Fragment'},
+                'FeaturePK': item['AhupuaaPK'],
+                'FeatureSK': item['HierarchySK'],
+                # Own attribute names keep fragments out of the name-keyed GSIs
+                'FeatureName': item['AhupuaaName'],
+                'FeatureMoku': item['MokuName'],
+                'FeatureMokupuni': item['MokupuniName'],
+                'Geometry': {'S': piece_geometry},
+                'DataVersion': item['Metadata']['M']['DataVersion']
+            }
+            size = item_size(fragment)
+            if size > ITEM_SIZE_LIMIT:
+                logger.warning(
+                    f"Fragment of {feature_pk} in cell {piece_geohash} is {size} bytes; "
+                    f"leaving the feature unfragmented")
+                return []
+            fragments.append(fragment)
+
+    if len(fragments) < 2:
+        return []
+
+    item['FragmentPrecision'] = {'N': str(precision)}
+    return fragments
+
+
+def read_viewport_fragments(client, table_name, min_lng, min_lat, max_lng, max_lat,
+                            precision=FRAGMENT_PRECISION, max_cells=MAX_VIEWPORT_CELLS):
+    """
+    Fetches the fragments of every cell a viewport touches, querying cells in parallel.
+
+    Args:
+        client: boto3 DynamoDB client
+        table_name: Name of the DynamoDB table
+        min_lng: West edge
+        min_lat: South edge
+        max_lng: East edge
+        max_lat: North edge
+        precision: Geohash length the fragments were written with
+        max_cells: Largest number of cells to query
+
+    Returns:
+        dict: Feature AhupuaaPK to list of fragment items, or None when the
+        viewport covers more than max_cells cells
+    """
+    cells = covering_cells(min_lng, min_lat, max_lng, max_lat, precision)
+    if len(cells) > max_cells:
+        logger.info(
+            f"Viewport covers {len(cells)} cells, more than {max_cells}; "
+            f"use the simplified boundaries instead")
+        return None
+
+    def query_cell(geohash):
+        query_kwargs = {
+            'TableName': table_name,
+            'KeyConditionExpression': 'AhupuaaPK = :pk',
+            'ExpressionAttributeValues': {':pk': {'S': format_cell_pk(geohash)}}
+        }
+        items = []
+        while True:
+            response = client.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(cells))) as executor:
+        results = list(executor.map(query_cell, [geohash for geohash, _ in cells]))
+
+    fragments = {}
+    for items in results:
+        for fragment in items:
+            fragments.setdefault(fragment['FeaturePK']['S'], []).append(fragment)
+    return fragments
+
+
+def fragments_to_geojson(fragments):
+    """
+    Converts viewport fragments into a GeoJSON FeatureCollection, one feature per fragment.
+
+    Args:
+        fragments: Result of read_viewport_fragments
+
+    Returns:
+        dict: GeoJSON FeatureCollection
+    """
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': json.loads(f['Geometry']['S']),
+                'properties': {
+                    'ahupuaa_pk': feature_pk,
+                    'cell': f['HierarchySK']['S'].rpartition('#')[2],
+                    'ahupuaa': f['FeatureName']['S'],
+                    'moku': f['FeatureMoku']['S'],
+                    'mokupuni': f['FeatureMokupuni']['S']
+                }
+            }
+            for feature_pk, items in sorted(fragments.items()) for f in items
+        ]
+    }
+
+
+def parse_arguments():
+    """
+    Parse command line arguments for the script.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Fetch the clipped geometry fragments inside a viewport')
+    parser.add_argument('--table', type=str, default='AhupuaaGIS',
+                        help='Table holding the fragments (default: AhupuaaGIS)')
+    parser.add_argument('--bbox', type=float, nargs=4, required=True,
+                        metavar=('MIN_LNG', 'MIN_LAT', 'MAX_LNG', 'MAX_LAT'))
+    parser.add_argument('--precision', type=int, default=FRAGMENT_PRECISION,
+                        help=f'Geohash length of the cells (default: {FRAGMENT_PRECISION})')
+    parser.add_argument('-o', '--output', help='Write the fragments to this GeoJSON file')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    import sys
+
+    import boto3
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+
+    viewport_fragments = read_viewport_fragments(boto3.client('dynamodb'), args.table,
+                                                 *args.bbox, precision=args.precision)
+    if viewport_fragments is None:
+        sys.exit(1)
+
+    collection = fragments_to_geojson(viewport_fragments)
+    logger.info(
+        f"{len(collection['features'])} fragments of {len(viewport_fragments)} features "
+        f"in the viewport")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(collection, f)
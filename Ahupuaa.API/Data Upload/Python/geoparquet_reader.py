@@ -0,0 +1,392 @@
+"""
+GeoParquet and Arrow IPC Input for the Ahupuaa Import
+
+The upstream GIS exports are also published as GeoParquet, with WKB geometry
+and typed property columns. Reading those skips the slowest part of the
+import, which is parsing GeoJSON text number by number with ijson. Files are
+read one record batch at a time, and only the requested columns are read.
+WKB is decoded with NumPy straight into coordinate lists. Each row is then
+yielded as a GeoJSON-shaped feature, so build_feature_item and the rest of the
+pipeline work unchanged:
+
+  - the WKB geometry column (GeoParquet "geo" metadata primary_column, or a
+    binary column named geometry) becomes feature['geometry']
+  - an "id" column becomes feature['id']
+  - every other column (ahupuaa, moku, mokupuni, objectid, gisacres,
+    st_areashape, ...) becomes a property, with timestamps and dates as ISO
+    strings
+
+geojson_transform.iter_features dispatches here on the file extension.
+
+Coordinates and float columns come through as floats rather than the exact
+Decimals ijson yields, so replace_floats rounds them to 10 decimal places
+(about 10 micrometres) in the stored geometry. Metadata.FeatureHash is
+computed from the float values and matches the GeoJSON path, so switching
+formats does not show up as changes in the version manifests.
+
+Usage:
+  python geoparquet_reader.py ahupuaa.parquet --compare ahupuaa.geojson
+  python geoparquet_reader.py --convert ahupuaa.geojson ahupuaa.parquet
+
+Requirements:
+  - pyarrow, numpy
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import struct
+import time
+from decimal import Decimal
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+PARQUET_EXTENSIONS = ('.parquet', '.geoparquet')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc', '.arrows')
+BATCH_ROWS = 1024  # Rows per record batch
+GEOMETRY_COLUMN = 'geometry'
+FEATURE_ID_COLUMN = 'id'
+
+WKB_POINT = 1
+WKB_LINESTRING = 2
+WKB_POLYGON = 3
+WKB_MULTIPOINT = 4
+WKB_MULTILINESTRING = 5
+WKB_MULTIPOLYGON = 6
+WKB_TYPE_NAMES = {WKB_POINT: 'Point', WKB_LINESTRING: 'LineString', WKB_POLYGON: 'Polygon',
+                  WKB_MULTIPOINT: 'MultiPoint', WKB_MULTILINESTRING: 'MultiLineString',
+                  WKB_MULTIPOLYGON: 'MultiPolygon'}
+EWKB_Z = 0x80000000
+EWKB_M = 0x40000000
+EWKB_SRID = 0x20000000
+
+
+def _read_header(buf, offset):
+    byte_order = '<' if buf[offset] == 1 else '>'
+    (code,) = struct.unpack_from(f'{byte_order}I', buf, offset + 1)
+    offset += 5
+
+    # EWKB flags, with an optional SRID after the type
+    dims = 2
+    if code & EWKB_Z:
+        dims += 1
+    if code & EWKB_M:
+        dims += 1
+    if code & EWKB_SRID:
+        offset += 4
+    code &= 0x0FFFFFFF
+
+    # ISO WKB: 1000s are Z, 2000s are M and 3000s are ZM
+    dims += {0: 0, 1: 1, 2: 1, 3: 2}[code // 1000]
+    return byte_order, code % 1000, dims, offset
+
+
+def _read_points(buf, offset, byte_order, dims, count):
+    values = np.frombuffer(buf, dtype=f'{byte_order}f8', count=count * dims, offset=offset)
+    if dims != 2:
+        values = values.reshape(count, dims)[:, :2]
+    return values.reshape(count, 2).tolist(), offset + count * dims * 8
+
+
+def _read_geometry(buf, offset):
+    byte_order, geometry_type, dims, offset = _read_header(buf, offset)
+    count_format = f'{byte_order}I'
+
+    if geometry_type == WKB_POINT:
+        points, offset = _read_points(buf, offset, byte_order, dims, 1)
+        return geometry_type, points[0], offset
+
+    if geometry_type == WKB_LINESTRING:
+        (count,) = struct.unpack_from(count_format, buf, offset)
+        points, offset = _read_points(buf, offset + 4, byte_order, dims, count)
+        return geometry_type, points, offset
+
+    if geometry_type == WKB_POLYGON:
+        (ring_count,) = struct.unpack_from(count_format, buf, offset)
+        offset += 4
+        rings = []
+        for _ in range(ring_count):
+            (count,) = struct.unpack_from(count_format, buf, offset)
+            ring, offset = _read_points(buf, offset + 4, byte_order, dims, count)
+            rings.append(ring)
+        return geometry_type, rings, offset
+
+    if geometry_type in (WKB_MULTIPOINT, WKB_MULTILINESTRING, WKB_MULTIPOLYGON):
+        (part_count,) = struct.unpack_from(count_format, buf, offset)
+        offset += 4
+        parts = []
+        for _ in range(part_count):
+            _, part, offset = _read_geometry(buf, offset)
+            parts.append(part)
+        return geometry_type, parts, offset
+
+    raise ValueError(f"Unsupported WKB geometry type {geometry_type}")
+
+
+def decode_wkb(wkb):
+    """
+    Decodes a WKB (ISO or EWKB) geometry into a GeoJSON geometry.
+
+    Args:
+        wkb: WKB bytes
+
+    Returns:
+        dict: GeoJSON geometry with float coordinates, or None for empty input
+    """
+    if not wkb:
+        return None
+    geometry_type, coordinates, _ = _read_geometry(memoryview(wkb), 0)
+    return {'type': WKB_TYPE_NAMES[geometry_type], 'coordinates': coordinates}
+
+
+def _encode_coordinates(geometry_type, coordinates):
+    if geometry_type == WKB_POINT:
+        return struct.pack('<2d', *coordinates[:2])
+    if geometry_type == WKB_LINESTRING:
+        values = [float(v) for c in coordinates for v in c[:2]]
+        return struct.pack(f'<I{len(values)}d', len(coordinates), *values)
+    if geometry_type == WKB_POLYGON:
+        return struct.pack('<I', len(coordinates)) + b''.join(
+            _encode_coordinates(WKB_LINESTRING, ring) for ring in coordinates)
+
+    part_type = geometry_type - 3
+    return struct.pack('<I', len(coordinates)) + b''.join(
+        struct.pack('<BI', 1, part_type) + _encode_coordinates(part_type, part)
+        for part in coordinates)
+
+
+def encode_wkb(geometry):
+    """
+    Encodes a GeoJSON geometry as little-endian 2D WKB.
+
+    Args:
+        geometry: GeoJSON geometry
+
+    Returns:
+        bytes: WKB, or None for a missing geometry
+    """
+    if not geometry or 'coordinates' not in geometry:
+        return None
+    type_codes = {name: code for code, name in WKB_TYPE_NAMES.items()}
+    geometry_type = type_codes[geometry['type']]
+    return struct.pack('<BI', 1, geometry_type) + \
+        _encode_coordinates(geometry_type, geometry['coordinates'])
+
+
+def _geometry_column(schema):
+    metadata = schema.metadata or {}
+    if b'geo' in metadata:
+        geo = json.loads(metadata[b'geo'])
+        name = geo.get('primary_column', GEOMETRY_COLUMN)
+        encoding = geo.get('columns', {}).get(name, {}).get('encoding', 'WKB')
+        if encoding.upper() != 'WKB':
+            raise ValueError(f"Geometry column {name} uses {encoding} encoding; only WKB is supported")
+        return name
+
+    if GEOMETRY_COLUMN in schema.names:
+        return GEOMETRY_COLUMN
+    raise ValueError("No geometry column found (expected GeoParquet metadata or a 'geometry' column)")
+
+
+def _property_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, float) and value != value:
+        return None  # NaN has no JSON or DynamoDB representation
+    return value
+
+
+def _open_batches(filename, columns, batch_rows):
+    if filename.lower().endswith(PARQUET_EXTENSIONS):
+        parquet_file = pq.ParquetFile(filename)
+        schema = parquet_file.schema_arrow
+        geometry_column = _geometry_column(schema)
+        if columns is not None:
+            columns = [c for c in schema.names if c in set(columns) | {geometry_column}]
+        return geometry_column, parquet_file.iter_batches(batch_size=batch_rows, columns=columns)
+
+    source = pa.memory_map(filename, 'r')
+    try:
+        reader = ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = ipc.open_stream(source)
+        batches = iter(reader)
+    geometry_column = _geometry_column(reader.schema)
+    if columns is not None:
+        wanted = set(columns) | {geometry_column}
+        batches = (batch.select([c for c in batch.schema.names if c in wanted])
+                   for batch in batches)
+    return geometry_column, batches
+
+
+def iter_columnar_features(filename, columns=None, batch_rows=BATCH_ROWS):
+    """
+    Streams the rows of a GeoParquet or Arrow IPC file as GeoJSON features.
+
+    Args:
+        filename: Path to the source file
+        columns: Property columns to read, or None for all (the geometry
+            column is always read)
+        batch_rows: Rows per record batch
+
+    Yields:
+        dict: GeoJSON feature
+    """
+    geometry_column, batches = _open_batches(filename, columns, batch_rows)
+    for batch in batches:
+        names = [n for n in batch.schema.names if n != geometry_column]
+        geometries = batch.column(geometry_column).to_pylist()
+        values = [batch.column(n).to_pylist() for n in names]
+
+        for row, wkb in enumerate(geometries):
+            properties = {}
+            feature = {'type': 'Feature', 'properties': properties, 'geometry': decode_wkb(wkb)}
+            for name, column in zip(names, values):
+                value = _property_value(column[row])
+                if name == FEATURE_ID_COLUMN:
+                    if value is not None:
+                        feature['id'] = str(value)
+                else:
+                    properties[name] = value
+            yield feature
+
+
+def count_columnar_features(filename):
+    """
+    Counts the rows of a GeoParquet or Arrow IPC file from its metadata.
+
+    Args:
+        filename: Path to the source file
+
+    Returns:
+        int: Number of features
+    """
+    if filename.lower().endswith(PARQUET_EXTENSIONS):
+        return pq.ParquetFile(filename).metadata.num_rows
+    return sum(batch.num_rows for batch in _open_batches(filename, [], BATCH_ROWS)[1])
+
+
+def geojson_to_geoparquet(geojson_path, parquet_path, features):
+    """
+    Writes GeoJSON features as a GeoParquet file with WKB geometry.
+
+    Property columns get their types inferred by Arrow, with nulls where a
+    feature lacks a property another feature has. This is meant for
+    benchmarks and local testing; the upstream exports remain the source of
+    truth.
+
+    Args:
+        geojson_path: Source path, recorded in the log
+        parquet_path: Path of the GeoParquet file to write
+        features: Iterable of GeoJSON features
+
+    Returns:
+        int: Number of features written
+    """
+    rows = []
+    for feature in features:
+        row = {}
+        for key, value in feature.get('properties', {}).items():
+            row[key] = float(value) if isinstance(value, Decimal) else value
+        if 'id' in feature:
+            row[FEATURE_ID_COLUMN] = str(feature['id'])
+        row[GEOMETRY_COLUMN] = encode_wkb(json.loads(json.dumps(
+            feature.get('geometry'), default=float)))
+        rows.append(row)
+
+    # from_pylist would take the columns from the first row only
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, None)
+    table = pa.Table.from_pydict({key: [row.get(key) for row in rows] for key in columns})
+    geo = {
+        'version': '1.0.0',
+        'primary_column': GEOMETRY_COLUMN,
+        'columns': {GEOMETRY_COLUMN: {'encoding': 'WKB', 'geometry_types': ['Polygon', 'MultiPolygon']}}
+    }
+    table = table.replace_schema_metadata({b'geo': json.dumps(geo).encode('utf-8')})
+    pq.write_table(table, parquet_path)
+    logger.info(f"Wrote {len(rows)} features from {geojson_path} to {parquet_path}")
+    return len(rows)
+
+
+def benchmark_parse(filename, columns=None, repeat=3):
+    """
+    Measures how fast a file's features can be read.
+
+    Args:
+        filename: GeoJSON, GeoParquet or Arrow IPC file
+        columns: Property columns to read from columnar files
+        repeat: Passes to time; the fastest is reported
+
+    Returns:
+        dict: Features, Vertices, Seconds and the per-second rates
+    """
+    from geojson_transform import iter_features, iter_polygons
+
+    best = None
+    features = vertices = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        features = vertices = 0
+        for feature in iter_features(filename, columns):
+            features += 1
+            for polygon in iter_polygons(feature.get('geometry')):
+                vertices += sum(len(ring) for ring in polygon)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {
+        'Features': features,
+        'Vertices': vertices,
+        'Seconds': best,
+        'FeaturesPerSecond': features / best if best else 0.0,
+        'VerticesPerSecond': vertices / best if best else 0.0
+    }
+
+
+def parse_arguments():
+    """
+    Parse command line arguments for the script.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark GeoParquet/Arrow input against GeoJSON, or convert GeoJSON to GeoParquet')
+    parser.add_argument('source', nargs='?', help='GeoParquet or Arrow IPC file to benchmark')
+    parser.add_argument('--compare', help='GeoJSON file with the same features to benchmark against')
+    parser.add_argument('--columns', help='Comma-separated property columns to read (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed passes per file (default: 3)')
+    parser.add_argument('--convert', nargs=2, metavar=('GEOJSON', 'PARQUET'),
+                        help='Write a GeoJSON file as GeoParquet and exit')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+
+    if args.convert:
+        from geojson_transform import iter_features
+        geojson_to_geoparquet(args.convert[0], args.convert[1], iter_features(args.convert[0]))
+    else:
+        selected = args.columns.split(',') if args.columns else None
+        for path in [p for p in (args.source, args.compare) if p]:
+            result = benchmark_parse(path, selected, args.repeat)
+            logger.info(
+                f"{path}: {result['Features']} features, {result['Vertices']} vertices in "
+                f"{result['Seconds']:.3f}s ({result['FeaturesPerSecond']:.0f} features/s, "
+                f"{result['VerticesPerSecond'] / 1e6:.2f}M vertices/s)")
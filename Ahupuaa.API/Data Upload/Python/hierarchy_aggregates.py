@@ -0,0 +1,526 @@
+"""
+Mokupuni and Moku Aggregate Items for the Ahupuaa Import
+
+Builds one precomputed item per mokupuni (island) and per moku (district)
+while the importer streams features, plus a root item listing the islands, so
+the hierarchy endpoints and overview-zoom rendering become single GetItem
+reads instead of scans and queries across every ahupuaa item.
+
+Each aggregate carries the feature count, total gisacres, union bounds, a
+dissolved and simplified outline, and its child list. Outlines are dissolved
+topologically: ahupuaa in the source layer share boundary vertices exactly, so
+an edge used by two features is interior and cancels out, and the remaining
+edges are chained back into rings. An outline that would push its item past
+the chunking threshold is simplified further until it fits, since aggregates
+share a partition per level and cannot be split into part items.
+
+Vertices are rounded to integer keys (8 bytes each, read straight from
+PackedGeometry arrays), and each aggregate keeps its edges as key arrays.
+Shared edges are cancelled by sorting whenever the pending edges outgrow the
+last cancelled set, so a coastline costs 16 bytes per edge rather than a set
+of float tuples.
+
+Aggregates use their own partition keys with the HierarchySK convention:
+  - AGGREGATE#ROOT      / HIERARCHY
+  - AGGREGATE#MOKUPUNI  / MOKUPUNI#<mokupuni>
+  - AGGREGATE#MOKU      / MOKUPUNI#<mokupuni>#MOKU#<moku>
+They never carry GSI key attributes, so they stay out of every index, and
+their ItemType keeps them out of the API's table scans.
+"""
+
+import datetime
+import json
+import logging
+from array import array
+from decimal import Decimal
+
+import numpy as np
+
+from capacity_planner import item_size
+from geojson_transform import (SIMPLIFIED_COORDS_FACTOR, format_hierarchical_key,
+                               iter_polygons)
+from item_chunking import CHUNK_THRESHOLD_BYTES
+from streaming_parser import PackedGeometry
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_ROOT_PK = 'AGGREGATE#ROOT'
+AGGREGATE_ROOT_SK = 'HIERARCHY'
+AGGREGATE_MOKUPUNI_PK = 'AGGREGATE#MOKUPUNI'
+AGGREGATE_MOKU_PK = 'AGGREGATE#MOKU'
+VERTEX_PRECISION = 7  # Decimal places used to match shared boundary vertices
+VERTEX_SCALE = 10 ** VERTEX_PRECISION
+_LAT_STEPS = 180 * VERTEX_SCALE + 1  # A vertex key is lng_step * _LAT_STEPS + lat_step, within int64
+EDGE_COMPACTION_SIZE = 1 << 18  # Pending edges before shared ones are cancelled
+
+
+def format_mokupuni_key(mokupuni):
+    """
+    Formats the HierarchySK of a mokupuni aggregate.
+
+    Args:
+        mokupuni: Island name
+
+    Returns:
+        str: Formatted hierarchical key
+    """
+    return f"MOKUPUNI#{(mokupuni or 'Unknown').strip()}"
+
+
+def pack_vertices(geometry):
+    """
+    Rounds a Polygon or MultiPolygon's vertices to VERTEX_PRECISION as integer keys.
+
+    A key takes 8 bytes instead of a tuple of two floats, and two vertices are
+    equal after rounding exactly when their keys are. PackedGeometry
+    coordinates are read straight from their arrays.
+
+    Args:
+        geometry: GeoJSON geometry object or PackedGeometry
+
+    Returns:
+        tuple: (int64 array of vertex keys, int64 array of the end position of each ring)
+    """
+    if isinstance(geometry, PackedGeometry) and geometry.dims >= 2 and geometry.offsets:
+        coords = np.frombuffer(geometry.coords, dtype=np.float64).reshape(-1, geometry.dims)
+        ends = np.array(geometry.offsets[-1][1:], dtype=np.int64)
+    else:
+        # One ring at a time, so no nested list of floats is built for the whole geometry
+        rings = [np.fromiter((float(v) for c in ring for v in (c[0], c[1])),
+                             dtype=np.float64, count=2 * len(ring)).reshape(-1, 2)
+                 for polygon in iter_polygons(geometry) for ring in polygon if len(ring)]
+        coords = np.concatenate(rings) if rings else np.empty((0, 2))
+        ends = np.cumsum([len(ring) for ring in rings], dtype=np.int64)
+
+    lng_steps = np.rint(coords[:, 0] * VERTEX_SCALE).astype(np.int64) + 180 * VERTEX_SCALE
+    lat_steps = np.rint(coords[:, 1] * VERTEX_SCALE).astype(np.int64) + 90 * VERTEX_SCALE
+    return lng_steps * _LAT_STEPS + lat_steps, ends
+
+
+def unpack_vertices(keys):
+    """
+    Turns vertex keys from pack_vertices back into coordinates.
+
+    Args:
+        keys: int64 array of vertex keys
+
+    Returns:
+        tuple: (longitude array, latitude array)
+    """
+    lng_steps, lat_steps = np.divmod(keys, _LAT_STEPS)
+    return ((lng_steps - 180 * VERTEX_SCALE) / VERTEX_SCALE,
+            (lat_steps - 90 * VERTEX_SCALE) / VERTEX_SCALE)
+
+
+def ring_edges(keys, ends):
+    """
+    Lists the edges within each ring of packed vertices.
+
+    Edges between repeated vertices are left out, and each edge has its
+    smaller key first, so an edge shared by two rings matches either way round.
+
+    Args:
+        keys: int64 array of vertex keys from pack_vertices
+        ends: int64 array of ring end positions from pack_vertices
+
+    Returns:
+        tuple: (int64 array of first keys, int64 array of second keys)
+    """
+    starts, stops = keys[:-1], keys[1:]
+    within = starts != stops
+    # No edge from one ring's last vertex to the next ring's first
+    within[ends[(ends > 0) & (ends < len(keys))] - 1] = False
+    starts, stops = starts[within], stops[within]
+    return np.minimum(starts, stops), np.maximum(starts, stops)
+
+
+def _extend_bounds(bounds, lng, lat):
+    if bounds is None:
+        return (lng, lat, lng, lat)
+    return (min(bounds[0], lng), min(bounds[1], lat),
+            max(bounds[2], lng), max(bounds[3], lat))
+
+
+def cancel_shared_edges(starts, stops):
+    """
+    Cancels edges that occur an even number of times.
+
+    Args:
+        starts: int64 array of first vertex keys, as from ring_edges
+        stops: int64 array of second vertex keys
+
+    Returns:
+        tuple: (starts, stops) of the edges left, sorted
+    """
+    order = np.lexsort((stops, starts))
+    starts = starts[order]
+    stops = stops[order]
+    first = np.ones(len(starts), dtype=bool)
+    first[1:] = (starts[1:] != starts[:-1]) | (stops[1:] != stops[:-1])
+    runs = np.flatnonzero(first)
+    odd = runs[np.diff(np.append(runs, len(starts))) % 2 == 1]
+    return starts[odd], stops[odd]
+
+
+def _ring_area(lngs, lats):
+    return float((lngs[:-1] * lats[1:] - lngs[1:] * lats[:-1]).sum()) / 2
+
+
+def _point_in_ring(point, ring):
+    x, y = point
+    lngs, lats, (min_lng, min_lat, max_lng, max_lat) = ring
+    if not (min_lng <= x <= max_lng and min_lat <= y <= max_lat):
+        return False
+    crosses = np.flatnonzero((lats[:-1] > y) != (lats[1:] > y))
+    x1, y1, x2, y2 = lngs[crosses], lats[crosses], lngs[crosses + 1], lats[crosses + 1]
+    return bool(np.count_nonzero(x < (x2 - x1) * (y - y1) / (y2 - y1) + x1) % 2)
+
+
+def chain_rings(starts, stops):
+    """
+    Chains undirected boundary edges into closed rings.
+
+    Args:
+        starts: int64 array of first vertex keys, one per edge
+        stops: int64 array of second vertex keys
+
+    Returns:
+        list: Closed rings as int64 arrays of vertex keys
+    """
+    edge_count = len(starts)
+    if not edge_count:
+        return []
+
+    # Every edge is walkable both ways; group the directed copies by their source vertex
+    vertices = np.unique(np.concatenate((starts, stops)))
+    sources = np.searchsorted(vertices, np.concatenate((starts, stops)))
+    targets = np.searchsorted(vertices, np.concatenate((stops, starts)))
+    order = np.argsort(sources, kind='stable')
+    first = np.searchsorted(sources[order], np.arange(len(vertices) + 1))
+    del sources
+
+    # memoryviews index much faster than numpy scalars in the walk below
+    order = memoryview(order)
+    targets = memoryview(targets)
+    stop = memoryview(first[1:])
+    cursor = first[:-1].copy()
+    position = memoryview(cursor)
+    used = bytearray(edge_count)
+
+    def next_edge(vertex):
+        i = position[vertex]
+        while i < stop[vertex] and used[order[i] % edge_count]:
+            i += 1
+        position[vertex] = i
+        return order[i] if i < stop[vertex] else -1
+
+    rings = []
+    for start in range(len(vertices)):
+        while next_edge(start) >= 0:
+            ring = array('q', [start])
+            current = start
+            while True:
+                directed = next_edge(current)
+                used[directed % edge_count] = 1
+                current = targets[directed]
+                ring.append(current)
+                if current == start or next_edge(current) < 0:
+                    break
+            if len(ring) >= 4 and ring[0] == ring[-1]:
+                rings.append(vertices[np.frombuffer(ring, dtype=np.int64)])
+    return rings
+
+
+def nest_rings(edges):
+    """
+    Chains dissolved boundary edges into rings and nests them into polygons.
+
+    Rings are nested by containment: a ring inside a larger ring becomes one
+    of its holes.
+
+    Args:
+        edges: (starts, stops) key arrays left after shared edges cancelled
+
+    Returns:
+        list: Polygons, each a list of (lngs, lats, bbox) rings, exterior first
+    """
+    rings = []
+    for keys in chain_rings(*edges):
+        lngs, lats = unpack_vertices(keys)
+        rings.append((lngs, lats, (lngs.min(), lats.min(), lngs.max(), lats.max())))
+    rings.sort(key=lambda r: abs(_ring_area(r[0], r[1])), reverse=True)
+
+    polygons = []
+    for ring in rings:
+        point = (ring[0][0], ring[1][0])
+        # Rings arrive largest first, so the last match is the tightest container
+        container = None
+        for polygon in polygons:
+            if _point_in_ring(point, polygon[0]) and not any(
+                    _point_in_ring(point, hole) for hole in polygon[1:]):
+                container = polygon
+        if container is not None:
+            container.append(ring)
+        else:
+            polygons.append([ring])
+    return polygons
+
+
+def simplify_polygons(polygons, factor=SIMPLIFIED_COORDS_FACTOR):
+    """
+    Simplifies nested rings into a GeoJSON MultiPolygon.
+
+    Args:
+        polygons: Polygons as returned by nest_rings
+        factor: Simplification factor (lower = more simplified)
+
+    Returns:
+        dict: GeoJSON MultiPolygon, or None when there are no polygons
+    """
+    if not polygons:
+        return None
+
+    # Same vertices simplify_coordinates keeps, without a list per vertex of the full ring
+    step = max(1, int(1 / factor))
+    coordinates = []
+    for polygon in polygons:
+        simplified = []
+        for lngs, lats, _ in polygon:
+            kept = np.arange(len(lngs))
+            if len(kept) > 100:
+                kept = np.concatenate(([0], kept[1:-1:step], [len(kept) - 1]))
+            simplified.append(np.column_stack((lngs[kept], lats[kept])).tolist())
+        coordinates.append(simplified)
+    return {'type': 'MultiPolygon', 'coordinates': coordinates}
+
+
+def dissolve_outline(edges, factor=SIMPLIFIED_COORDS_FACTOR):
+    """
+    Turns dissolved boundary edges into a simplified MultiPolygon.
+
+    Args:
+        edges: (starts, stops) key arrays left after shared edges cancelled
+        factor: Simplification factor (lower = more simplified)
+
+    Returns:
+        dict: GeoJSON MultiPolygon, or None when there are no edges
+    """
+    return simplify_polygons(nest_rings(edges), factor)
+
+
+def _add_edges(aggregate, starts, stops):
+    aggregate['Edges'].append((starts, stops))
+    aggregate['EdgeCount'] += len(starts)
+    if aggregate['EdgeCount'] > max(EDGE_COMPACTION_SIZE, 2 * aggregate['CancelledCount']):
+        _cancel_edges(aggregate)
+
+
+def _cancel_edges(aggregate):
+    edges = aggregate['Edges']
+    if len(edges) != 1:
+        starts = np.concatenate([e[0] for e in edges]) if edges else np.empty(0, dtype=np.int64)
+        stops = np.concatenate([e[1] for e in edges]) if edges else np.empty(0, dtype=np.int64)
+        edges[:] = [cancel_shared_edges(starts, stops)]
+    aggregate['EdgeCount'] = aggregate['CancelledCount'] = len(edges[0][0])
+    return edges[0]
+
+
+def _bounds_attribute(bounds):
+    return {
+        'M': {
+            'Northeast': {
+                'M': {
+                    'Lat': {'N': str(bounds[3])},
+                    'Lng': {'N': str(bounds[2])}
+                }
+            },
+            'Southwest': {
+                'M': {
+                    'Lat': {'N': str(bounds[1])},
+                    'Lng': {'N': str(bounds[0])}
+                }
+            }
+        }
+    }
+
+
+class HierarchyAggregator:
+    """
+    Accumulates per-mokupuni and per-moku aggregates during the import pass.
+    """
+
+    def __init__(self):
+        self.districts = {}
+
+    def add(self, feature, item):
+        """
+        Adds one feature to its moku aggregate.
+
+        Args:
+            feature: GeoJSON feature as parsed from the source file
+            item: DynamoDB item built for the feature
+        """
+        mokupuni = item['MokupuniName']['S']
+        moku = item['MokuName']['S']
+        district = self.districts.setdefault((mokupuni, moku), {
+            'FeatureCount': 0,
+            'GisAcres': Decimal(0),
+            'Bounds': None,
+            'Edges': [],
+            'EdgeCount': 0,
+            'CancelledCount': 0,
+            'Children': []
+        })
+
+        district['FeatureCount'] += 1
+        try:
+            district['GisAcres'] += Decimal(
+                str(feature.get('properties', {}).get('gisacres') or 0))
+        except ArithmeticError:
+            logger.warning(
+                f"Invalid gisacres for {item['AhupuaaPK']['S']}, excluded from total")
+
+        district['Children'].append({
+            'M': {
+                'AhupuaaPK': item['AhupuaaPK'],
+                'AhupuaaName': item['AhupuaaName']
+            }
+        })
+
+        vertices, ring_ends = pack_vertices(feature.get('geometry'))
+        if not len(vertices):
+            return
+        # Edges shared with a neighbouring feature cancel out
+        _add_edges(district, *ring_edges(vertices, ring_ends))
+
+        lngs, lats = unpack_vertices(vertices)
+        district['Bounds'] = _extend_bounds(
+            district['Bounds'], float(lngs.min()), float(lats.min()))
+        district['Bounds'] = _extend_bounds(
+            district['Bounds'], float(lngs.max()), float(lats.max()))
+
+    def build_items(self, data_version):
+        """
+        Builds the root, mokupuni and moku aggregate items.
+
+        Args:
+            data_version: Import version stamped into the item metadata
+
+        Returns:
+            list: DynamoDB items in low-level attribute format
+        """
+        metadata = {
+            'M': {
+                'DataVersion': {'N': str(data_version)},
+                'LastUpdated': {'S': datetime.datetime.now().isoformat()},
+            }
+        }
+
+        islands = {}
+        for (mokupuni, moku), district in sorted(self.districts.items()):
+            island = islands.setdefault(mokupuni, {
+                'FeatureCount': 0,
+                'GisAcres': Decimal(0),
+                'Bounds': None,
+                'Edges': [],
+                'EdgeCount': 0,
+                'CancelledCount': 0,
+                'Children': []
+            })
+            island['FeatureCount'] += district['FeatureCount']
+            island['GisAcres'] += district['GisAcres']
+            if district['Bounds']:
+                island['Bounds'] = _extend_bounds(
+                    island['Bounds'], *district['Bounds'][:2])
+                island['Bounds'] = _extend_bounds(
+                    island['Bounds'], *district['Bounds'][2:])
+            # Borders between moku cancel out the same way
+            _add_edges(island, *_cancel_edges(district))
+            island['Children'].append({
+                'M': {
+                    'Name': {'S': moku},
+                    'HierarchySK': {'S': format_hierarchical_key(mokupuni, moku)},
+                    'FeatureCount': {'N': str(district['FeatureCount'])}
+                }
+            })
+
+        items = [{
+            'AhupuaaPK': {'S': AGGREGATE_ROOT_PK},
+            'HierarchySK': {'S': AGGREGATE_ROOT_SK},
+            'ItemType': {'S': 'Aggregate'},
+            'AggregateLevel': {'S': 'Root'},
+            'FeatureCount': {'N': str(sum(i['FeatureCount'] for i in islands.values()))},
+            'Children': {'L': [
+                {
+                    'M': {
+                        'Name': {'S': mokupuni},
+                        'HierarchySK': {'S': format_mokupuni_key(mokupuni)},
+                        'FeatureCount': {'N': str(island['FeatureCount'])}
+                    }
+                } for mokupuni, island in islands.items()
+            ]},
+            'Metadata': metadata
+        }]
+
+        for mokupuni, island in islands.items():
+            items.append(self._aggregate_item(
+                AGGREGATE_MOKUPUNI_PK, format_mokupuni_key(mokupuni),
+                'Mokupuni', mokupuni, None, island, metadata))
+
+        for (mokupuni, moku), district in sorted(self.districts.items()):
+            items.append(self._aggregate_item(
+                AGGREGATE_MOKU_PK, format_hierarchical_key(mokupuni, moku),
+                'Moku', moku, mokupuni, district, metadata))
+
+        return items
+
+    @staticmethod
+    def _aggregate_item(pk, sk, level, name, parent_name, aggregate, metadata):
+        item = {
+            'AhupuaaPK': {'S': pk},
+            'HierarchySK': {'S': sk},
+            'ItemType': {'S': 'Aggregate'},
+            'AggregateLevel': {'S': level},
+            'AggregateName': {'S': name},
+            'FeatureCount': {'N': str(aggregate['FeatureCount'])},
+            'TotalGisAcres': {'N': str(aggregate['GisAcres'])},
+            'Children': {'L': aggregate['Children']},
+            'Metadata': metadata
+        }
+
+        if parent_name is not None:
+            item['ParentName'] = {'S': parent_name}
+
+        if aggregate['Bounds']:
+            item['Bounds'] = _bounds_attribute(aggregate['Bounds'])
+            item['MBR'] = {
+                'S': json.dumps([list(aggregate['Bounds'][:2]),
+                                 list(aggregate['Bounds'][2:])])
+            }
+
+        polygons = nest_rings(_cancel_edges(aggregate))
+        if not polygons:
+            return item
+
+        # Large islands can outgrow the item limit; aggregates share a partition
+        # per level, so they cannot be split into parts and are simplified further
+        longest_ring = max(len(ring[0]) for polygon in polygons for ring in polygon)
+        factor = SIMPLIFIED_COORDS_FACTOR
+        while True:
+            item['SimplifiedBoundaries'] = {
+                'S': json.dumps(simplify_polygons(polygons, factor))}
+            if item_size(item) <= CHUNK_THRESHOLD_BYTES:
+                break
+            if int(1 / factor) >= longest_ring:
+                logger.warning(
+                    f"{level} aggregate {name} is {item_size(item)} bytes at the coarsest "
+                    f"simplification, storing it without an outline")
+                del item['SimplifiedBoundaries']
+                break
+            factor /= 2
+
+        if factor != SIMPLIFIED_COORDS_FACTOR:
+            logger.info(
+                f"Simplified the outline of {level} aggregate {name} with factor {factor} to fit")
+
+        return item
@@ -0,0 +1,343 @@
+"""
+Hilbert-Curve Spatial Keys for the Ahupuaa Data
+
+Geohash and GeohashPrefix only support equality queries over coarse cells, so
+a viewport turns into many queries that each return features far outside it.
+The importer therefore also maps each feature's centroid onto a Hilbert curve
+over the Hawaiian islands and stores the position as a sortable number.
+Nearby points get nearby numbers, so a viewport becomes a few BETWEEN range
+queries on the HilbertIndex GSI with tight results.
+
+The curve has 2^order x 2^order cells over HILBERT_DOMAIN. Items are spread
+over a few partition buckets, the top bits of the index (the first-level
+quadrants), so the GSI is not one hot partition. The bucket value includes
+the order, so items written with a different order never mix.
+
+Attributes added to feature items:
+  - HilbertBucket  (S)  "<order>#<bucket>", GSI hash key
+  - HilbertIndex   (N)  centroid position, GSI range key
+  - HilbertMin/Max (N)  Hilbert range covering the feature's MBR; a feature can
+                        only intersect a viewport if this range overlaps one of
+                        the viewport's query ranges
+
+Usage:
+  python hilbert_index.py -156.7 20.5 -156.0 21.0 --order 16 --max-ranges 8
+"""
+
+import argparse
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HILBERT_ORDER = 16  # 65536 x 65536 cells, about 10 m across
+HILBERT_BUCKET_BITS = 2  # Four partition buckets, one per first-level quadrant
+# min lng, min lat, max lng, max lat of the main Hawaiian islands, with margin
+HILBERT_DOMAIN = (-160.75, 18.5, -154.5, 22.5)
+MAX_QUERY_RANGES = 8  # Range queries a viewport is decomposed into
+REFINE_FACTOR = 8  # Ranges kept while refining, before merging down to the maximum
+
+
+def hilbert_index_from_cell(order, x, y):
+    """
+    Maps a grid cell to its position along the Hilbert curve.
+
+    Args:
+        order: Curve order (the grid is 2^order cells across)
+        x: Cell column
+        y: Cell row
+
+    Returns:
+        int: Hilbert index
+    """
+    index = 0
+    side = 1 << order
+    s = side >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        index += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the sub-curve is in standard orientation
+        if ry == 0:
+            if rx == 1:
+                x = side - 1 - x
+                y = side - 1 - y
+            x, y = y, x
+        s >>= 1
+    return index
+
+
+def hilbert_cell_from_index(order, index):
+    """
+    Maps a Hilbert index back to its grid cell.
+
+    Args:
+        order: Curve order
+        index: Hilbert index
+
+    Returns:
+        tuple: (x, y) cell
+    """
+    x = y = 0
+    s = 1
+    side = 1 << order
+    while s < side:
+        rx = 1 & (index // 2)
+        ry = 1 & (index ^ rx)
+        if ry == 0:
+            if rx == 1:
+                x = s - 1 - x
+                y = s - 1 - y
+            x, y = y, x
+        x += s * rx
+        y += s * ry
+        index //= 4
+        s <<= 1
+    return x, y
+
+
+def cell_from_coordinate(lng, lat, order, domain=HILBERT_DOMAIN):
+    """
+    Maps a coordinate to its grid cell, clamping points outside the domain.
+
+    Args:
+        lng: Longitude
+        lat: Latitude
+        order: Curve order
+        domain: (min lng, min lat, max lng, max lat) the curve covers
+
+    Returns:
+        tuple: (x, y) cell
+    """
+    side = 1 << order
+    min_lng, min_lat, max_lng, max_lat = domain
+    x = int((lng - min_lng) / (max_lng - min_lng) * side)
+    y = int((lat - min_lat) / (max_lat - min_lat) * side)
+    return min(side - 1, max(0, x)), min(side - 1, max(0, y))
+
+
+def hilbert_index(lng, lat, order=DEFAULT_HILBERT_ORDER, domain=HILBERT_DOMAIN):
+    """
+    Computes the Hilbert index of a coordinate.
+
+    Args:
+        lng: Longitude
+        lat: Latitude
+        order: Curve order
+        domain: (min lng, min lat, max lng, max lat) the curve covers
+
+    Returns:
+        int: Hilbert index
+    """
+    x, y = cell_from_coordinate(lng, lat, order, domain)
+    return hilbert_index_from_cell(order, x, y)
+
+
+def format_hilbert_bucket(order, bucket):
+    """
+    Formats the HilbertBucket partition key.
+
+    Args:
+        order: Curve order
+        bucket: Bucket number
+
+    Returns:
+        str: Partition key value
+    """
+    return f"{order}#{bucket}"
+
+
+def bucket_of(index, order):
+    """
+    Returns the partition bucket of a Hilbert index.
+
+    Args:
+        index: Hilbert index
+        order: Curve order
+
+    Returns:
+        int: Bucket number
+    """
+    return index >> (2 * order - HILBERT_BUCKET_BITS)
+
+
+def _merge_ranges(ranges, max_ranges):
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+
+    # Close the smallest gaps until few enough ranges remain
+    while len(merged) > max_ranges:
+        gap_index = min(range(len(merged) - 1),
+                        key=lambda i: merged[i + 1][0] - merged[i][1])
+        merged[gap_index][1] = merged[gap_index + 1][1]
+        del merged[gap_index + 1]
+
+    return [tuple(r) for r in merged]
+
+
+def hilbert_ranges(min_lng, min_lat, max_lng, max_lat, order=DEFAULT_HILBERT_ORDER,
+                   max_ranges=MAX_QUERY_RANGES, domain=HILBERT_DOMAIN):
+    """
+    Decomposes a bounding box into Hilbert index ranges that cover it.
+
+    The quadtree of the curve is refined level by level. Blocks inside the box
+    become whole ranges and blocks crossing its edge are split further.
+    Refinement stops once there are enough ranges, and the closest ranges are
+    then merged down to max_ranges. Every cell in the box is covered, and
+    the result is as tight as the range budget allows.
+
+    Args:
+        min_lng: West edge
+        min_lat: South edge
+        max_lng: East edge
+        max_lat: North edge
+        order: Curve order
+        max_ranges: Maximum number of ranges to return
+        domain: (min lng, min lat, max lng, max lat) the curve covers
+
+    Returns:
+        list: Sorted (low, high) inclusive index ranges
+    """
+    x0, y0 = cell_from_coordinate(min_lng, min_lat, order, domain)
+    x1, y1 = cell_from_coordinate(max_lng, max_lat, order, domain)
+
+    covered = []
+    # (first index, level): a block of 4^level cells, 2^level cells across
+    blocks = [(0, order)]
+    while blocks:
+        partial = []
+        for first, level in blocks:
+            side = 1 << level
+            x, y = hilbert_cell_from_index(order, first)
+            bx = x & ~(side - 1)
+            by = y & ~(side - 1)
+            if bx > x1 or bx + side - 1 < x0 or by > y1 or by + side - 1 < y0:
+                continue
+            if bx >= x0 and bx + side - 1 <= x1 and by >= y0 and by + side - 1 <= y1:
+                covered.append((first, first + side * side - 1))
+            else:
+                quarter = side * side // 4
+                partial.extend((first + i * quarter, level - 1) for i in range(4))
+
+        if len(covered) + len(partial) > max_ranges * REFINE_FACTOR:
+            # Stop refining: the edge blocks are covered whole
+            for first, level in partial:
+                covered.append((first, first + (1 << (2 * level)) - 1))
+            break
+        blocks = partial
+
+    return _merge_ranges(covered, max_ranges)
+
+
+def bucket_ranges(ranges, order=DEFAULT_HILBERT_ORDER):
+    """
+    Splits index ranges at bucket boundaries, one query per bucket and range.
+
+    Args:
+        ranges: (low, high) inclusive index ranges
+        order: Curve order
+
+    Returns:
+        list: (HilbertBucket value, low, high) tuples for BETWEEN queries
+    """
+    bucket_size = 1 << (2 * order - HILBERT_BUCKET_BITS)
+    queries = []
+    for low, high in ranges:
+        while low <= high:
+            bucket = low // bucket_size
+            end = min(high, (bucket + 1) * bucket_size - 1)
+            queries.append((format_hilbert_bucket(order, bucket), low, end))
+            low = end + 1
+    return queries
+
+
+def viewport_queries(min_lng, min_lat, max_lng, max_lat, order=DEFAULT_HILBERT_ORDER,
+                     max_ranges=MAX_QUERY_RANGES, padding=0.0):
+    """
+    Builds the HilbertIndex GSI queries for a viewport.
+
+    Features are indexed by centroid. Padding the viewport by about half the
+    size of the largest feature also finds features that overlap the
+    viewport but have their centroid outside it. Results should then be
+    refined against the MBR.
+
+    Args:
+        min_lng: West edge
+        min_lat: South edge
+        max_lng: East edge
+        max_lat: North edge
+        order: Curve order the items were written with
+        max_ranges: Maximum number of ranges before bucket splitting
+        padding: Degrees added on every side of the viewport
+
+    Returns:
+        list: (HilbertBucket value, low, high) tuples, one
+        "HilbertBucket = :b AND HilbertIndex BETWEEN :low AND :high" query each
+    """
+    ranges = hilbert_ranges(min_lng - padding, min_lat - padding,
+                            max_lng + padding, max_lat + padding, order, max_ranges)
+    return bucket_ranges(ranges, order)
+
+
+def add_hilbert_keys(item, order=DEFAULT_HILBERT_ORDER):
+    """
+    Adds the Hilbert attributes to a feature item.
+
+    Args:
+        item: Feature item in low-level attribute format
+        order: Curve order
+
+    Returns:
+        dict: The same item, with HilbertBucket, HilbertIndex, HilbertMin and
+        HilbertMax set when it has a centroid
+    """
+    centroid = item.get('Centroid', {}).get('M')
+    if not centroid:
+        return item
+
+    index = hilbert_index(float(centroid['Lng']['N']), float(centroid['Lat']['N']), order)
+    item['HilbertBucket'] = {'S': format_hilbert_bucket(order, bucket_of(index, order))}
+    item['HilbertIndex'] = {'N': str(index)}
+
+    if 'MBR' in item:
+        (min_lng, min_lat), (max_lng, max_lat) = json.loads(item['MBR']['S'])
+        ranges = hilbert_ranges(min_lng, min_lat, max_lng, max_lat, order, max_ranges=1)
+        low, high = ranges[0]
+    else:
+        low = high = index
+    item['HilbertMin'] = {'N': str(low)}
+    item['HilbertMax'] = {'N': str(high)}
+
+    return item
+
+
+def parse_arguments():
+    """
+    Parse command line arguments for the script.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Print the HilbertIndex queries covering a bounding box')
+    parser.add_argument('bbox', type=float, nargs=4,
+                        metavar=('MIN_LNG', 'MIN_LAT', 'MAX_LNG', 'MAX_LAT'))
+    parser.add_argument('--order', type=int, default=DEFAULT_HILBERT_ORDER,
+                        help=f'Curve order (default: {DEFAULT_HILBERT_ORDER})')
+    parser.add_argument('--max-ranges', type=int, default=MAX_QUERY_RANGES,
+                        help=f'Maximum ranges (default: {MAX_QUERY_RANGES})')
+    parser.add_argument('--padding', type=float, default=0.0,
+                        help='Degrees added on every side of the box')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    for bucket, low, high in viewport_queries(*args.bbox, order=args.order,
+                                              max_ranges=args.max_ranges,
+                                              padding=args.padding):
+        print(f"HilbertBucket = {bucket} AND HilbertIndex BETWEEN {low} AND {high}")
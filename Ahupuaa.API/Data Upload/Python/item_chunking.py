@@ -0,0 +1,167 @@
+"""
+Oversized Feature Chunking for the Ahupuaa Import
+
+A complex ahupuaa whose full geometry, simplified variants and properties add
+up past the 400 KB DynamoDB item limit makes the whole BatchWriteItem fail.
+Items over a size threshold are split into a lightweight head item that keeps
+the keys, names, bounds, style and low-detail geometry (so list and map reads
+only ever fetch the head) and ordered geometry part items holding the rest.
+
+Parts share the head's AhupuaaPK and use PART#0000, PART#0001, ... as their
+HierarchySK. They carry no GSI key attributes, so indexes only see the head.
+The detached attributes are serialized, compressed and cut into parts; the
+head records how many parts to fetch in GeometryPartCount.
+
+Parts carry ItemType GeometryPart, so the API's table scans skip them. Readers
+rebuild the item with get_feature_item, or like the API's GetAhupuaaByIdAsync,
+by querying the partition and joining the parts in HierarchySK order.
+"""
+
+import json
+import logging
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from capacity_planner import ITEM_SIZE_LIMIT, item_size
+from geojson_transform import resolve_geometry_refs
+
+logger = logging.getLogger(__name__)
+
+CHUNK_THRESHOLD_BYTES = 350 * 1024  # Split items above this size, leaving room under the limit
+PART_PAYLOAD_BYTES = 350 * 1024  # Compressed bytes stored in each part item
+# Moved off the head whenever an item is split
+DETACHED_ATTRIBUTES = ['FullGeometry', 'HighDetailBoundaries', 'Properties']
+# Only moved if the head is still over the threshold, since GSIs project them
+FALLBACK_DETACHED_ATTRIBUTES = ['SimplifiedBoundaries', 'LowDetailBoundaries']
+MAX_WORKERS = 10  # Parallel GetItem calls when reassembling
+
+
+def format_part_sk(part_index):
+    """
+    Formats the sort key of a geometry part item.
+
+    Args:
+        part_index: Zero-based part number
+
+    Returns:
+        str: Part sort key
+    """
+    return f"PART#{part_index:04d}"
+
+
+def split_oversized_item(item, threshold=CHUNK_THRESHOLD_BYTES):
+    """
+    Splits an item over the size threshold into a head item plus part items.
+
+    Args:
+        item: DynamoDB item in low-level attribute format
+        threshold: Item size in bytes above which the item is split
+
+    Returns:
+        list: [item] when it fits, otherwise [head, part, part, ...]
+    """
+    size = item_size(item)
+    if size <= threshold:
+        return [item]
+
+    head = dict(item)
+    detached = {}
+    for name in DETACHED_ATTRIBUTES:
+        if name in head:
+            detached[name] = head.pop(name)
+    for name in FALLBACK_DETACHED_ATTRIBUTES:
+        if item_size(head) <= threshold:
+            break
+        if name in head:
+            detached[name] = head.pop(name)
+
+    payload = zlib.compress(json.dumps(detached).encode('utf-8'), 9)
+    chunks = [payload[i:i + PART_PAYLOAD_BYTES]
+              for i in range(0, len(payload), PART_PAYLOAD_BYTES)]
+
+    head['GeometryPartCount'] = {'N': str(len(chunks))}
+    head['DetachedAttributes'] = {'SS': sorted(detached)}
+
+    parts = [
+        {
+            'AhupuaaPK': item['AhupuaaPK'],
+            'HierarchySK': {'S': format_part_sk(part_index)},
+            'ItemType': {'S': 'GeometryPart'},
+            'HeadSK': item['HierarchySK'],
+            'Data': {'B': chunk}
+        }
+        for part_index, chunk in enumerate(chunks)
+    ]
+
+    head_size = item_size(head)
+    if head_size > ITEM_SIZE_LIMIT:
+        logger.warning(
+            f"Head item {item['AhupuaaPK']['S']} is still {head_size} bytes after splitting")
+
+    logger.info(
+        f"Split {item['AhupuaaPK']['S']} ({size} bytes) into a {head_size} byte head "
+        f"and {len(parts)} geometry parts")
+
+    return [head] + parts
+
+
+def reassemble_item(head, parts):
+    """
+    Restores the detached attributes of a head item from its parts.
+
+    Args:
+        head: Head item in low-level attribute format
+        parts: Part items, in any order
+
+    Returns:
+        dict: The original item
+    """
+    ordered = sorted(parts, key=lambda p: p['HierarchySK']['S'])
+    payload = b''.join(bytes(p['Data']['B']) for p in ordered)
+
+    item = {k: v for k, v in head.items()
+            if k not in ('GeometryPartCount', 'DetachedAttributes')}
+    item.update(json.loads(zlib.decompress(payload).decode('utf-8')))
+    return item
+
+
+def get_feature_item(client, table_name, ahupuaa_pk, hierarchy_sk):
+    """
+    Reads a feature item, fetching and reassembling geometry parts in parallel
+    when the item was split and resolving deduplicated geometry levels.
+
+    Args:
+        client: boto3 DynamoDB client
+        table_name: Name of the DynamoDB table
+        ahupuaa_pk: AhupuaaPK of the feature
+        hierarchy_sk: HierarchySK of the feature
+
+    Returns:
+        dict: Complete item in low-level attribute format, or None if not found
+    """
+    head = client.get_item(
+        TableName=table_name,
+        Key={'AhupuaaPK': {'S': ahupuaa_pk}, 'HierarchySK': {'S': hierarchy_sk}}
+    ).get('Item')
+    if not head or 'GeometryPartCount' not in head:
+        return resolve_geometry_refs(head)
+
+    part_count = int(head['GeometryPartCount']['N'])
+
+    def fetch_part(part_index):
+        return client.get_item(
+            TableName=table_name,
+            Key={
+                'AhupuaaPK': {'S': ahupuaa_pk},
+                'HierarchySK': {'S': format_part_sk(part_index)}
+            }
+        ).get('Item')
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, part_count)) as executor:
+        parts = list(executor.map(fetch_part, range(part_count)))
+
+    if not all(parts):
+        logger.error(f"Missing geometry parts for {ahupuaa_pk}")
+        return None
+
+    return resolve_geometry_refs(reassemble_item(head, parts))
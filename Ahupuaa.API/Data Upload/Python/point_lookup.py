@@ -0,0 +1,390 @@
+"""
+Batch Point-in-Polygon Reverse Lookup for the Ahupuaa Data
+
+Tags GPS points (field surveys, sensor readings) with the ahupuaa, moku and
+mokupuni they fall in, without exporting everything to a GIS tool. Features are
+read with the same GeoJSON parsing and key logic as the importer. Their
+bounding rectangles go into a uniform grid, and each grid cell's points are
+tested against the candidate polygons with a vectorized NumPy even-odd test.
+Every ring of a polygon takes part in the test, so points inside holes fall
+outside it.
+
+Points stream in from CSV or NDJSON in chunks and are written back out with
+ahupuaa_pk, ahupuaa, moku and mokupuni columns added. Points that fall in no
+feature get empty values.
+
+Usage:
+  python point_lookup.py --geojson ahupuaa.geojson points.csv -o tagged.csv
+  python point_lookup.py --geojson ahupuaa.geojson readings.ndjson --lng-field lon
+
+Requirements:
+  - numpy, ijson
+"""
+
+import argparse
+import csv
+import json
+import logging
+import math
+import sys
+import time
+
+import numpy as np
+
+from geojson_transform import feature_identity, iter_features, iter_polygons
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 100000  # Points read, tagged and written at a time
+BLOCK_ELEMENTS = 4000000  # Point x edge comparisons per vectorized block
+CELLS_PER_POLYGON = 4  # Grid cells allocated per indexed polygon
+OUTPUT_FIELDS = ['ahupuaa_pk', 'ahupuaa', 'moku', 'mokupuni']
+# Columns feature_identity reads, projected when the source is GeoParquet or Arrow
+IDENTITY_COLUMNS = ['id', 'objectid', 'ahupuaa', 'name', 'moku', 'mokupuni']
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl', '.geojsonl')
+
+
+def _polygon_edges(polygon):
+    starts = []
+    ends = []
+    for ring in polygon:
+        if len(ring) < 2:
+            continue
+        vertices = np.asarray([c[:2] for c in ring], dtype=np.float64)
+        starts.append(vertices[:-1])
+        ends.append(vertices[1:])
+        if not np.array_equal(vertices[0], vertices[-1]):
+            # Close open rings so the even-odd count stays correct
+            starts.append(vertices[-1:])
+            ends.append(vertices[:1])
+    if not starts:
+        return None
+
+    start = np.concatenate(starts)
+    end = np.concatenate(ends)
+    x1, y1 = start[:, 0], start[:, 1]
+    x2, y2 = end[:, 0], end[:, 1]
+    # Horizontal edges never straddle a point's latitude, so their slope is unused
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(y1 != y2, (x2 - x1) / (y2 - y1), 0.0)
+
+    return {
+        'x1': x1, 'y1': y1, 'slope': slope,
+        'ymin': np.minimum(y1, y2), 'ymax': np.maximum(y1, y2),
+        'mbr': (float(min(x1.min(), x2.min())), float(min(y1.min(), y2.min())),
+                float(max(x1.max(), x2.max())), float(max(y1.max(), y2.max())))
+    }
+
+
+def points_in_polygon(lngs, lats, edges):
+    """
+    Runs the even-odd test for many points against one polygon.
+
+    Args:
+        lngs: Array of point longitudes
+        lats: Array of point latitudes
+        edges: Edge arrays of the polygon, all rings included
+
+    Returns:
+        numpy.ndarray: Boolean array, True where the point is inside
+    """
+    inside = np.zeros(len(lngs), dtype=bool)
+    block = max(1, BLOCK_ELEMENTS // max(1, len(edges['x1'])))
+
+    for start in range(0, len(lngs), block):
+        px = lngs[start:start + block]
+        py = lats[start:start + block]
+
+        # Only edges spanning the block's latitudes can be crossed
+        band = (edges['ymax'] >= py.min()) & (edges['ymin'] <= py.max())
+        if not band.any():
+            continue
+        x1 = edges['x1'][band]
+        y1 = edges['y1'][band]
+        slope = edges['slope'][band]
+        ymin = edges['ymin'][band]
+        ymax = edges['ymax'][band]
+
+        py_column = py[:, None]
+        straddles = (ymin <= py_column) & (ymax > py_column)
+        crossings = straddles & (px[:, None] < x1 + (py_column - y1) * slope)
+        inside[start:start + block] = (np.count_nonzero(crossings, axis=1) & 1).astype(bool)
+
+    return inside
+
+
+class AhupuaaPointIndex:
+    """
+    Grid index over ahupuaa polygons for batch reverse lookups.
+    """
+
+    def __init__(self, filename):
+        """
+        Reads the features of a GeoJSON file and builds the grid index.
+
+        Args:
+            filename: Path to the GeoJSON file the importer reads
+        """
+        self.features = []
+        self.polygons = []
+        self.polygon_features = []
+
+        for feature_index, feature in enumerate(iter_features(filename, IDENTITY_COLUMNS)):
+            self.features.append(feature_identity(feature, feature_index))
+            for polygon in iter_polygons(feature.get('geometry')):
+                edges = _polygon_edges(polygon)
+                if edges is not None:
+                    self.polygons.append(edges)
+                    self.polygon_features.append(feature_index)
+
+        self._build_grid()
+        logger.info(
+            f"Indexed {len(self.polygons)} polygons from {len(self.features)} features "
+            f"in a {self.columns}x{self.rows} grid")
+
+    def _build_grid(self):
+        if not self.polygons:
+            self.extent = (0.0, 0.0, 0.0, 0.0)
+            self.cell_size = 1.0
+            self.columns = self.rows = 0
+            self.cells = {}
+            return
+
+        mbrs = np.array([p['mbr'] for p in self.polygons])
+        self.extent = (mbrs[:, 0].min(), mbrs[:, 1].min(), mbrs[:, 2].max(), mbrs[:, 3].max())
+        width = max(self.extent[2] - self.extent[0], 1e-9)
+        height = max(self.extent[3] - self.extent[1], 1e-9)
+        self.cell_size = math.sqrt(width * height / (len(self.polygons) * CELLS_PER_POLYGON))
+        self.columns = max(1, math.ceil(width / self.cell_size))
+        self.rows = max(1, math.ceil(height / self.cell_size))
+
+        self.cells = {}
+        for polygon_id, (min_lng, min_lat, max_lng, max_lat) in enumerate(mbrs):
+            first_column, first_row = self._cell(min_lng, min_lat)
+            last_column, last_row = self._cell(max_lng, max_lat)
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    self.cells.setdefault(row * self.columns + column, []).append(polygon_id)
+
+    def _cell(self, lng, lat):
+        column = min(self.columns - 1, int((lng - self.extent[0]) / self.cell_size))
+        row = min(self.rows - 1, int((lat - self.extent[1]) / self.cell_size))
+        return column, row
+
+    def lookup(self, lngs, lats):
+        """
+        Finds the feature containing each point.
+
+        Args:
+            lngs: Sequence of longitudes (NaN for missing)
+            lats: Sequence of latitudes (NaN for missing)
+
+        Returns:
+            numpy.ndarray: Index into self.features per point, -1 where no feature matches
+        """
+        lngs = np.asarray(lngs, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        result = np.full(len(lngs), -1, dtype=np.int64)
+        if not self.cells or not len(lngs):
+            return result
+
+        within = ((lngs >= self.extent[0]) & (lngs <= self.extent[2]) &
+                  (lats >= self.extent[1]) & (lats <= self.extent[3]))
+        candidates = np.flatnonzero(within)
+        if not len(candidates):
+            return result
+
+        columns = np.minimum(self.columns - 1,
+                             ((lngs[candidates] - self.extent[0]) / self.cell_size).astype(np.int64))
+        rows = np.minimum(self.rows - 1,
+                          ((lats[candidates] - self.extent[1]) / self.cell_size).astype(np.int64))
+        cell_ids = rows * self.columns + columns
+
+        # Group the points by grid cell so each cell's polygons are tested once
+        order = np.argsort(cell_ids, kind='stable')
+        cell_ids = cell_ids[order]
+        candidates = candidates[order]
+        boundaries = np.flatnonzero(np.diff(cell_ids)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(cell_ids)]))
+
+        for start, end in zip(starts, ends):
+            polygon_ids = self.cells.get(int(cell_ids[start]))
+            if not polygon_ids:
+                continue
+            points = candidates[start:end]
+            for polygon_id in polygon_ids:
+                # Ahupuaa don't overlap, so a matched point needs no further tests
+                points = points[result[points] < 0]
+                if not len(points):
+                    break
+                polygon = self.polygons[polygon_id]
+                min_lng, min_lat, max_lng, max_lat = polygon['mbr']
+                px = lngs[points]
+                py = lats[points]
+                in_mbr = (px >= min_lng) & (px <= max_lng) & (py >= min_lat) & (py <= max_lat)
+                if not in_mbr.any():
+                    continue
+                tested = points[in_mbr]
+                inside = points_in_polygon(px[in_mbr], py[in_mbr], polygon)
+                result[tested[inside]] = self.polygon_features[polygon_id]
+
+        return result
+
+
+def _coordinate(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def iter_point_chunks(stream, point_format, lng_field, lat_field, chunk_size=CHUNK_SIZE):
+    """
+    Reads points from a CSV or NDJSON stream in chunks.
+
+    Args:
+        stream: Open text stream
+        point_format: 'csv' or 'ndjson'
+        lng_field: Name of the longitude column or key
+        lat_field: Name of the latitude column or key
+        chunk_size: Number of points per chunk
+
+    Yields:
+        tuple: (list of records as dicts, longitude array, latitude array)
+    """
+    if point_format == 'csv':
+        records = csv.DictReader(stream)
+    else:
+        records = (json.loads(line) for line in stream if line.strip())
+
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield _to_arrays(chunk, lng_field, lat_field)
+            chunk = []
+    if chunk:
+        yield _to_arrays(chunk, lng_field, lat_field)
+
+
+def _to_arrays(chunk, lng_field, lat_field):
+    lngs = np.fromiter((_coordinate(r.get(lng_field)) for r in chunk),
+                       dtype=np.float64, count=len(chunk))
+    lats = np.fromiter((_coordinate(r.get(lat_field)) for r in chunk),
+                       dtype=np.float64, count=len(chunk))
+    return chunk, lngs, lats
+
+
+def tag_points(index, input_stream, output_stream, point_format='csv',
+               lng_field='lng', lat_field='lat', chunk_size=CHUNK_SIZE):
+    """
+    Streams points through the index and writes them out tagged.
+
+    Args:
+        index: AhupuaaPointIndex to look points up in
+        input_stream: Open text stream of CSV or NDJSON points
+        output_stream: Open text stream to write tagged points to, same format
+        point_format: 'csv' or 'ndjson'
+        lng_field: Name of the longitude column or key
+        lat_field: Name of the latitude column or key
+        chunk_size: Number of points per chunk
+
+    Returns:
+        dict: Points read and matched, and elapsed seconds
+    """
+    tags = [
+        [f['AhupuaaPK'], f['AhupuaaName'], f['MokuName'], f['MokupuniName']]
+        for f in index.features
+    ]
+    empty = [''] * len(OUTPUT_FIELDS) if point_format == 'csv' else [None] * len(OUTPUT_FIELDS)
+
+    writer = None
+    total_points = 0
+    total_matched = 0
+    start_time = time.time()
+
+    for records, lngs, lats in iter_point_chunks(
+            input_stream, point_format, lng_field, lat_field, chunk_size):
+        matches = index.lookup(lngs, lats)
+
+        for record, match in zip(records, matches.tolist()):
+            record.update(zip(OUTPUT_FIELDS, tags[match] if match >= 0 else empty))
+
+        if point_format == 'csv':
+            if writer is None:
+                fieldnames = list(records[0])
+                writer = csv.DictWriter(output_stream, fieldnames=fieldnames,
+                                        extrasaction='ignore')
+                writer.writeheader()
+            writer.writerows(records)
+        else:
+            output_stream.writelines(
+                json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+
+        total_points += len(records)
+        total_matched += int(np.count_nonzero(matches >= 0))
+        elapsed = time.time() - start_time
+        logger.info(
+            f"Tagged {total_points} points ({total_matched} matched) - "
+            f"Rate: {total_points / elapsed * 60 if elapsed > 0 else 0:,.0f} points/min")
+
+    return {
+        'Points': total_points,
+        'Matched': total_matched,
+        'Seconds': time.time() - start_time
+    }
+
+
+def parse_arguments():
+    """
+    Parse command line arguments for the script.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Tag points with the ahupuaa, moku and mokupuni they fall in')
+    parser.add_argument('points', help="CSV or NDJSON file of points, or '-' for stdin")
+    parser.add_argument('--geojson', required=True,
+                        help='GeoJSON file with the ahupuaa features')
+    parser.add_argument('-o', '--output', default='-',
+                        help="Output file (default: stdout)")
+    parser.add_argument('--format', choices=['csv', 'ndjson'],
+                        help='Point format (default: from the file extension)')
+    parser.add_argument('--lng-field', default='lng',
+                        help='Longitude column or key (default: lng)')
+    parser.add_argument('--lat-field', default='lat',
+                        help='Latitude column or key (default: lat)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f'Points per chunk (default: {CHUNK_SIZE})')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+
+    point_format = args.format
+    if not point_format:
+        point_format = 'ndjson' if args.points.lower().endswith(NDJSON_EXTENSIONS) else 'csv'
+
+    index = AhupuaaPointIndex(args.geojson)
+
+    input_stream = sys.stdin if args.points == '-' else open(
+        args.points, 'r', encoding='utf-8', newline='')
+    output_stream = sys.stdout if args.output == '-' else open(
+        args.output, 'w', encoding='utf-8', newline='')
+    try:
+        stats = tag_points(index, input_stream, output_stream, point_format,
+                           args.lng_field, args.lat_field, args.chunk_size)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+
+    logger.info(
+        f"Tagged {stats['Points']} points in {stats['Seconds']:.2f} seconds, "
+        f"{stats['Matched']} inside a feature")
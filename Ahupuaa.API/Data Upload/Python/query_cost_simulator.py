@@ -0,0 +1,738 @@
+"""
+Offline Query-Cost Simulator for the Ahupuaa Bounding-Box and Zoom Queries
+
+Replays a viewport workload against the items the importer would write,
+using the same access patterns as AhupuaaService. This lets geohash
+precision, GeohashPrefix length and zoom bucketing be benchmarked before the
+real table changes.
+
+  - bbox: GeohashUtility.GetPrefixesInBoundingBox samples nine points of the
+    viewport. Each prefix is then a Query on GeoBoundingBoxIndex with the
+    request Limit, an optional mokupuni/moku filter, and a MinZoom/MaxZoom
+    check in memory.
+  - zoom: a Query on ZoomLevelIndex for ZoomLevel = request zoom, with the
+    request Limit and the same optional filter.
+  - hilbert: the viewport, padded by half the largest feature, decomposed into
+    HilbertIndex BETWEEN ranges (hilbert_index.viewport_queries), each a Query
+    with the request Limit, refined against the projected MBR.
+
+For every query the simulator reports items read, bytes read, estimated RCU
+(eventually consistent GSI reads, rounded up to 4 KB per Query call),
+false-positive ratio (items read that are not visible in the viewport) and
+missed features (visible features the query did not return). Visible means
+the feature's bounds intersect the viewport and the zoom is within its
+MinZoom/MaxZoom.
+
+Items come from the GeoJSON file (built with the importer's transform) or from
+an NDJSON export written by the importer's --export-items. The workload is
+either synthetic pans and zooms over each island or a recorded NDJSON log of
+GeospatialQueryRequest bodies.
+
+Usage:
+  python query_cost_simulator.py --geojson ahupuaa.geojson --sessions 20
+  python query_cost_simulator.py --items items.ndjson --prefix-length 4
+  python query_cost_simulator.py --geojson ahupuaa.geojson --pattern hilbert --hilbert-order 14
+  python query_cost_simulator.py --items items.ndjson --workload requests.ndjson --report out.ndjson
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import math
+import random
+import statistics
+
+from capacity_planner import DEFAULT_INDEX_DEFINITIONS, item_size, project_item
+from geojson_transform import build_feature_item, iter_features
+from hilbert_index import DEFAULT_HILBERT_ORDER, MAX_QUERY_RANGES, add_hilbert_keys, viewport_queries
+
+logger = logging.getLogger(__name__)
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+READ_UNIT_BYTES = 4096
+QUERY_PAGE_BYTES = 1024 * 1024  # A Query stops after reading 1 MB
+DEFAULT_LIMIT = 50  # GeospatialQueryRequest.Limit default
+DEFAULT_GEOHASH_PRECISION = 7  # Geohash length written by the importer
+DEFAULT_PREFIX_LENGTH = 3  # GeohashPrefix length, also GetPrefixesInBoundingBox's default precision
+VIEWPORT_WIDTH_PX = 390  # Phone viewport in points
+VIEWPORT_HEIGHT_PX = 844
+TILE_SIZE_PX = 256
+MIN_ZOOM = 8
+MAX_ZOOM = 16
+ZOOM_STEP_PROBABILITY = 0.3  # Chance a synthetic step zooms instead of panning
+PATTERNS = ['bbox', 'zoom', 'hilbert']
+
+
+def encode_geohash(lat, lng, precision=12):
+    """
+    Encodes a coordinate exactly as GeohashUtility.EncodeGeohash does.
+
+    Args:
+        lat: Latitude
+        lng: Longitude
+        precision: Geohash length
+
+    Returns:
+        str: Geohash
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    is_even = True
+    bit = 0
+    ch = 0
+    geohash = ''
+
+    while len(geohash) < precision:
+        if is_even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng > mid:
+                ch |= 1 << (4 - bit)
+                lng_range[0] = mid
+            else:
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat > mid:
+                ch |= 1 << (4 - bit)
+                lat_range[0] = mid
+            else:
+                lat_range[1] = mid
+
+        is_even = not is_even
+        if bit < 4:
+            bit += 1
+        else:
+            geohash += BASE32[ch]
+            bit = 0
+            ch = 0
+
+    return geohash
+
+
+def get_prefixes_in_bounding_box(sw_lat, sw_lng, ne_lat, ne_lng, precision=DEFAULT_PREFIX_LENGTH):
+    """
+    Port of GeohashUtility.GetPrefixesInBoundingBox: the geohashes of the
+    corners, center and edge midpoints of the box.
+
+    Args:
+        sw_lat: Southwest latitude
+        sw_lng: Southwest longitude
+        ne_lat: Northeast latitude
+        ne_lng: Northeast longitude
+        precision: Prefix length
+
+    Returns:
+        list: Distinct geohash prefixes
+    """
+    mid_lat = (sw_lat + ne_lat) / 2
+    mid_lng = (sw_lng + ne_lng) / 2
+    points = [(sw_lat, sw_lng), (ne_lat, ne_lng), (ne_lat, sw_lng), (sw_lat, ne_lng),
+              (mid_lat, mid_lng), (ne_lat, mid_lng), (sw_lat, mid_lng),
+              (mid_lat, ne_lng), (mid_lat, sw_lng)]
+
+    prefixes = []
+    for lat, lng in points:
+        prefix = encode_geohash(lat, lng, precision)
+        if prefix not in prefixes:
+            prefixes.append(prefix)
+    return prefixes
+
+
+def get_covering_prefixes(sw_lat, sw_lng, ne_lat, ne_lng, precision=DEFAULT_PREFIX_LENGTH):
+    """
+    Lists every geohash cell of the given precision that intersects the box,
+    as a reference for what the sampled prefixes can miss.
+
+    Args:
+        sw_lat: Southwest latitude
+        sw_lng: Southwest longitude
+        ne_lat: Northeast latitude
+        ne_lng: Northeast longitude
+        precision: Prefix length
+
+    Returns:
+        list: Distinct geohash prefixes
+    """
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    cell_width = 360.0 / (1 << lng_bits)
+    cell_height = 180.0 / (1 << lat_bits)
+
+    lats = [sw_lat + i * cell_height for i in range(int((ne_lat - sw_lat) / cell_height) + 1)]
+    lngs = [sw_lng + i * cell_width for i in range(int((ne_lng - sw_lng) / cell_width) + 1)]
+    lats.append(ne_lat)
+    lngs.append(ne_lng)
+
+    prefixes = []
+    for lat in lats:
+        for lng in lngs:
+            prefix = encode_geohash(lat, lng, precision)
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+    return prefixes
+
+
+def read_units(size):
+    """
+    Computes the read capacity one eventually consistent Query call consumes.
+
+    Args:
+        size: Total bytes of the items the call evaluated
+
+    Returns:
+        float: Read capacity units
+    """
+    return max(1, math.ceil(size / READ_UNIT_BYTES)) * 0.5
+
+
+def _number(item, name):
+    value = item.get(name)
+    return float(value['N']) if value and 'N' in value else None
+
+
+def _feature_bounds(item):
+    if 'MBR' in item:
+        (min_lng, min_lat), (max_lng, max_lat) = json.loads(item['MBR']['S'])
+        return (min_lng, min_lat, max_lng, max_lat)
+
+    centroid = item.get('Centroid', {}).get('M')
+    if centroid:
+        lat = float(centroid['Lat']['N'])
+        lng = float(centroid['Lng']['N'])
+        return (lng, lat, lng, lat)
+    return None
+
+
+def rekey_item(item, geohash_precision=DEFAULT_GEOHASH_PRECISION,
+               prefix_length=DEFAULT_PREFIX_LENGTH, zoom_bucketing='fixed',
+               hilbert_order=DEFAULT_HILBERT_ORDER):
+    """
+    Applies alternative geohash and zoom key choices to an item.
+
+    Args:
+        item: Feature item in low-level attribute format
+        geohash_precision: Length of the Geohash attribute
+        prefix_length: Length of the GeohashPrefix attribute
+        zoom_bucketing: 'fixed' keeps the item's ZoomLevel, 'min-zoom' uses MinZoom
+        hilbert_order: Order of the Hilbert keys, or 0 to keep the item's own
+
+    Returns:
+        dict: Copy of the item with Geohash, GeohashPrefix, ZoomLevel and the
+        Hilbert keys replaced
+    """
+    rekeyed = dict(item)
+    length = max(geohash_precision, prefix_length)
+
+    # Keep the imported geohash (it may come from the source file) when it is long enough
+    geohash = item.get('Geohash', {}).get('S', '')
+    centroid = item.get('Centroid', {}).get('M')
+    if len(geohash) < length and centroid:
+        geohash = encode_geohash(float(centroid['Lat']['N']), float(centroid['Lng']['N']), length)
+    elif len(geohash) < length:
+        geohash = geohash.ljust(length, '0')
+    rekeyed['Geohash'] = {'S': geohash[:geohash_precision]}
+    rekeyed['GeohashPrefix'] = {'S': geohash[:prefix_length]}
+
+    if zoom_bucketing == 'min-zoom' and 'MinZoom' in item:
+        rekeyed['ZoomLevel'] = item['MinZoom']
+
+    if hilbert_order:
+        add_hilbert_keys(rekeyed, hilbert_order)
+
+    return rekeyed
+
+
+def load_items(geojson=None, items_path=None):
+    """
+    Loads the feature items the importer would write.
+
+    Args:
+        geojson: Path to a GeoJSON file, built with the importer's transform
+        items_path: Path to an NDJSON export written with --export-items
+
+    Returns:
+        list: Feature items in low-level attribute format
+    """
+    if items_path:
+        with open(items_path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    return [build_feature_item(feature, feature_index, 0)
+            for feature_index, feature in enumerate(iter_features(geojson))]
+
+
+class QueryCostSimulator:
+    """
+    In-memory model of the GSIs the map queries read.
+    """
+
+    def __init__(self, items, query_precision=DEFAULT_PREFIX_LENGTH, prefix_strategy='api',
+                 max_ranges=MAX_QUERY_RANGES):
+        self.query_precision = query_precision
+        self.prefix_strategy = prefix_strategy
+        self.max_ranges = max_ranges
+        self.features = []
+        self.bbox_partitions = {}
+        self.zoom_partitions = {}
+        self.hilbert_partitions = {}
+        self.hilbert_order = None
+        # Half the largest feature extent, so a centroid outside the viewport is still found
+        self.hilbert_padding = 0.0
+
+        bbox_index = DEFAULT_INDEX_DEFINITIONS['GeoBoundingBoxIndex']
+        zoom_index = DEFAULT_INDEX_DEFINITIONS['ZoomLevelIndex']
+        hilbert_gsi = DEFAULT_INDEX_DEFINITIONS['HilbertIndex']
+
+        for item in items:
+            feature = {
+                'AhupuaaPK': item['AhupuaaPK']['S'],
+                'MokupuniName': item.get('MokupuniName', {}).get('S'),
+                'MokuName': item.get('MokuName', {}).get('S'),
+                'MinZoom': _number(item, 'MinZoom'),
+                'MaxZoom': _number(item, 'MaxZoom'),
+                'Bounds': _feature_bounds(item)
+            }
+            self.features.append(feature)
+
+            projected = project_item(item, bbox_index)
+            if projected is not None:
+                self.bbox_partitions.setdefault(projected['GeohashPrefix']['S'], []).append(
+                    (projected['AhupuaaPK']['S'], item_size(projected), feature))
+
+            projected = project_item(item, zoom_index)
+            if projected is not None:
+                self.zoom_partitions.setdefault(projected['ZoomLevel']['N'], []).append(
+                    (projected['Geohash']['S'], item_size(projected), feature))
+
+            projected = project_item(item, hilbert_gsi)
+            if projected is not None:
+                self.hilbert_order = int(projected['HilbertBucket']['S'].split('#')[0])
+                self.hilbert_partitions.setdefault(projected['HilbertBucket']['S'], []).append(
+                    (int(projected['HilbertIndex']['N']), item_size(projected), feature))
+                b = feature['Bounds']
+                if b:
+                    self.hilbert_padding = max(self.hilbert_padding,
+                                               (b[2] - b[0]) / 2, (b[3] - b[1]) / 2)
+
+        # Items come back in range key order within a partition
+        for partitions in (self.bbox_partitions, self.zoom_partitions, self.hilbert_partitions):
+            for partition in partitions.values():
+                partition.sort(key=lambda entry: entry[0])
+
+    def island_bounds(self):
+        """
+        Computes the bounds of each mokupuni from its features.
+
+        Returns:
+            dict: Mokupuni name to (min lng, min lat, max lng, max lat)
+        """
+        islands = {}
+        for feature in self.features:
+            if not feature['Bounds'] or not feature['MokupuniName']:
+                continue
+            b = feature['Bounds']
+            current = islands.get(feature['MokupuniName'])
+            islands[feature['MokupuniName']] = b if current is None else (
+                min(current[0], b[0]), min(current[1], b[1]),
+                max(current[2], b[2]), max(current[3], b[3]))
+        return islands
+
+    @staticmethod
+    def _matches_filter(feature, request):
+        if request.get('mokupuni') and feature['MokupuniName'] != request['mokupuni']:
+            return False
+        if request.get('moku') and feature['MokuName'] != request['moku']:
+            return False
+        return True
+
+    @staticmethod
+    def _in_zoom_range(feature, zoom):
+        if feature['MinZoom'] is None or feature['MaxZoom'] is None:
+            return False
+        return feature['MinZoom'] <= zoom <= feature['MaxZoom']
+
+    def visible_features(self, request):
+        """
+        Lists the features a perfect query would return for a viewport.
+
+        Args:
+            request: Normalized viewport request
+
+        Returns:
+            set: AhupuaaPKs of the visible features
+        """
+        sw_lat, sw_lng, ne_lat, ne_lng = request['bbox']
+        visible = set()
+        for feature in self.features:
+            b = feature['Bounds']
+            if not b or b[0] > ne_lng or b[2] < sw_lng or b[1] > ne_lat or b[3] < sw_lat:
+                continue
+            if self._in_zoom_range(feature, request['zoom']) and \
+                    self._matches_filter(feature, request):
+                visible.add(feature['AhupuaaPK'])
+        return visible
+
+    def _read_partition(self, partition, limit):
+        # One Query call: stops at Limit evaluated items or 1 MB read
+        read = []
+        size = 0
+        for entry in partition:
+            if len(read) >= limit or size >= QUERY_PAGE_BYTES:
+                break
+            read.append(entry)
+            size += entry[1]
+        return read, size
+
+    def run_bbox_query(self, request):
+        """
+        Replays GetAhupuaaByBoundingBoxAsync for one request.
+
+        Args:
+            request: Normalized viewport request
+
+        Returns:
+            tuple: (AhupuaaPKs read, AhupuaaPKs returned, bytes read, RCU, Query calls)
+        """
+        sw_lat, sw_lng, ne_lat, ne_lng = request['bbox']
+        if self.prefix_strategy == 'cover':
+            prefixes = get_covering_prefixes(sw_lat, sw_lng, ne_lat, ne_lng, self.query_precision)
+        else:
+            prefixes = get_prefixes_in_bounding_box(
+                sw_lat, sw_lng, ne_lat, ne_lng, self.query_precision)
+
+        read = []
+        returned = []
+        total_bytes = 0
+        rcu = 0.0
+        calls = 0
+        for prefix in prefixes:
+            if len(returned) >= request['limit']:
+                break
+            entries, size = self._read_partition(
+                self.bbox_partitions.get(prefix, []), request['limit'] - len(returned))
+            calls += 1
+            total_bytes += size
+            rcu += read_units(size)
+            for _, _, feature in entries:
+                read.append(feature['AhupuaaPK'])
+                if self._matches_filter(feature, request) and \
+                        self._in_zoom_range(feature, request['zoom']):
+                    returned.append(feature['AhupuaaPK'])
+
+        return read, returned, total_bytes, rcu, calls
+
+    def run_zoom_query(self, request):
+        """
+        Replays GetAhupuaaByZoomLevelAsync for one request.
+
+        Args:
+            request: Normalized viewport request
+
+        Returns:
+            tuple: (AhupuaaPKs read, AhupuaaPKs returned, bytes read, RCU, Query calls)
+        """
+        entries, size = self._read_partition(
+            self.zoom_partitions.get(str(request['zoom']), []), request['limit'])
+        read = [feature['AhupuaaPK'] for _, _, feature in entries]
+        returned = [feature['AhupuaaPK'] for _, _, feature in entries
+                    if self._matches_filter(feature, request)]
+        return read, returned, size, read_units(size), 1
+
+    def run_hilbert_query(self, request):
+        """
+        Replays a viewport as HilbertIndex BETWEEN range queries.
+
+        Args:
+            request: Normalized viewport request
+
+        Returns:
+            tuple: (AhupuaaPKs read, AhupuaaPKs returned, bytes read, RCU, Query calls)
+        """
+        read = []
+        returned = []
+        total_bytes = 0
+        rcu = 0.0
+        calls = 0
+        if self.hilbert_order is None:
+            return read, returned, total_bytes, rcu, calls
+
+        sw_lat, sw_lng, ne_lat, ne_lng = request['bbox']
+        queries = viewport_queries(sw_lng, sw_lat, ne_lng, ne_lat, self.hilbert_order,
+                                   self.max_ranges, self.hilbert_padding)
+        for bucket, low, high in queries:
+            if len(returned) >= request['limit']:
+                break
+            partition = self.hilbert_partitions.get(bucket, [])
+            start = bisect.bisect_left(partition, low, key=lambda entry: entry[0])
+            end = bisect.bisect_right(partition, high, key=lambda entry: entry[0])
+            entries, size = self._read_partition(
+                partition[start:end], request['limit'] - len(returned))
+            calls += 1
+            total_bytes += size
+            rcu += read_units(size)
+            for _, _, feature in entries:
+                read.append(feature['AhupuaaPK'])
+                b = feature['Bounds']
+                if b and b[0] <= ne_lng and b[2] >= sw_lng and b[1] <= ne_lat and \
+                        b[3] >= sw_lat and self._matches_filter(feature, request) and \
+                        self._in_zoom_range(feature, request['zoom']):
+                    returned.append(feature['AhupuaaPK'])
+
+        return read, returned, total_bytes, rcu, calls
+
+    def simulate(self, request, pattern):
+        """
+        Runs one request with an access pattern and scores it.
+
+        Args:
+            request: Normalized viewport request
+            pattern: 'bbox', 'zoom' or 'hilbert'
+
+        Returns:
+            dict: Per-query report
+        """
+        if pattern == 'bbox':
+            read, returned, total_bytes, rcu, calls = self.run_bbox_query(request)
+        elif pattern == 'hilbert':
+            read, returned, total_bytes, rcu, calls = self.run_hilbert_query(request)
+        else:
+            read, returned, total_bytes, rcu, calls = self.run_zoom_query(request)
+
+        visible = self.visible_features(request)
+        useful = sum(1 for pk in read if pk in visible)
+        return {
+            'Pattern': pattern,
+            'Zoom': request['zoom'],
+            'BoundingBox': request['bbox'],
+            'QueryCalls': calls,
+            'ItemsRead': len(read),
+            'ItemsReturned': len(returned),
+            'BytesRead': total_bytes,
+            'ReadUnits': rcu,
+            'FalsePositiveRatio': (len(read) - useful) / len(read) if read else 0.0,
+            'Visible': len(visible),
+            'Missed': len(visible - set(returned))
+        }
+
+
+def viewport(center_lat, center_lng, zoom):
+    """
+    Computes the bounds a phone map shows at a center and zoom level.
+
+    Args:
+        center_lat: Latitude of the map center
+        center_lng: Longitude of the map center
+        zoom: Web Mercator zoom level
+
+    Returns:
+        tuple: (sw lat, sw lng, ne lat, ne lng)
+    """
+    degrees_per_px = 360.0 / (TILE_SIZE_PX * (1 << zoom))
+    half_width = degrees_per_px * VIEWPORT_WIDTH_PX / 2
+    half_height = degrees_per_px * VIEWPORT_HEIGHT_PX / 2 * math.cos(math.radians(center_lat))
+    return (center_lat - half_height, center_lng - half_width,
+            center_lat + half_height, center_lng + half_width)
+
+
+def synthetic_workload(island_bounds, sessions, steps, limit=DEFAULT_LIMIT, seed=0):
+    """
+    Generates pan and zoom sessions over each island.
+
+    Each session starts at a random point and zoom on an island, then either
+    pans half a viewport in a random direction or zooms one level per step.
+
+    Args:
+        island_bounds: Mokupuni name to bounds, as returned by island_bounds()
+        sessions: Sessions per island
+        steps: Requests per session
+        limit: Request Limit
+        seed: Random seed, so runs can be compared
+
+    Returns:
+        list: Normalized viewport requests
+    """
+    rng = random.Random(seed)
+    requests = []
+    for mokupuni, (min_lng, min_lat, max_lng, max_lat) in sorted(island_bounds.items()):
+        for _ in range(sessions):
+            lat = rng.uniform(min_lat, max_lat)
+            lng = rng.uniform(min_lng, max_lng)
+            zoom = rng.randint(MIN_ZOOM, MAX_ZOOM)
+            for _ in range(steps):
+                requests.append({
+                    'bbox': viewport(lat, lng, zoom),
+                    'zoom': zoom,
+                    'limit': limit,
+                    'mokupuni': None,
+                    'moku': None,
+                    'session': mokupuni
+                })
+                if rng.random() < ZOOM_STEP_PROBABILITY:
+                    zoom = min(MAX_ZOOM, max(MIN_ZOOM, zoom + rng.choice((-1, 1))))
+                else:
+                    sw_lat, sw_lng, ne_lat, ne_lng = viewport(lat, lng, zoom)
+                    angle = rng.uniform(0, 2 * math.pi)
+                    lat += math.sin(angle) * (ne_lat - sw_lat) / 2
+                    lng += math.cos(angle) * (ne_lng - sw_lng) / 2
+    return requests
+
+
+def _field(record, *names):
+    # Accept GeospatialQueryRequest bodies in PascalCase or camelCase
+    lowered = {k.lower(): v for k, v in record.items()}
+    for name in names:
+        if name.lower() in lowered:
+            return lowered[name.lower()]
+    return None
+
+
+def load_workload(path, limit=DEFAULT_LIMIT):
+    """
+    Reads a recorded NDJSON log of GeospatialQueryRequest bodies.
+
+    Args:
+        path: Path to the log
+        limit: Limit used when a request has none
+
+    Returns:
+        list: Normalized viewport requests
+    """
+    requests = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            southwest = _field(record, 'Southwest')
+            northeast = _field(record, 'Northeast')
+            zoom = _field(record, 'ZoomLevel')
+            if not southwest or not northeast or zoom is None:
+                logger.warning(f"Skipping request on line {line_number}: missing bounds or zoom")
+                continue
+            requests.append({
+                'bbox': (float(_field(southwest, 'Lat')), float(_field(southwest, 'Lng')),
+                         float(_field(northeast, 'Lat')), float(_field(northeast, 'Lng'))),
+                'zoom': int(zoom),
+                'limit': int(_field(record, 'Limit') or limit),
+                'mokupuni': _field(record, 'MokupuniName'),
+                'moku': _field(record, 'MokuName'),
+                'session': None
+            })
+    return requests
+
+
+def summarize(reports):
+    """
+    Logs the per-query averages and tails for each access pattern.
+
+    Args:
+        reports: Per-query reports as returned by QueryCostSimulator.simulate
+    """
+    for pattern in PATTERNS:
+        rows = [r for r in reports if r['Pattern'] == pattern]
+        if not rows:
+            continue
+
+        def p95(values):
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+        items_read = [r['ItemsRead'] for r in rows]
+        kb_read = [r['BytesRead'] / 1024 for r in rows]
+        rcu = [r['ReadUnits'] for r in rows]
+        missed = [r['Missed'] for r in rows]
+        total_read = sum(items_read)
+        total_false = sum(r['ItemsRead'] * r['FalsePositiveRatio'] for r in rows)
+
+        logger.info(
+            f"{pattern}: {len(rows)} queries, {statistics.mean(r['QueryCalls'] for r in rows):.1f} "
+            f"Query calls each")
+        logger.info(
+            f"  items read {statistics.mean(items_read):.1f} avg / {p95(items_read)} p95, "
+            f"{statistics.mean(kb_read):.1f} KB avg / {p95(kb_read):.1f} KB p95")
+        logger.info(
+            f"  RCU {statistics.mean(rcu):.1f} avg / {p95(rcu):.1f} p95, {sum(rcu):.0f} total")
+        logger.info(
+            f"  false positives {total_false / total_read * 100 if total_read else 0:.1f}% of items read")
+        logger.info(
+            f"  missed features {statistics.mean(missed):.1f} avg / {p95(missed)} p95, "
+            f"{sum(1 for m in missed if m) / len(rows) * 100:.1f}% of queries miss at least one")
+
+
+def parse_arguments():
+    """
+    Parse command line arguments for the script.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Estimate the read cost of the bounding-box and zoom queries')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--geojson', help='GeoJSON file, built with the importer transform')
+    source.add_argument('--items', help='NDJSON item export written with --export-items')
+    parser.add_argument('--workload', help='NDJSON log of GeospatialQueryRequest bodies '
+                                           '(default: synthetic pans and zooms)')
+    parser.add_argument('--sessions', type=int, default=10,
+                        help='Synthetic sessions per island (default: 10)')
+    parser.add_argument('--steps', type=int, default=20,
+                        help='Requests per synthetic session (default: 20)')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic workload seed')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT,
+                        help=f'Request Limit (default: {DEFAULT_LIMIT})')
+    parser.add_argument('--pattern', choices=PATTERNS + ['all'], default='all',
+                        help='Access pattern to replay (default: all)')
+    parser.add_argument('--geohash-precision', type=int, default=DEFAULT_GEOHASH_PRECISION,
+                        help=f'Geohash length (default: {DEFAULT_GEOHASH_PRECISION})')
+    parser.add_argument('--prefix-length', type=int, default=DEFAULT_PREFIX_LENGTH,
+                        help='GeohashPrefix length, also used as the query precision '
+                             f'(default: {DEFAULT_PREFIX_LENGTH})')
+    parser.add_argument('--prefix-strategy', choices=['api', 'cover'], default='api',
+                        help="'api' samples nine points like the service, "
+                             "'cover' queries every intersecting cell")
+    parser.add_argument('--zoom-bucketing', choices=['fixed', 'min-zoom'], default='fixed',
+                        help="'fixed' keeps the imported ZoomLevel, 'min-zoom' uses MinZoom")
+    parser.add_argument('--hilbert-order', type=int, default=DEFAULT_HILBERT_ORDER,
+                        help=f'Order of the HilbertIndex keys (default: {DEFAULT_HILBERT_ORDER})')
+    parser.add_argument('--max-ranges', type=int, default=MAX_QUERY_RANGES,
+                        help=f'HilbertIndex range queries per viewport (default: {MAX_QUERY_RANGES})')
+    parser.add_argument('--report', help='Write per-query reports to this NDJSON file')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+
+    items = [rekey_item(item, args.geohash_precision, args.prefix_length, args.zoom_bucketing,
+                        args.hilbert_order)
+             for item in load_items(args.geojson, args.items)]
+    simulator = QueryCostSimulator(items, args.prefix_length, args.prefix_strategy,
+                                   args.max_ranges)
+    logger.info(
+        f"Loaded {len(items)} items into {len(simulator.bbox_partitions)} GeohashPrefix, "
+        f"{len(simulator.zoom_partitions)} ZoomLevel and "
+        f"{len(simulator.hilbert_partitions)} HilbertBucket partitions")
+    logger.warning(
+        "MinZoom and MaxZoom are not projected into GeoBoundingBoxIndex; the bbox "
+        "zoom filter is evaluated on the base item values")
+
+    if args.workload:
+        workload = load_workload(args.workload, args.limit)
+    else:
+        workload = synthetic_workload(simulator.island_bounds(), args.sessions, args.steps,
+                                      args.limit, args.seed)
+
+    patterns = PATTERNS if args.pattern == 'all' else [args.pattern]
+    reports = [simulator.simulate(request, pattern)
+               for request in workload for pattern in patterns]
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            for report in reports:
+                f.write(json.dumps(report) + '\n')
+        logger.info(f"Wrote {len(reports)} query reports to {args.report}")
+
+    summarize(reports)
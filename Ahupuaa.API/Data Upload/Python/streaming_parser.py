@@ -0,0 +1,546 @@
+"""
+Event-Level Streaming Parser for Giant GeoJSON Features
+
+ijson.items(f, 'features.item') builds each feature as a complete nested
+structure before the importer sees it: one list per ring, one list per vertex
+and one Decimal per number. A coastline MultiPolygon with a few million
+vertices costs hundreds of MB that way, about 280 bytes per vertex.
+
+This parser reads the same file through ijson's C backend (yajl2_c) and
+handles the events itself:
+
+  - coordinate numbers of Polygon and MultiPolygon geometries go straight into
+    one flat array('d') per feature, with array('q') offsets marking where each
+    ring and polygon ends, so a vertex costs 16 bytes. Each Decimal is
+    converted as it arrives and never kept.
+  - everything else (properties, ids, other geometry members) is built with
+    ijson's ObjectBuilder as usual, with the exact Decimals ijson.items gives,
+    so values like gisacres 12.50 keep their digits.
+
+The geometry is yielded as a PackedGeometry. It is a read-only mapping with
+the usual 'type' and 'coordinates' keys. Coordinates are lazy sequence views,
+so code written for nested lists keeps working. geojson_transform serializes
+and simplifies packed geometries without expanding them, and the JSON it
+writes is byte-for-byte what json.dumps writes for the nested form.
+
+Parsing is only the first copy of the vertices. Building the DynamoDB item
+serializes the geometry levels, and the hierarchy aggregator and adjacency
+builder keep rounded vertex keys (8 bytes per vertex, read from the packed
+arrays) until the end of the pass. --import-pass measures a whole
+process_geojson pass; on a 1M-vertex MultiPolygon it peaked at about +200 MB
+packed against +540 MB nested, and parsing alone at +16 MB against +315 MB.
+
+Geometries whose 'type' comes after 'coordinates', and types other than
+Polygon and MultiPolygon, are built as nested lists like before. Mixed
+coordinate dimensions within one geometry raise ValueError; import such files
+with --nested-geometry.
+
+Usage:
+  python streaming_parser.py --benchmark --sizes 10000 100000 1000000
+  python streaming_parser.py --benchmark --transform --import-pass
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+
+import ijson
+
+logger = logging.getLogger(__name__)
+
+PACKED_DEPTHS = {'Polygon': 3, 'MultiPolygon': 4}  # Array depth of a position within 'coordinates'
+FEATURE_PREFIX = 'features.item'
+COORDINATES_PREFIX = 'features.item.geometry.coordinates'
+GEOMETRY_TYPE_PREFIX = 'features.item.geometry.type'
+DEFAULT_BENCHMARK_SIZES = [10000, 100000, 1000000]
+JSON_CHUNK_POSITIONS = 4096  # Positions serialized per joined string
+
+_COORDINATES = object()  # Stands in for the packed coordinates inside the built feature
+
+
+def _backend():
+    try:
+        return ijson.get_backend('yajl2_c')
+    except ImportError:
+        logger.warning("ijson C backend (yajl2_c) not available, falling back to the default backend")
+        return ijson
+
+
+class _CoordinateView(Sequence):
+    """
+    Read-only nested-list view of part of a PackedGeometry's coordinates.
+    """
+
+    __slots__ = ('geometry', 'level', 'lo', 'hi')
+
+    def __init__(self, geometry, level, lo, hi):
+        self.geometry = geometry
+        self.level = level
+        self.lo = lo
+        self.hi = hi
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('coordinate index out of range')
+
+        g = self.geometry
+        if self.level == len(g.offsets):
+            base = (self.lo + index) * g.dims
+            return tuple(g.coords[base:base + g.dims])
+        offsets = g.offsets[self.level]
+        i = self.lo + index
+        return _CoordinateView(g, self.level + 1, offsets[i], offsets[i + 1])
+
+    def __iter__(self):
+        g = self.geometry
+        if self.level == len(g.offsets):
+            values = iter(g.coords[self.lo * g.dims:self.hi * g.dims])
+            return zip(*[values] * g.dims) if g.dims else iter(())
+        offsets = g.offsets[self.level]
+        return (_CoordinateView(g, self.level + 1, offsets[i], offsets[i + 1])
+                for i in range(self.lo, self.hi))
+
+
+class PackedGeometry(Mapping):
+    """
+    Polygon or MultiPolygon with its coordinates in flat typed arrays.
+
+    coords holds dims numbers per position. offsets has one array per nesting
+    level above the positions (rings for a Polygon; polygons, then rings for a
+    MultiPolygon). Entry i and i + 1 of a level bound child i in the level below.
+    integers holds the indexes in coords of numbers written as integers in the
+    source, so they serialize back the same way.
+    """
+
+    def __init__(self, geometry_type, coords, offsets, dims, integers=(), members=None):
+        self.type = geometry_type
+        self.coords = coords
+        self.offsets = offsets
+        self.dims = dims
+        self.integers = set(integers)
+        # Geometry members in source order, with _COORDINATES in place of the coordinates
+        self.members = members or [('type', geometry_type), ('coordinates', _COORDINATES)]
+
+    def __getitem__(self, key):
+        for name, value in self.members:
+            if name == key:
+                return self.coordinates if value is _COORDINATES else value
+        raise KeyError(key)
+
+    def __iter__(self):
+        return (name for name, _ in self.members)
+
+    def __len__(self):
+        return len(self.members)
+
+    @property
+    def coordinates(self):
+        """Nested-list view of the coordinates"""
+        top = len(self.offsets[0]) - 1 if self.offsets else len(self.coords) // max(1, self.dims)
+        return _CoordinateView(self, 0, 0, top)
+
+    @property
+    def vertex_count(self):
+        """Number of positions"""
+        return len(self.coords) // self.dims if self.dims else 0
+
+    def _positions_json(self, lo, hi):
+        d = self.dims
+        if not d:
+            return '[]'
+        position = '[' + ', '.join(['%s'] * d) + ']'
+        chunks = []
+        # Join a chunk at a time, so a huge ring never holds one string per vertex
+        for chunk_start in range(lo * d, hi * d, JSON_CHUNK_POSITIONS * d):
+            chunk_end = min(hi * d, chunk_start + JSON_CHUNK_POSITIONS * d)
+            values = self.coords[chunk_start:chunk_end]
+            if self.integers and any(chunk_start <= i < chunk_end for i in self.integers):
+                values = [repr(int(v)) if chunk_start + k in self.integers else repr(v)
+                          for k, v in enumerate(values)]
+            else:
+                values = map(repr, values)
+            chunks.append(', '.join(map(position.__mod__, zip(*[iter(values)] * d))))
+        return '[' + ', '.join(chunks) + ']'
+
+    def _level_json(self, level, lo, hi):
+        if level == len(self.offsets):
+            return self._positions_json(lo, hi)
+        offsets = self.offsets[level]
+        return '[' + ', '.join(self._level_json(level + 1, offsets[i], offsets[i + 1])
+                               for i in range(lo, hi)) + ']'
+
+    def to_json(self, sort_keys=False):
+        """
+        Serializes the geometry as json.dumps would serialize its nested form.
+
+        Args:
+            sort_keys: Sort the geometry members, as json.dumps(sort_keys=True) does
+
+        Returns:
+            str: GeoJSON geometry text
+        """
+        coordinates = self.coordinates
+        members = sorted(self.members, key=lambda m: m[0]) if sort_keys else self.members
+        return '{' + ', '.join(
+            json.dumps(name) + ': ' + (
+                self._level_json(0, coordinates.lo, coordinates.hi) if value is _COORDINATES
+                else json.dumps(value, sort_keys=sort_keys, default=float))
+            for name, value in members) + '}'
+
+    def to_geojson(self):
+        """
+        Expands the geometry into nested lists.
+
+        Returns:
+            dict: GeoJSON geometry
+        """
+        return json.loads(self.to_json())
+
+    def simplified(self, factor):
+        """
+        Applies geojson_transform.simplify_coordinates without expanding the coordinates.
+
+        Lists of more than 100 children keep their first, every 1/factor-th and
+        last child, and such kept children are copied whole. Shorter lists are
+        simplified child by child.
+
+        Args:
+            factor: Simplification factor (lower = more simplified)
+
+        Returns:
+            PackedGeometry: Simplified geometry with only 'type' and 'coordinates'
+        """
+        step = max(1, int(1 / factor))
+        depth = len(self.offsets)
+        new_offsets = [array('q', [0]) for _ in range(depth)]
+        kept = array('q')
+
+        def copy(level, lo, hi, simplify):
+            if simplify and hi - lo > 100:
+                children = [lo] + list(range(lo + 1, hi - 1, step)) + [hi - 1]
+                simplify = False
+            else:
+                children = range(lo, hi)
+            if level == depth:
+                kept.extend(children)
+                return
+            offsets = self.offsets[level]
+            for i in children:
+                copy(level + 1, offsets[i], offsets[i + 1], simplify)
+                new_offsets[level].append(
+                    len(kept) if level == depth - 1 else len(new_offsets[level + 1]) - 1)
+
+        coordinates = self.coordinates
+        copy(0, coordinates.lo, coordinates.hi, True)
+
+        d = self.dims
+        coords = array('d')
+        integers = set()
+        for new_index, p in enumerate(kept):
+            coords.extend(self.coords[p * d:(p + 1) * d])
+            if self.integers:
+                integers.update(new_index * d + k for k in range(d) if p * d + k in self.integers)
+        return PackedGeometry(self.type, coords, new_offsets, d, integers)
+
+
+def _read_coordinates(events, depth):
+    """
+    Consumes a coordinates array into flat typed arrays.
+
+    Args:
+        events: ijson event iterator positioned just after the coordinates start_array
+        depth: Array depth of a position within the coordinates
+
+    Returns:
+        tuple: (coords, offsets, dims, integer indexes)
+    """
+    coords = array('d')
+    offsets = [array('q', [0]) for _ in range(depth - 2)]
+    integers = []
+    dims = 0
+    positions = 0
+    position_length = 0
+    level = 1
+
+    for _, event, value in events:
+        if event == 'number':
+            if level != depth:
+                raise ValueError(f"Number at array depth {level} of a depth {depth} geometry")
+            if value.__class__ is int:
+                integers.append(len(coords))
+                coords.append(value)
+            else:
+                coords.append(float(value))
+            position_length += 1
+        elif event == 'start_array':
+            level += 1
+            if level > depth:
+                raise ValueError(f"Coordinates nested deeper than {depth} arrays")
+            position_length = 0
+        elif event == 'end_array':
+            if level == depth:
+                if not dims:
+                    dims = position_length
+                elif position_length != dims:
+                    raise ValueError(
+                        f"Mixed coordinate dimensions ({dims} and {position_length}) in one geometry")
+                positions += 1
+            elif level == 1:
+                return coords, offsets, dims, integers
+            else:
+                offsets[level - 2].append(
+                    positions if level == depth - 1 else len(offsets[level - 1]) - 1)
+            level -= 1
+        else:
+            raise ValueError(f"Unexpected {event} in coordinates")
+
+    raise ValueError("Unterminated coordinates array")
+
+
+def _read_feature(events):
+    builder = ijson.ObjectBuilder()
+    builder.event('start_map', None)
+    geometry_type = None
+    packed = None
+
+    for prefix, event, value in events:
+        if event == 'start_array' and prefix == COORDINATES_PREFIX and geometry_type in PACKED_DEPTHS:
+            packed = _read_coordinates(events, PACKED_DEPTHS[geometry_type])
+            builder.event('string', _COORDINATES)
+            continue
+        if event == 'end_map' and prefix == FEATURE_PREFIX:
+            break
+        if event == 'string' and prefix == GEOMETRY_TYPE_PREFIX:
+            geometry_type = value
+        builder.event(event, value)
+
+    builder.event('end_map', None)
+    feature = builder.value
+    if packed:
+        geometry = feature['geometry']
+        feature['geometry'] = PackedGeometry(geometry['type'], *packed, members=list(geometry.items()))
+    return feature
+
+
+def iter_packed_features(filename):
+    """
+    Streams the features of a GeoJSON FeatureCollection with packed geometry.
+
+    Args:
+        filename: Path to the GeoJSON file
+
+    Yields:
+        dict: GeoJSON feature whose Polygon or MultiPolygon geometry is a PackedGeometry
+    """
+    backend = _backend()
+    with open(filename, 'rb') as f:
+        events = backend.parse(f)
+        for prefix, event, _ in events:
+            if event == 'start_map' and prefix == FEATURE_PREFIX:
+                yield _read_feature(events)
+
+
+def count_geojson_features(filename):
+    """
+    Counts the features of a GeoJSON FeatureCollection without building them.
+
+    Args:
+        filename: Path to the GeoJSON file
+
+    Returns:
+        int: Number of features
+    """
+    backend = _backend()
+    with open(filename, 'rb') as f:
+        return sum(1 for prefix, event, _ in backend.parse(f, use_float=True)
+                   if event == 'start_map' and prefix == FEATURE_PREFIX)
+
+
+def _peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def write_benchmark_feature(path, vertices, parts=4):
+    """
+    Writes a FeatureCollection holding one MultiPolygon with a given vertex count.
+
+    Rings are noisy circles with 14 decimal places, like surveyed coastlines.
+
+    Args:
+        path: Output GeoJSON path
+        vertices: Total vertices across all parts
+        parts: Number of polygons
+    """
+    rng = random.Random(vertices)
+    per_part = max(4, vertices // parts)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"type": "FeatureCollection", "features": [{"type": "Feature", '
+                '"properties": {"objectid": 1, "ahupuaa": "Benchmark", "moku": "Kona", '
+                '"mokupuni": "Hawaii", "gisacres": 12345.678}, '
+                '"geometry": {"type": "MultiPolygon", "coordinates": [')
+        for part in range(parts):
+            # Written vertex by vertex, so the parent's peak RSS stays below the measured ones
+            f.write('[[' if part == 0 else ', [[')
+            for i in range(per_part - 1):
+                angle = 2 * math.pi * i / (per_part - 1)
+                radius = 0.05 * (1 + 0.02 * rng.random())
+                vertex = (f"[{-156.0 + part * 0.2 + radius * math.cos(angle):.14f}, "
+                          f"{19.5 + radius * math.sin(angle):.14f}]")
+                if i == 0:
+                    first = vertex
+                f.write(vertex + ', ')
+            f.write(first + ']]')
+        f.write(']}}]}')
+
+
+def measure(mode, path, transform=False, import_pass=False):
+    """
+    Parses a file in this process and reports the peak RSS it took.
+
+    Args:
+        mode: 'nested' (ijson.items with Decimals) or 'packed'
+        path: GeoJSON file to parse
+        transform: Also build the DynamoDB item for each feature
+        import_pass: Instead run process_geojson over the file with its default
+            stages, with a writer that drops every batch
+
+    Returns:
+        dict: Mode, Seconds, BaselineBytes and ParsePeakBytes, TransformPeakBytes
+        (with transform) or ImportPeakBytes (with import_pass)
+    """
+    from geojson_transform import build_feature_item, iter_features
+
+    if import_pass:
+        from upload_geojson_to_dynamodb import process_geojson
+
+        baseline = _peak_rss_bytes()
+        start = time.perf_counter()
+        if not process_geojson(path, writer=lambda batch: True,
+                               packed_geometry=(mode == 'packed')):
+            raise RuntimeError(f"Import pass over {path} failed")
+        return {'Mode': mode, 'BaselineBytes': baseline, 'ImportPeakBytes': _peak_rss_bytes(),
+                'Seconds': round(time.perf_counter() - start, 3)}
+
+    baseline = _peak_rss_bytes()
+    start = time.perf_counter()
+    features = list(iter_features(path, packed=(mode == 'packed')))
+    result = {'Mode': mode, 'BaselineBytes': baseline, 'ParsePeakBytes': _peak_rss_bytes()}
+    if transform:
+        for feature_index, feature in enumerate(features):
+            build_feature_item(feature, feature_index, 0)
+        result['TransformPeakBytes'] = _peak_rss_bytes()
+    result['Seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _run_measure(mode, path, *flags):
+    command = [sys.executable, os.path.abspath(__file__), '--measure', mode, path, *flags]
+    # Importing the uploader creates boto3 clients, which need a region but no credentials
+    env = dict(os.environ)
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    output = subprocess.run(command, check=True, capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output)
+
+
+def run_memory_benchmark(sizes, transform=False, import_pass=False):
+    """
+    Measures peak RSS of the nested and packed parsers per feature size.
+
+    Each measurement runs in a fresh interpreter, so peaks don't carry over.
+    Peaks are reported above the interpreter's own peak after imports.
+
+    Args:
+        sizes: Vertex counts of the benchmark feature
+        transform: Also measure building the DynamoDB item
+        import_pass: Also measure a whole process_geojson pass, in its own interpreter
+
+    Returns:
+        list: Result dicts with Vertices added
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, f"feature_{size}.geojson")
+            write_benchmark_feature(path, size)
+            for mode in ('nested', 'packed'):
+                result = _run_measure(mode, path, *(['--transform'] if transform else []))
+                result['Vertices'] = size
+                results.append(result)
+
+                parse_bytes = result['ParsePeakBytes'] - result['BaselineBytes']
+                line = (f"{size} vertices, {mode}: parse peak +{parse_bytes / (1024*1024):.1f} MB "
+                        f"({parse_bytes / size:.0f} bytes/vertex)")
+                if transform:
+                    total_bytes = result['TransformPeakBytes'] - result['BaselineBytes']
+                    line += f", with transform +{total_bytes / (1024*1024):.1f} MB"
+                logger.info(f"{line}, {result['Seconds']}s")
+
+                if import_pass:
+                    result = _run_measure(mode, path, '--import-pass')
+                    result['Vertices'] = size
+                    results.append(result)
+                    import_bytes = result['ImportPeakBytes'] - result['BaselineBytes']
+                    logger.info(f"{size} vertices, {mode}: import pass peak "
+                                f"+{import_bytes / (1024*1024):.1f} MB, {result['Seconds']}s")
+    return results
+
+
+def parse_arguments():
+    """
+    Parse command line arguments for the script.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Measure peak memory of the nested and packed GeoJSON parsers')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Run the peak RSS benchmark over --sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_BENCHMARK_SIZES,
+                        help=f'Vertex counts of the benchmark feature (default: {DEFAULT_BENCHMARK_SIZES})')
+    parser.add_argument('--transform', action='store_true',
+                        help='Also measure building the DynamoDB item')
+    parser.add_argument('--import-pass', action='store_true',
+                        help='Also measure a whole process_geojson pass with its default stages, '
+                             'writing nothing')
+    parser.add_argument('--output', help='Write the benchmark results to this JSON file')
+    parser.add_argument('--measure', nargs=2, metavar=('MODE', 'GEOJSON'),
+                        help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], args.measure[1], args.transform,
+                                 args.import_pass)))
+        sys.exit(0)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.benchmark:
+        benchmark_results = run_memory_benchmark(args.sizes, args.transform, args.import_pass)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(benchmark_results, f, indent=2)
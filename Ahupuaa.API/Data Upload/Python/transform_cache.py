@@ -0,0 +1,199 @@
+"""
+On-Disk Cache of Transformed Ahupuaa Items
+
+build_feature_item recomputes bounds, centroid, geohash, three simplified
+geometry levels, hints and JSON strings for every feature on every run, even
+when almost none of the source layer changed since the last one. This cache
+stores the finished item in a local SQLite file, keyed by a hash of the
+canonical feature JSON, the keys and names the importer derives for it, and
+TRANSFORM_VERSION. Re-runs, test runs and loads into other environments read
+the item back and skip straight to writing.
+
+Only the per-run fields are patched on a hit: Metadata.DataVersion and
+Metadata.LastUpdated. Everything applied after the transform (Hilbert keys,
+geometry dedupe, chunking) is not cached, so those options can change freely
+between runs.
+
+The file is bounded in size. Each hit or store stamps the entry with a use
+counter, and when the cache is closed the least recently used entries are
+evicted until it fits.
+
+Usage:
+  cache = TransformCache('.transform_cache.sqlite', max_bytes=512 * 1024 * 1024)
+  item = cache.build_feature_item(feature, feature_index, data_version)
+  cache.close()
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import sqlite3
+import zlib
+
+from geojson_transform import (TRANSFORM_VERSION, build_feature_item, canonical_feature_parts,
+                               custom_json_encoder, feature_identity)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = '.transform_cache.sqlite'
+DEFAULT_CACHE_MAX_MB = 512
+COMMIT_INTERVAL = 500  # Writes between commits, so a crash loses little work
+
+
+def cache_key(feature, feature_index):
+    """
+    Computes the content address of a feature's transformed item.
+
+    The derived identity is part of the key because a feature without an id
+    or name falls back to its position in the file.
+
+    Args:
+        feature: GeoJSON feature as parsed from the source file
+        feature_index: Position of the feature in the source file
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    identity = json.dumps(feature_identity(feature, feature_index), sort_keys=True,
+                          default=custom_json_encoder)
+    digest = hashlib.sha256(f"{TRANSFORM_VERSION}\n{identity}\n".encode('utf-8'))
+    for part in canonical_feature_parts(feature):
+        digest.update(part.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class TransformCache:
+    """
+    Size-bounded LRU cache of build_feature_item results in a SQLite file.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "key TEXT PRIMARY KEY, item BLOB NOT NULL, size INTEGER NOT NULL, "
+            "last_used INTEGER NOT NULL)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS items_last_used ON items (last_used)")
+
+        total_bytes, last_used = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM items").fetchone()
+        self.total_bytes = total_bytes
+        self.use_counter = last_used
+        self.pending_writes = 0
+        self.stats = {'Hits': 0, 'Misses': 0, 'Stored': 0, 'Evicted': 0, 'EvictedBytes': 0}
+
+    def _touch(self):
+        self.use_counter += 1
+        self.pending_writes += 1
+        if self.pending_writes >= COMMIT_INTERVAL:
+            self.connection.commit()
+            self.pending_writes = 0
+        return self.use_counter
+
+    def get(self, key):
+        """
+        Looks up a cached item and marks it as recently used.
+
+        Args:
+            key: Cache key from cache_key
+
+        Returns:
+            dict: The cached item, or None on a miss
+        """
+        row = self.connection.execute(
+            "SELECT item FROM items WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats['Misses'] += 1
+            return None
+
+        self.connection.execute(
+            "UPDATE items SET last_used = ? WHERE key = ?", (self._touch(), key))
+        self.stats['Hits'] += 1
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def put(self, key, item):
+        """
+        Stores an item.
+
+        Args:
+            key: Cache key from cache_key
+            item: Feature item in low-level attribute format
+        """
+        blob = zlib.compress(json.dumps(item, separators=(',', ':')).encode('utf-8'))
+        previous = self.connection.execute(
+            "SELECT size FROM items WHERE key = ?", (key,)).fetchone()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO items (key, item, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, blob, len(blob), self._touch()))
+        self.total_bytes += len(blob) - (previous[0] if previous else 0)
+        self.stats['Stored'] += 1
+
+    def build_feature_item(self, feature, feature_index, data_version):
+        """
+        Returns the item for a feature from the cache, transforming it on a miss.
+
+        Args:
+            feature: GeoJSON feature
+            feature_index: Position of the feature in the source file
+            data_version: Import version stamped into the item metadata
+
+        Returns:
+            dict: DynamoDB item, as build_feature_item would return it
+        """
+        key = cache_key(feature, feature_index)
+        item = self.get(key)
+        if item is None:
+            item = build_feature_item(feature, feature_index, data_version)
+            self.put(key, item)
+            return item
+
+        metadata = item['Metadata']['M']
+        metadata['DataVersion'] = {'N': str(data_version)}
+        metadata['LastUpdated'] = {'S': datetime.datetime.now().isoformat()}
+        return item
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache fits its size limit.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        evicted = 0
+        while self.total_bytes > self.max_bytes:
+            rows = self.connection.execute(
+                "SELECT key, size FROM items ORDER BY last_used LIMIT 1000").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.connection.execute("DELETE FROM items WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.stats['EvictedBytes'] += size
+                evicted += 1
+
+        self.stats['Evicted'] += evicted
+        return evicted
+
+    def log_summary(self):
+        """Logs the hit rate and size of the cache"""
+        lookups = self.stats['Hits'] + self.stats['Misses']
+        if not lookups:
+            return
+        logger.info(
+            f"Transform cache {self.path}: {self.stats['Hits']} hits, "
+            f"{self.stats['Misses']} misses ({self.stats['Hits'] / lookups:.1%} hit rate), "
+            f"{self.stats['Evicted']} evicted ({self.stats['EvictedBytes'] / (1024*1024):.1f} MB), "
+            f"{self.total_bytes / (1024*1024):.1f} of {self.max_bytes / (1024*1024):.0f} MB used")
+
+    def close(self):
+        """Evicts down to the size limit, commits and logs the cache statistics"""
+        self.evict()
+        self.connection.commit()
+        self.connection.close()
+        self.log_summary()
@@ -9,26 +9,43 @@ Usage:
   python import_geojson_to_dynamodb.py
 
 Requirements:
-  - boto3, ijson, geohash2
+  - boto3, ijson, geohash2 (pyarrow for GeoParquet/Arrow input)
   - AWS credentials configured via AWS CLI or environment variables
-  - GeoJSON file with Hawaiian land division data
+  - GeoJSON, GeoParquet or Arrow IPC file with Hawaiian land division data
 """
 
 import boto3
-import ijson
+import json
 import os
 import time
 import logging
-import json
 import traceback
 import argparse
 import sys
-import hashlib
 import datetime
-from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
-import geohash2  # For geohash generation
+
+from adjacency import AdjacencyBuilder
+from capacity_planner import (WriteCapacityEstimator, apply_capacity, describe_capacity,
+                              log_capacity_plan, parse_index_definitions, plan_capacity)
+from catalog_items import CatalogBuilder
+from change_manifest import MANIFEST_PK, write_change_manifest
+from dataset_snapshot import SnapshotWriter
+from fanout_writer import FanoutWriter, WriteTarget, parse_target_spec
+from geojson_transform import (build_feature_item, count_features, dedupe_geometry_levels,
+                               iter_features)
+from geometry_fragments import (DEFAULT_FRAGMENT_PRECISION, FRAGMENT_PRECISION,
+                                build_fragment_items)
+from hierarchy_aggregates import HierarchyAggregator
+from hilbert_index import DEFAULT_HILBERT_ORDER, add_hilbert_keys
+from item_chunking import split_oversized_item
+from transform_cache import DEFAULT_CACHE_MAX_MB, TransformCache
+from versioned_import import (POINTER_PK, create_version_table, flip_active_pointer,
+                              format_version_table_name, match_home_capacity,
+                              read_active_pointer, start_garbage_collection,
+                              validate_version_table)
+from write_scheduler import DEFAULT_WINDOW_ITEMS, WriteScheduler
 
 # Set up logging
 logging.basicConfig(
@@ -47,10 +64,9 @@ TABLE_NAME = 'AhupuaaGIS'  # DynamoDB table name from Terraform
 GEOJSON_FILE = '/Users/greg/repos/ahupuaa/Ahupuaa.API/Misc/ahupuaa.geojson'
 BATCH_SIZE = 25  # DynamoDB BatchWriteItem limit
 MAX_WORKERS = 10  # Number of workers for parallel operations
-# Simplification factor for map rendering (lower = more simplified)
-SIMPLIFIED_COORDS_FACTOR = 0.01
 MAX_RETRIES = 10  # Maximum number of retries for write operations
 DATA_VERSION = int(datetime.datetime.now().timestamp())
+DEFAULT_IMPORT_DURATION = 900  # Target import duration in seconds for capacity planning
 
 # Initialize DynamoDB resources
 try:
@@ -160,7 +176,7 @@ def manage_terraform_infrastructure(action, terraform_dir, vars_file=None):
         os.chdir(original_dir)
 
 
-def clear_table(table_name, confirm=True):
+def clear_table(table_name, confirm=True, preserve_pks=(), client=None):
     """
     Clears all items from the specified DynamoDB table.
     This is equivalent to a TRUNCATE operation in SQL.
@@ -168,6 +184,8 @@ def clear_table(table_name, confirm=True):
     Args:
         table_name: Name of the DynamoDB table to clear
         confirm: If True, asks for confirmation before proceeding
+        preserve_pks: Partition key values whose items are kept
+        client: boto3 DynamoDB client (default: the importer's client)
 
     Returns:
         bool: True if successful, False otherwise
@@ -180,10 +198,11 @@ def clear_table(table_name, confirm=True):
             return False
 
     logger.info(f"Preparing to clear all items from table {table_name}...")
+    client = client or dynamodb_client
 
     try:
         # First, get the primary key structure
-        table_description = dynamodb_client.describe_table(
+        table_description = client.describe_table(
             TableName=table_name)
         key_schema = table_description['Table']['KeySchema']
 
@@ -222,7 +241,7 @@ def clear_table(table_name, confirm=True):
             }
 
             try:
-                dynamodb_client.batch_write_item(RequestItems=request_items)
+                client.batch_write_item(RequestItems=request_items)
                 return len(items)
             except Exception as e:
                 logger.error(f"Failed to delete batch: {e}")
@@ -235,10 +254,13 @@ def clear_table(table_name, confirm=True):
             if start_key:
                 scan_kwargs['ExclusiveStartKey'] = start_key
 
-            response = dynamodb_client.scan(**scan_kwargs)
+            response = client.scan(**scan_kwargs)
             items = []
 
             for item in response.get('Items', []):
+                if item[partition_key].get('S') in preserve_pks:
+                    continue
+
                 key = {}
                 key[partition_key] = item[partition_key]
                 if sort_key and sort_key in item:
@@ -271,65 +293,14 @@ def clear_table(table_name, confirm=True):
         return False
 
 
-def replace_floats(obj):
-    """
-    Recursively converts all float values to Decimal for DynamoDB compatibility.
-    Uses precise string conversion to avoid floating-point issues.
-
-    Args:
-        obj: The object to process (list, dict, float, or other)
-
-    Returns:
-        The object with floats replaced by Decimal
-    """
-    if isinstance(obj, list):
-        return [replace_floats(i) for i in obj]
-    elif isinstance(obj, dict):
-        return {k: replace_floats(v) for k, v in obj.items()}
-    elif isinstance(obj, float):
-        # Use string with sufficient precision to maintain accuracy
-        # but trim unnecessary trailing zeros
-        s = f"{obj:.10f}".rstrip('0').rstrip('.') if obj != 0 else '0'
-        return Decimal(s)
-    else:
-        return obj
-
-
-def simplify_coordinates(coordinates, factor=SIMPLIFIED_COORDS_FACTOR):
-    """
-    Simplifies coordinate arrays for more efficient mobile rendering.
-
-    Args:
-        coordinates: GeoJSON coordinates array (can be nested)
-        factor: Simplification factor (lower = more simplified)
-
-    Returns:
-        Simplified coordinates
-    """
-    if isinstance(coordinates, list):
-        if all(isinstance(x, (int, float, Decimal)) for x in coordinates):
-            # This is a single coordinate pair, return as is
-            return coordinates
-        elif len(coordinates) > 100:  # Only simplify if many points
-            # This is a list of coordinates or nested lists
-            # Keep only a subset of points based on the factor
-            # For polygon boundaries, we preserve the shape while reducing points
-            step = max(1, int(1/factor))
-            # Always keep first and last point for polygons to ensure closure
-            if len(coordinates) > 2:
-                simplified = [coordinates[0]] + \
-                    coordinates[1:-1:step] + [coordinates[-1]]
-                return simplified
-
-        # For nested structures, recursively simplify
-        return [simplify_coordinates(c, factor) for c in coordinates]
-
-    return coordinates
-
-
-def write_batch_to_dynamo(batch_items, max_retries=MAX_RETRIES):
+def write_batch_to_dynamo(batch_items, max_retries=MAX_RETRIES, table_name=None, client=None):
     # Use a more efficient parallel processing approach
     from concurrent.futures import ThreadPoolExecutor
+    table_name = table_name or TABLE_NAME
+    client = client or dynamodb_client
+    if not batch_items:
+        # Nothing to write, e.g. the adjacency items of an empty import
+        return True
 
     # Split batches into chunks of BATCH_SIZE
     batches = [batch_items[i:i+BATCH_SIZE]
@@ -341,12 +312,12 @@ def write_batch_to_dynamo(batch_items, max_retries=MAX_RETRIES):
 
         while items_to_process and retries < max_retries:
             try:
-                request_items = {TABLE_NAME: items_to_process}
-                response = dynamodb_client.batch_write_item(
+                request_items = {table_name: items_to_process}
+                response = client.batch_write_item(
                     RequestItems=request_items)
 
                 unprocessed = response.get(
-                    'UnprocessedItems', {}).get(TABLE_NAME, [])
+                    'UnprocessedItems', {}).get(table_name, [])
                 if unprocessed:
                     items_to_process = unprocessed
                     retries += 1
@@ -405,115 +376,33 @@ def ensure_table_exists(wait_time=60):
         return False
 
 
-def format_hierarchical_key(mokupuni, moku):
-    """
-    Formats a hierarchical sort key for the DynamoDB schema.
-
-    Args:
-        mokupuni: Island name
-        moku: District name
-
-    Returns:
-        str: Formatted hierarchical key
-    """
-    # Clean and standardize names
-    mokupuni = (mokupuni or "Unknown").strip()
-    moku = (moku or "Unknown").strip()
-
-    return f"MOKUPUNI#{mokupuni}#MOKU#{moku}"
-
-
-def guess_centroid_from_geometry(geometry):
-    """
-    Estimates a centroid from GeoJSON geometry when not explicitly provided.
-
-    Args:
-        geometry: GeoJSON geometry object
-
-    Returns:
-        dict: Centroid with lat/lng or None if can't be determined
-    """
-    try:
-        if geometry['type'] == 'Polygon':
-            # Average the coordinates of the first (exterior) ring
-            coordinates = geometry['coordinates'][0]
-            lat_sum = lng_sum = 0
-            for coord in coordinates:
-                lng_sum += float(coord[0])
-                lat_sum += float(coord[1])
-
-            return {
-                'lat': Decimal(str(lat_sum / len(coordinates))),
-                'lng': Decimal(str(lng_sum / len(coordinates)))
-            }
-        elif geometry['type'] == 'Point':
-            # Point is already a centroid
-            return {
-                'lat': Decimal(str(geometry['coordinates'][1])),
-                'lng': Decimal(str(geometry['coordinates'][0]))
-            }
-        else:
-            return None
-    except (KeyError, IndexError, TypeError):
-        return None
-
-
-def extract_bounds_from_geometry(geometry):
-    """
-    Extracts bounding box from GeoJSON geometry.
-
-    Args:
-        geometry: GeoJSON geometry object
-
-    Returns:
-        dict: Bounds with northeast and southwest corners or None
-    """
-    try:
-        if geometry['type'] == 'Polygon':
-            # Find min/max coordinates
-            coordinates = geometry['coordinates'][0]
-            lats = [float(c[1]) for c in coordinates]
-            lngs = [float(c[0]) for c in coordinates]
-
-            return {
-                'northeast': {
-                    'lat': Decimal(str(max(lats))),
-                    'lng': Decimal(str(max(lngs)))
-                },
-                'southwest': {
-                    'lat': Decimal(str(min(lats))),
-                    'lng': Decimal(str(min(lngs)))
-                }
-            }
-        else:
-            return None
-    except (KeyError, IndexError, TypeError):
-        return None
-
-
-def custom_json_encoder(obj):
-    """
-    Custom JSON encoder that handles Decimal objects properly.
-
-    Args:
-        obj: Object to encode
-
-    Returns:
-        Properly serialized value
-    """
-    if isinstance(obj, Decimal):
-        return float(obj)
-    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
-
-
-def process_geojson(filename, test_mode=False, test_limit=2):
+def process_geojson(filename, test_mode=False, test_limit=2, snapshot_path=None,
+                    feature_hashes=None, dedupe_geometry=False,
+                    schedule_window=DEFAULT_WINDOW_ITEMS, export_items_path=None,
+                    hilbert_order=DEFAULT_HILBERT_ORDER, transform_cache=None, writer=None,
+                    fragment_precision=DEFAULT_FRAGMENT_PRECISION, packed_geometry=True):
     """
     Processes a GeoJSON file and imports features to DynamoDB.
 
     Args:
-        filename: Path to the GeoJSON file
-        test_mode: If True, processes only a limited number of records
+        filename: Path to the GeoJSON, GeoParquet or Arrow IPC file
+        test_mode: If True, processes only a limited number of records and leaves
+            the catalog untouched, since a partial catalog would become current
         test_limit: Number of records to process in test mode
+        snapshot_path: Optional path of a memory-mappable dataset snapshot to write
+        feature_hashes: Optional dict filled with AhupuaaPK to FeatureHash for validation
+        dedupe_geometry: If True, stores identical geometry levels once per item
+        schedule_window: Items buffered to spread each batch across GSI keys
+        export_items_path: Optional path of an NDJSON export of the feature items
+        hilbert_order: Order of the Hilbert curve keys, or 0 to leave them out
+        transform_cache: Optional TransformCache to reuse items from earlier runs
+        writer: Callable writing a list of PutRequests and returning False on failure
+            (default: write_batch_to_dynamo). A writer with a flush() method may
+            write asynchronously; it is flushed before the catalog pointer and at the end.
+        fragment_precision: Geohash length of the clipped geometry fragment cells,
+            or 0 to write no fragments
+        packed_geometry: If True, parses GeoJSON coordinates into packed arrays
+            instead of nested lists of Decimals
 
     Returns:
         bool: True if import was successful
@@ -530,17 +419,30 @@ def process_geojson(filename, test_mode=False, test_limit=2):
         logger.info(
             f"Running in TEST MODE - will import only {test_limit} records")
 
-    batch = []
     total_processed = 0
     total_features = 0
     start_time = time.time()
+    scheduler = WriteScheduler(schedule_window, BATCH_SIZE)
+    aggregator = HierarchyAggregator()
+    adjacency = AdjacencyBuilder()
+    catalog = None if test_mode else CatalogBuilder()
+    snapshot = SnapshotWriter(DATA_VERSION) if snapshot_path else None
+    deduped_items = 0
+    dedupe_bytes_saved = 0
+    fragmented_features = 0
+    fragment_count = 0
+    export_file = None
+    write = writer or write_batch_to_dynamo
+    flush = getattr(write, 'flush', lambda: True)
 
     try:
+        if export_items_path:
+            export_file = open(export_items_path, 'w', encoding='utf-8')
+
+
         # First, count total features for progress reporting
         logger.info("Counting total features in file...")
-        with open(filename, 'rb') as f:
-            for _ in ijson.items(f, 'features.item'):
-                total_features += 1
+        total_features = count_features(filename)
 
         logger.info(f"Found {total_features} features to process")
 
@@ -553,325 +455,131 @@ def process_geojson(filename, test_mode=False, test_limit=2):
             process_count = total_features
 
         # Second pass to actually process the data
-        with open(filename, 'rb') as f:
-            # Process features one by one
-            for feature_index, feature in enumerate(ijson.items(f, 'features.item')):
-                # Stop after reaching test limit in test mode
-                if test_mode and total_processed >= test_limit:
-                    logger.info(
-                        f"Test mode: Reached limit of {test_limit} records, stopping import")
-                    break
+        for feature_index, feature in enumerate(iter_features(filename, packed=packed_geometry)):
+            # Stop after reaching test limit in test mode
+            if test_mode and feature_index >= test_limit:
+                logger.info(
+                    f"Test mode: Reached limit of {test_limit} records, stopping import")
+                break
+
+            transform = transform_cache.build_feature_item if transform_cache else build_feature_item
+            feature_item = transform(feature, feature_index, DATA_VERSION)
+            if hilbert_order:
+                add_hilbert_keys(feature_item, hilbert_order)
+            # Clip before dedupe, which may replace FullGeometry with a reference
+            fragments = build_fragment_items(feature_item, fragment_precision) \
+                if fragment_precision else []
+            if fragments:
+                fragmented_features += 1
+                fragment_count += len(fragments)
+            aggregator.add(feature, feature_item)
+            adjacency.add(feature, feature_item)
+            if catalog:
+                catalog.add(feature_item)
+            if snapshot:
+                snapshot.add_item(feature_item)
+            if export_file:
+                export_file.write(json.dumps(feature_item) + '\n')
+            if feature_hashes is not None:
+                feature_hashes[feature_item['AhupuaaPK']['S']] = \
+                    feature_item['Metadata']['M']['FeatureHash']['S']
+            if dedupe_geometry:
+                feature_item, bytes_saved = dedupe_geometry_levels(feature_item)
+                if bytes_saved:
+                    deduped_items += 1
+                    dedupe_bytes_saved += bytes_saved
+
+            # Queue for writing, split into head and geometry parts if oversized
+            for item in split_oversized_item(feature_item):
+                scheduler.add(item)
+            for fragment in fragments:
+                scheduler.add(fragment)
+
+            # Write the batches the scheduler has spread across GSI keys
+            batch = [{'PutRequest': {'Item': item}}
+                     for scheduled in scheduler.pop_ready() for item in scheduled]
+            if batch:
+                success = write(batch)
+                if success:
+                    total_processed += len(batch)
+                else:
+                    logger.error(
+                        f"Failed to write batch at feature {feature_index}")
+                    return False
 
-                # Extract key information
-                properties = feature.get('properties', {})
-
-                # Extract ahupuaa, moku, and mokupuni names with fallbacks
-                ahupuaa_name = properties.get(
-                    'ahupuaa', properties.get('name', f"Ahupuaa_{feature_index}"))
-                moku_name = properties.get('moku', 'Unknown')
-                mokupuni_name = properties.get('mokupuni', 'Unknown')
-
-                # Structure primary key
-                feature_id = feature.get(
-                    'id', str(properties.get('objectid', f"{feature_index}")))
-                ahupuaa_pk = f"AHUPUAA#{feature_id}"
-                hierarchy_sk = format_hierarchical_key(
-                    mokupuni_name, moku_name)
-
-                # Process geometry
-                geometry = replace_floats(feature.get('geometry', {}))
-
-                # Generate or extract bounds
-                bounds = feature.get('bounds')
-                if not bounds and geometry:
-                    bounds = extract_bounds_from_geometry(geometry)
-
-                # Generate or extract centroid
-                centroid = None
-                if 'centroid_geopoint' in feature and isinstance(feature['centroid_geopoint'], dict):
-                    centroid = feature['centroid_geopoint']
-                elif geometry:
-                    centroid = guess_centroid_from_geometry(geometry)
-
-                # Generate geohash from centroid
-                geohash = feature.get('geohash')
-                if not geohash and centroid:
-                    try:
-                        # Generate geohash from centroid
-                        geohash = geohash2.encode(
-                            float(centroid['lat']),
-                            float(centroid['lng']),
-                            precision=7
-                        )
-                    except Exception as e:
-                        logger.warning(
-                            f"Could not generate geohash for feature {feature_id}: {e}")
-                        geohash = "0000000"  # Default placeholder
-                elif not geohash:
-                    geohash = "0000000"  # Default when no centroid available
-
-                # First 3 chars for bounding box queries
-                geohash_prefix = geohash[:3]
-
-                # Create simplified geometry for mobile rendering
-                simplified_geometry = None
-                if geometry and 'coordinates' in geometry:
-                    simplified_coords = simplify_coordinates(
-                        geometry['coordinates'])
-                    simplified_geometry = {
-                        'type': geometry['type'],
-                        'coordinates': simplified_coords
-                    }
-
-                # Default zoom level - can be adjusted later based on feature size
-                zoom_level = 10
-
-                # Create item for DynamoDB that matches your schema
-                item = {
-                    'PutRequest': {
-                        'Item': {
-                            # Primary key - matching your Terraform schema
-                            'AhupuaaPK': {'S': ahupuaa_pk},
-                            'HierarchySK': {'S': hierarchy_sk},
-
-                            # Attributes used in GSIs
-                            'AhupuaaName': {'S': ahupuaa_name},
-                            'MokupuniName': {'S': mokupuni_name},
-                            'MokuName': {'S': moku_name},
-                            'Geohash': {'S': geohash},
-                            'GeohashPrefix': {'S': geohash_prefix},
-                            'ZoomLevel': {'N': str(zoom_level)},
-
-                            # Store simplified GeoJSON for faster mobile rendering
-                            'SimplifiedBoundaries': {'S': json.dumps(
-                                simplified_geometry or geometry,
-                                default=custom_json_encoder
-                            )}
-                        }
-                    }
-                }
-
-                # Add non-key attributes
-                if centroid:
-                    item['PutRequest']['Item']['Centroid'] = {
-                        'M': {
-                            'Lat': {'N': str(centroid['lat'])},
-                            'Lng': {'N': str(centroid['lng'])}
-                        }
-                    }
-
-                # Add MapKit annotation point
-                if centroid:
-                    item['PutRequest']['Item']['AnnotationPoint'] = {
-                        'S': json.dumps({
-                            'coordinate': [float(centroid['lng']), float(centroid['lat'])],
-                            'title': ahupuaa_name,
-                            'subtitle': f"{moku_name}, {mokupuni_name}"
-                        })
-                    }
-
-                # Add display priority based on feature size or importance
-                area = properties.get(
-                    'gisacres', properties.get('st_areashape', 0))
-                try:
-                    area_value = float(area)
-                    # Large areas get higher priority (will be displayed at lower zoom levels)
-                    priority = min(10, max(1, int(area_value / 10000)))
-                except (ValueError, TypeError):
-                    priority = 5  # Default priority
-
-                item['PutRequest']['Item']['DisplayPriority'] = {
-                    'N': str(priority)}
-
-                if bounds:
-                    item['PutRequest']['Item']['Bounds'] = {
-                        'M': {
-                            'Northeast': {
-                                'M': {
-                                    'Lat': {'N': str(bounds['northeast']['lat'])},
-                                    'Lng': {'N': str(bounds['northeast']['lng'])}
-                                }
-                            },
-                            'Southwest': {
-                                'M': {
-                                    'Lat': {'N': str(bounds['southwest']['lat'])},
-                                    'Lng': {'N': str(bounds['southwest']['lng'])}
-                                }
-                            }
-                        }
-                    }
-
-                # Add MBR (Minimum Bounding Rectangle) as a separate attribute
-                if bounds:
-                    item['PutRequest']['Item']['MBR'] = {
-                        'S': json.dumps([
-                            [float(bounds['southwest']['lng']),
-                             float(bounds['southwest']['lat'])],
-                            [float(bounds['northeast']['lng']),
-                             float(bounds['northeast']['lat'])]
-                        ])
-                    }
-
-                # Add zoom level range based on feature size
-                if bounds:
-                    # Calculate approximate size in degrees
-                    size_deg = max(
-                        float(bounds['northeast']['lat']) -
-                        float(bounds['southwest']['lat']),
-                        float(bounds['northeast']['lng']) -
-                        float(bounds['southwest']['lng'])
-                    )
-
-                    # Set min/max zoom based on feature size
-                    min_zoom = 5  # Default for large features
-                    max_zoom = 16  # Default for detailed view
-
-                    if size_deg < 0.01:  # Very small features
-                        min_zoom = 12
-                    elif size_deg < 0.05:  # Small features
-                        min_zoom = 10
-                    elif size_deg < 0.2:  # Medium features
-                        min_zoom = 8
-
-                    item['PutRequest']['Item']['MinZoom'] = {
-                        'N': str(min_zoom)}
-                    item['PutRequest']['Item']['MaxZoom'] = {
-                        'N': str(max_zoom)}
-
-                # Add geometry type
-                if 'type' in geometry:
-                    item['PutRequest']['Item']['GeometryType'] = {
-                        'S': geometry['type']}
-
-                # Add full geometry (can be used for detailed analysis)
-                item['PutRequest']['Item']['FullGeometry'] = {
-                    'S': json.dumps(geometry, default=custom_json_encoder)}
-
-                # Add style properties for the map
-                item['PutRequest']['Item']['StyleProperties'] = {
-                    'M': {
-                        'FillColor': {'S': '#A3C1AD'},   # Default fill color
-                        # Default border color
-                        'BorderColor': {'S': '#2A6041'},
-                        # Default border width
-                        'BorderWidth': {'N': '2'}
-                    }
-                }
-
-                # Create multiple simplification levels
-                if geometry and 'coordinates' in geometry:
-                    # Simplified (current version - medium detail)
-                    medium_coords = simplify_coordinates(
-                        geometry['coordinates'], factor=0.01)
-
-                    # High simplification (low detail for low zoom levels)
-                    low_coords = simplify_coordinates(
-                        geometry['coordinates'], factor=0.005)
-
-                    # Low simplification (high detail for high zoom levels)
-                    high_coords = simplify_coordinates(
-                        geometry['coordinates'], factor=0.03)
-
-                    item['PutRequest']['Item']['LowDetailBoundaries'] = {
-                        'S': json.dumps({
-                            'type': geometry['type'],
-                            'coordinates': low_coords
-                        }, default=custom_json_encoder)
-                    }
-
-                    item['PutRequest']['Item']['HighDetailBoundaries'] = {
-                        'S': json.dumps({
-                            'type': geometry['type'],
-                            'coordinates': high_coords
-                        }, default=custom_json_encoder)
-                    }
-
-                    # Add rendering hints for iOS
-                item['PutRequest']['Item']['iOSRenderingHints'] = {
-                    'M': {
-                        'StrokeWidth': {'N': '2'},
-                        'FillOpacity': {'N': '0.5'},
-                        'StrokeOpacity': {'N': '0.8'},
-                        # Use priority for z-index
-                        'ZIndex': {'N': str(priority)},
-                        # Solid line by default
-                        'LineDashPattern': {'S': '[0]'},
-                        # Lighter color when selected
-                        'SelectedFillColor': {'S': '#C1E1AD'},
-                        # Darker stroke when selected
-                        'SelectedStrokeColor': {'S': '#205841'},
-                    }
-                }
-
-                # Add original properties from GeoJSON
-                if properties:
-                    properties_map = {}
-                    for key, value in replace_floats(properties).items():
-                        if isinstance(value, str):
-                            properties_map[key] = {'S': value}
-                        elif isinstance(value, (int, Decimal)):
-                            properties_map[key] = {'N': str(value)}
-                        elif isinstance(value, bool):
-                            properties_map[key] = {'BOOL': value}
-                        elif value is None:
-                            properties_map[key] = {'NULL': True}
-                        else:
-                            # Convert complex types to string
-                            properties_map[key] = {'S': json.dumps(
-                                value, default=custom_json_encoder)}
-
-                    item['PutRequest']['Item']['Properties'] = {
-                        'M': properties_map}
-
-                # Add metadata for client caching
-                feature_hash = hashlib.md5(
-                    json.dumps(feature, sort_keys=True,
-                               default=custom_json_encoder).encode()
-                ).hexdigest()
-
-                item['PutRequest']['Item']['Metadata'] = {
-                    'M': {
-                        'DataVersion': {'N': str(DATA_VERSION)},
-                        'FeatureHash': {'S': feature_hash},
-                        'LastUpdated': {'S': datetime.datetime.now().isoformat()},
-                    }
-                }
-
-                # Add to batch
-                batch.append(item)
-
-                # Process batch when it reaches DynamoDB limit
-                if len(batch) >= BATCH_SIZE:
-                    success = write_batch_to_dynamo(batch)
-                    if success:
-                        total_processed += len(batch)
-                        batch = []
-                    else:
-                        logger.error(
-                            f"Failed to write batch at feature {feature_index}")
-                        return False
-
-                    # Log progress
-                    elapsed = time.time() - start_time
-                    progress = (total_processed / total_features) * \
-                        100 if total_features > 0 else 0
-                    rate = total_processed / elapsed if elapsed > 0 else 0
-
-                    logger.info(
-                        f"Progress: {progress:.2f}% ({total_processed}/{total_features}) - Rate: {rate:.2f} items/sec")
+                # Log progress
+                elapsed = time.time() - start_time
+                progress = ((feature_index + 1) / total_features) * \
+                    100 if total_features > 0 else 0
+                rate = total_processed / elapsed if elapsed > 0 else 0
+
+                logger.info(
+                    f"Progress: {progress:.2f}% ({feature_index + 1}/{total_features}) - Rate: {rate:.2f} items/sec")
 
         # Process remaining items
+        batch = [{'PutRequest': {'Item': item}}
+                 for scheduled in scheduler.flush() for item in scheduled]
         if batch:
-            success = write_batch_to_dynamo(batch)
+            success = write(batch)
             if success:
                 total_processed += len(batch)
             else:
                 logger.error("Failed to write final batch")
                 return False
+        scheduler.log_summary()
+
+        # Write the mokupuni and moku aggregates built during the pass
+        aggregate_items = aggregator.build_items(DATA_VERSION)
+        if aggregate_items and not write(
+                [{'PutRequest': {'Item': item}} for item in aggregate_items]):
+            logger.error("Failed to write hierarchy aggregate items")
+            return False
+        logger.info(
+            f"Wrote {len(aggregate_items)} mokupuni and moku aggregate items")
+
+        # Write the neighbour lists, one adjacency item per moku
+        adjacency_items = adjacency.build_items(DATA_VERSION)
+        if adjacency_items and not write(
+                [{'PutRequest': {'Item': item}} for item in adjacency_items]):
+            logger.error("Failed to write adjacency items")
+            return False
+        logger.info(f"Wrote {len(adjacency_items)} moku adjacency items")
+
+        # Write the catalog shards, then point readers at the new version
+        if catalog:
+            shard_items, catalog_pointer = catalog.build_items(DATA_VERSION)
+            if shard_items and not write(
+                    [{'PutRequest': {'Item': item}} for item in shard_items]):
+                logger.error("Failed to write catalog shard items")
+                return False
+            # Every shard must land before the pointer that names them
+            if not flush() or not write([{'PutRequest': {'Item': catalog_pointer}}]) or not flush():
+                logger.error("Failed to write catalog pointer item")
+                return False
+            logger.info(
+                f"Wrote catalog version {DATA_VERSION} in {len(shard_items)} shards")
+        else:
+            logger.info("Test mode: catalog not written, readers keep the current catalog")
+            if not flush():
+                logger.error("Failed to flush the final writes")
+                return False
+
+        if snapshot:
+            snapshot.write(snapshot_path)
+
+        if dedupe_geometry:
+            logger.info(
+                f"Geometry dedupe: {deduped_items} items shared detail levels, "
+                f"saving {dedupe_bytes_saved / 1024:.1f} KB")
+
+        if fragment_precision:
+            logger.info(
+                f"Geometry fragments: {fragment_count} precision {fragment_precision} "
+                f"cell fragments for {fragmented_features} features")
 
         total_time = time.time() - start_time
         logger.info(
-            f"Import completed: {total_processed} features imported in {total_time:.2f} seconds")
+            f"Import completed: {total_processed} items imported in {total_time:.2f} seconds")
         logger.info(
             f"Average rate: {total_processed / total_time:.2f} items/sec")
 
@@ -882,47 +590,156 @@ def process_geojson(filename, test_mode=False, test_limit=2):
         logger.error(traceback.format_exc())
         return False
 
+    finally:
+        if export_file:
+            export_file.close()
+
 
-def update_table_capacity(read_capacity, write_capacity):
+def plan_import_capacity(filename, target_seconds, test_mode=False, test_limit=2,
+                         dedupe_geometry=False, hilbert_order=DEFAULT_HILBERT_ORDER,
+                         transform_cache=None, fragment_precision=DEFAULT_FRAGMENT_PRECISION,
+                         packed_geometry=True):
     """
-    Updates the DynamoDB table's provisioned capacity.
+    Builds every item the import will write, sizes it for the base table and
+    each GSI, and plans the write capacity needed to finish in time.
 
     Args:
-        read_capacity: New read capacity units
-        write_capacity: New write capacity units
+        filename: Path to the GeoJSON file
+        target_seconds: Desired import duration in seconds
+        test_mode: If True, plans only a limited number of records
+        test_limit: Number of records to plan in test mode
+        dedupe_geometry: If True, sizes items with identical geometry levels stored once
+        hilbert_order: Order of the Hilbert curve keys, or 0 to leave them out
+        transform_cache: Optional TransformCache to reuse items from earlier runs
+        fragment_precision: Geohash length of the clipped geometry fragment cells,
+            or 0 to write no fragments
+        packed_geometry: If True, parses GeoJSON coordinates into packed arrays
+            instead of nested lists of Decimals
 
     Returns:
-        bool: True if update was successful
+        tuple: (current capacity, planned capacity), or (None, None) if the
+        table is on-demand or planning failed
     """
     try:
-        logger.info(
-            f"Updating table capacity to {read_capacity} RCU, {write_capacity} WCU")
+        table_description = dynamodb_client.describe_table(
+            TableName=TABLE_NAME)['Table']
+        current_capacity = describe_capacity(table_description)
+        if current_capacity is None:
+            logger.info(
+                f"Table {TABLE_NAME} uses on-demand capacity, no scaling needed")
+            return None, None
+
+        estimator = WriteCapacityEstimator(
+            parse_index_definitions(table_description))
+
+        logger.info("Sizing items for capacity planning...")
+        for feature_index, feature in enumerate(iter_features(filename, packed=packed_geometry)):
+            if test_mode and feature_index >= test_limit:
+                break
+            transform = transform_cache.build_feature_item if transform_cache else build_feature_item
+            feature_item = transform(feature, feature_index, DATA_VERSION)
+            if hilbert_order:
+                add_hilbert_keys(feature_item, hilbert_order)
+            if fragment_precision:
+                for fragment in build_fragment_items(feature_item, fragment_precision):
+                    estimator.add(fragment)
+            if dedupe_geometry:
+                feature_item, _ = dedupe_geometry_levels(feature_item)
+            for item in split_oversized_item(feature_item):
+                estimator.add(item)
+
+        estimator.log_summary()
+        planned_capacity = plan_capacity(
+            estimator, current_capacity, target_seconds)
+        log_capacity_plan(current_capacity, planned_capacity)
+
+        return current_capacity, planned_capacity
 
-        response = dynamodb_client.update_table(
-            TableName=TABLE_NAME,
-            ProvisionedThroughput={
-                'ReadCapacityUnits': read_capacity,
-                'WriteCapacityUnits': write_capacity
-            }
-        )
+    except Exception as e:
+        logger.error(f"Failed to plan table capacity: {e}")
+        logger.error(traceback.format_exc())
+        return None, None
 
-        # Wait for table to become active
-        waiter = dynamodb_client.get_waiter('table_exists')
-        waiter.wait(
-            TableName=TABLE_NAME,
-            WaiterConfig={
-                'Delay': 5,
-                'MaxAttempts': 20
-            }
-        )
 
-        logger.info("Table capacity updated successfully")
-        return True
+def run_fanout_import(args):
+    """
+    Imports the source file into several target tables in one pass.
 
-    except Exception as e:
-        logger.error(f"Failed to update table capacity: {e}")
+    Each target gets its own client, writer pool, retries and WCU budget, and
+    its own change manifest once the import succeeds. Terraform, capacity
+    scaling and blue/green switches stay single-table features.
+
+    Args:
+        args: Parsed command-line arguments with one or more --target values
+
+    Returns:
+        bool: True if every target received the whole import
+    """
+    try:
+        targets = [WriteTarget(parse_target_spec(spec)) for spec in args.target]
+    except ValueError as e:
+        logger.error(f"Invalid target: {e}")
         return False
 
+    for target in targets:
+        try:
+            status = target.client.describe_table(
+                TableName=target.table)['Table']['TableStatus']
+        except Exception as e:
+            logger.error(f"Target table {target.name} is not available: {e}")
+            return False
+        if status != 'ACTIVE':
+            logger.error(f"Target table {target.name} is {status}, not ACTIVE")
+            return False
+
+        if read_active_pointer(target.client, target.table):
+            logger.warning(
+                f"Readers of {target.table} follow an active version pointer; "
+                f"this import will not be served until the pointer changes")
+
+        confirm = not args.test or input(
+            f"Test mode: Do you want to clear {target.table} before importing test data? (y/n): "
+        ).lower() == 'y'
+        if confirm and not clear_table(target.table, preserve_pks={POINTER_PK, MANIFEST_PK},
+                                       client=target.client):
+            logger.error(f"Failed to clear {target.name}")
+            return False
+
+    transform_cache = None
+    if args.transform_cache:
+        transform_cache = TransformCache(
+            args.transform_cache, args.transform_cache_mb * 1024 * 1024)
+
+    writer = FanoutWriter(targets)
+    feature_hashes = {}
+    try:
+        success = process_geojson(
+            GEOJSON_FILE, test_mode=args.test, test_limit=args.limit,
+            snapshot_path=args.snapshot, feature_hashes=feature_hashes,
+            dedupe_geometry=args.dedupe_geometry, schedule_window=args.schedule_window,
+            export_items_path=args.export_items, hilbert_order=args.hilbert_order,
+            transform_cache=transform_cache, writer=writer,
+            fragment_precision=args.fragment_precision,
+            packed_geometry=not args.nested_geometry)
+    finally:
+        writer.close()
+        if transform_cache:
+            transform_cache.close()
+
+    reports = writer.report()
+    if args.fanout_report:
+        with open(args.fanout_report, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+        logger.info(f"Wrote per-target reports to {args.fanout_report}")
+
+    # A failed target is missing batches, so only complete ones get a manifest
+    if success and not args.test:
+        for target in writer.healthy_targets():
+            if not write_change_manifest(target.client, target.table, DATA_VERSION, feature_hashes):
+                logger.warning(f"Change manifest for {target.name} was not written")
+
+    return success and len(writer.healthy_targets()) == len(targets)
+
 
 def parse_arguments():
     """
@@ -946,11 +763,76 @@ def parse_arguments():
                         default='dev',
                         choices=['dev', 'staging', 'prod'],
                         help='Environment to deploy (dev, staging, prod)')
+    parser.add_argument('--target-duration', type=int,
+                        default=DEFAULT_IMPORT_DURATION,
+                        help='Target import duration in seconds used to plan write capacity '
+                             f'(default: {DEFAULT_IMPORT_DURATION})')
+    parser.add_argument('--auto-capacity', action='store_true',
+                        help='Scale table and GSI capacity for the import without prompting')
+    parser.add_argument('--plan-only', action='store_true',
+                        help='Print the capacity plan and exit without importing')
+    parser.add_argument('--snapshot', type=str,
+                        help='Also write a memory-mappable dataset snapshot to this path')
+    parser.add_argument('--blue-green', action='store_true',
+                        help='Load into a new versioned table and switch the active pointer '
+                             'after validation instead of clearing the live table (not with --test)')
+    parser.add_argument('--schedule-window', type=int, default=DEFAULT_WINDOW_ITEMS,
+                        help='Items buffered to spread each batch across GSI partition keys; '
+                             f'{BATCH_SIZE} keeps file order (default: {DEFAULT_WINDOW_ITEMS})')
+    parser.add_argument('--export-items', type=str,
+                        help='Also write the feature items to this NDJSON file '
+                             '(input for query_cost_simulator.py)')
+    parser.add_argument('--dedupe-geometry', action='store_true',
+                        help='Store identical geometry detail levels once per item '
+                             '(readers must resolve GeometryRefs)')
+    parser.add_argument('--hilbert-order', type=int, default=DEFAULT_HILBERT_ORDER,
+                        help='Order of the HilbertIndex spatial keys, 0 to leave them out '
+                             f'(default: {DEFAULT_HILBERT_ORDER})')
+    parser.add_argument('--fragment-precision', type=int, default=DEFAULT_FRAGMENT_PRECISION,
+                        help='Geohash length of the cells features are clipped into for '
+                             f'zoomed-in reads, e.g. {FRAGMENT_PRECISION}. Fragment items show up '
+                             'in full-table scans, so this is off by default '
+                             f'(default: {DEFAULT_FRAGMENT_PRECISION}, no fragments)')
+    parser.add_argument('--nested-geometry', action='store_true',
+                        help='Parse GeoJSON coordinates into nested lists of Decimals instead of '
+                             'packed arrays (uses far more memory on large features)')
+    parser.add_argument('--target', action='append',
+                        help='Import into this table as well as any other --target, in one pass: '
+                             'TABLE[,profile=NAME][,region=REGION][,wcu=N][,workers=N]. '
+                             'Replaces --env, Terraform and capacity options')
+    parser.add_argument('--fanout-report', type=str,
+                        help='Write the per-target run reports to this JSON file')
+    parser.add_argument('--source', type=str, default=GEOJSON_FILE,
+                        help='GeoJSON, GeoParquet or Arrow IPC file to import '
+                             f'(default: {GEOJSON_FILE})')
+    parser.add_argument('--transform-cache', type=str,
+                        help='SQLite file caching transformed items between runs')
+    parser.add_argument('--transform-cache-mb', type=int, default=DEFAULT_CACHE_MAX_MB,
+                        help=f'Size limit of the transform cache (default: {DEFAULT_CACHE_MAX_MB} MB)')
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_arguments()
+    GEOJSON_FILE = args.source
+
+    if args.blue_green and args.test:
+        # A partial version table would pass validation, become active and
+        # garbage-collect the older versions
+        logger.error("--blue-green cannot be combined with --test")
+        sys.exit(1)
+
+    if args.target:
+        if args.recreate_table or args.blue_green or args.auto_capacity or args.plan_only:
+            logger.error("--target cannot be combined with --recreate-table, --blue-green, "
+                         "--auto-capacity or --plan-only")
+            sys.exit(1)
+        print(f"Fan-out import of {GEOJSON_FILE} into {len(args.target)} tables")
+        if run_fanout_import(args):
+            print("\n✅ Import completed successfully for every target!")
+            sys.exit(0)
+        print("\n❌ Import failed for at least one target. Check the per-target reports.")
+        sys.exit(1)
 
     # Display welcome message
     print("=" * 80)
@@ -1066,45 +948,119 @@ if __name__ == "__main__":
         logger.error("Table validation failed. Exiting.")
         sys.exit(1)
 
-    # Continue with the rest of your existing code...
-    # Optionally update capacity before import for faster processing
+    # Plan capacity from the items this import will write
+    # Blue/green imports load an on-demand table, so there is nothing to scale
+    current_capacity = planned_capacity = None
+    scale_capacity = args.plan_only or (args.auto_capacity and not args.blue_green)
+    if not scale_capacity and not args.test and not args.blue_green:  # Only prompt outside test mode
+        scale_capacity = input(
+            "Would you like to temporarily increase table capacity for faster import? (y/n): ").lower() == 'y'
+
+    # Planning fills the transform cache, so the import itself only reads it back
+    transform_cache = None
+    if args.transform_cache:
+        transform_cache = TransformCache(
+            args.transform_cache, args.transform_cache_mb * 1024 * 1024)
+
+    if scale_capacity:
+        current_capacity, planned_capacity = plan_import_capacity(
+            GEOJSON_FILE, args.target_duration,
+            test_mode=args.test, test_limit=args.limit,
+            dedupe_geometry=args.dedupe_geometry, hilbert_order=args.hilbert_order,
+            transform_cache=transform_cache, fragment_precision=args.fragment_precision,
+            packed_geometry=not args.nested_geometry)
+
+    if args.plan_only:
+        if transform_cache:
+            transform_cache.close()
+        sys.exit(0)
+
+    if planned_capacity:
+        capacity_sent, capacity_active = apply_capacity(
+            dynamodb_client, TABLE_NAME, planned_capacity, current_capacity)
+        if not capacity_active:
+            logger.warning("Failed to update capacity, importing with current capacity")
+        # An update that was accepted but timed out still has to be undone
+        if not capacity_sent:
+            planned_capacity = None
+
+    home_table = TABLE_NAME
     try:
-        if not args.test:  # Skip for test mode
-            increase_capacity = input(
-                "Would you like to temporarily increase table capacity for faster import? (y/n): ")
-            if increase_capacity.lower() == 'y':
-                temp_write_capacity = 25  # Higher capacity for import
-                update_table_capacity(5, temp_write_capacity)
-    except Exception as e:
-        logger.warning(f"Failed to update capacity: {e}")
+        active_pointer = read_active_pointer(dynamodb_client, home_table)
 
-    # Clear the table before importing new data
-    if args.test:
-        clear_confirm = input(
-            "Test mode: Do you want to clear the table before importing test data? (y/n): ")
-        if clear_confirm.lower() == 'y':
-            clear_success = clear_table(TABLE_NAME)
+        if args.blue_green:
+            # Load into a fresh version table while readers stay on the active one
+            TABLE_NAME = format_version_table_name(home_table, DATA_VERSION)
+            if not create_version_table(dynamodb_client, home_table, TABLE_NAME):
+                logger.error("Failed to create version table. Exiting.")
+                sys.exit(1)
+        elif active_pointer:
+            logger.warning(
+                f"Readers are pointed at {active_pointer['ActiveTable']['S']}; "
+                f"this import into {home_table} will not be served until the pointer changes")
+
+        # Clear the table before importing new data; a new version table starts empty
+        if args.test and not args.blue_green:
+            clear_confirm = input(
+                "Test mode: Do you want to clear the table before importing test data? (y/n): ")
+            if clear_confirm.lower() == 'y':
+                clear_success = clear_table(TABLE_NAME, preserve_pks={POINTER_PK, MANIFEST_PK})
+                if not clear_success:
+                    logger.error("Failed to clear table. Exiting.")
+                    sys.exit(1)
+        elif not args.blue_green:
+            clear_success = clear_table(TABLE_NAME, preserve_pks={POINTER_PK, MANIFEST_PK})
             if not clear_success:
                 logger.error("Failed to clear table. Exiting.")
                 sys.exit(1)
-    else:
-        clear_success = clear_table(TABLE_NAME)
-        if not clear_success:
-            logger.error("Failed to clear table. Exiting.")
-            sys.exit(1)
 
-    # Run the import
-    print("\nStarting import process...")
-    success = process_geojson(
-        GEOJSON_FILE, test_mode=args.test, test_limit=args.limit)
+        # Run the import
+        print("\nStarting import process...")
+        feature_hashes = {}
+        success = process_geojson(
+            GEOJSON_FILE, test_mode=args.test, test_limit=args.limit,
+            snapshot_path=args.snapshot, feature_hashes=feature_hashes,
+            dedupe_geometry=args.dedupe_geometry, schedule_window=args.schedule_window,
+            export_items_path=args.export_items, hilbert_order=args.hilbert_order,
+            transform_cache=transform_cache, fragment_precision=args.fragment_precision,
+            packed_geometry=not args.nested_geometry)
+        if transform_cache:
+            transform_cache.close()
+
+        # Validate the version table, then switch readers to it in one write
+        gc_thread = None
+        if success and args.blue_green:
+            success = validate_version_table(
+                dynamodb_client, TABLE_NAME, feature_hashes)
+            if success:
+                match_home_capacity(dynamodb_client, home_table, TABLE_NAME)
+                previous_table = flip_active_pointer(
+                    dynamodb_client, home_table, TABLE_NAME, DATA_VERSION,
+                    feature_hashes, active_pointer)
+                success = previous_table is not None
+            if success:
+                # Keep the previous version for rollback, delete anything older
+                gc_thread = start_garbage_collection(
+                    dynamodb_client, home_table, {TABLE_NAME, previous_table})
+            else:
+                logger.error(
+                    f"Version table {TABLE_NAME} was not activated and is left for inspection")
 
-    # Reset capacity after import if it was increased
-    if success and 'temp_write_capacity' in locals():
-        try:
-            logger.info("Restoring original table capacity")
-            update_table_capacity(5, 5)  # Back to default
-        except Exception as e:
-            logger.warning(f"Failed to restore capacity: {e}")
+        # Record what changed since the previous version; a test import is partial
+        if success and not args.test:
+            if not write_change_manifest(dynamodb_client, home_table, DATA_VERSION, feature_hashes):
+                logger.warning("Import succeeded but its change manifest was not written")
+    finally:
+        # Restore the capacity recorded before the import, even if it failed or exited
+        if planned_capacity:
+            logger.info("Restoring original table and GSI capacity")
+            _, restore_active = apply_capacity(
+                dynamodb_client, home_table, current_capacity, planned_capacity)
+            if not restore_active:
+                logger.warning("Failed to restore capacity")
+
+    if gc_thread:
+        gc_thread.join()
 
     if success:
         print("\n✅ Import completed successfully!")
@@ -0,0 +1,318 @@
+"""
+Blue/Green Versioned Table Import for the Ahupuaa Data
+
+Reloading the live table means clearing it first, so readers see a half-empty
+dataset for the whole import and the delete pass costs as much capacity as
+the writes. In blue/green mode the importer instead loads into a new table
+named <table>_v<DATA_VERSION>, created on-demand with the live table's key
+schema and GSIs so it loads at full speed. It then validates the item count and
+feature hashes, and atomically flips a single pointer item in the home table
+(the one Terraform manages) that readers use to find the active table.
+
+The API resolves its table from the pointer and caches the answer for a
+minute, so instances move to the new version shortly after the flip.
+
+Superseded version tables are deleted in the background. Deleting a table
+consumes no write capacity, so nothing throttles the serving path. The
+previously active table is kept for rollback and for readers whose cached
+pointer has not expired yet.
+
+Pointer item (in the home table):
+  - POINTER#ACTIVE / POINTER  (ActiveTable, DataVersion, PreviousTable, ...)
+"""
+
+import datetime
+import hashlib
+import logging
+import threading
+
+from capacity_planner import describe_capacity, wait_for_table_active
+
+logger = logging.getLogger(__name__)
+
+POINTER_PK = 'POINTER#ACTIVE'
+POINTER_SK = 'POINTER'
+VERSION_TABLE_SEPARATOR = '_v'
+
+
+def format_version_table_name(home_table, data_version):
+    """
+    Formats the name of the table holding one import version.
+
+    Args:
+        home_table: Name of the Terraform-managed home table
+        data_version: Import version
+
+    Returns:
+        str: Version table name
+    """
+    return f"{home_table}{VERSION_TABLE_SEPARATOR}{data_version}"
+
+
+def dataset_digest(feature_hashes):
+    """
+    Combines per-feature hashes into one digest for validation.
+
+    Args:
+        feature_hashes: Dict of AhupuaaPK to FeatureHash
+
+    Returns:
+        str: Hex SHA-256 digest, independent of insertion order
+    """
+    digest = hashlib.sha256()
+    for pk in sorted(feature_hashes):
+        digest.update(f"{pk}:{feature_hashes[pk]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def create_version_table(client, home_table, version_table):
+    """
+    Creates an on-demand table with the same keys and GSIs as the home table.
+
+    Args:
+        client: boto3 DynamoDB client
+        home_table: Name of the table to copy the schema from
+        version_table: Name of the table to create
+
+    Returns:
+        bool: True if the table was created and is active
+    """
+    try:
+        source = client.describe_table(TableName=home_table)['Table']
+
+        create_kwargs = {
+            'TableName': version_table,
+            'AttributeDefinitions': source['AttributeDefinitions'],
+            'KeySchema': source['KeySchema'],
+            'BillingMode': 'PAY_PER_REQUEST',
+            'Tags': [{'Key': 'DataVersionOf', 'Value': home_table}]
+        }
+        if source.get('GlobalSecondaryIndexes'):
+            create_kwargs['GlobalSecondaryIndexes'] = [
+                {
+                    'IndexName': index['IndexName'],
+                    'KeySchema': index['KeySchema'],
+                    'Projection': index['Projection']
+                }
+                for index in source['GlobalSecondaryIndexes']
+            ]
+
+        logger.info(f"Creating version table {version_table}...")
+        client.create_table(**create_kwargs)
+        return wait_for_table_active(client, version_table)
+
+    except Exception as e:
+        logger.error(f"Failed to create version table {version_table}: {e}")
+        return False
+
+
+def match_home_capacity(client, home_table, version_table):
+    """
+    Switches a loaded version table to the home table's provisioned capacity,
+    so serving cost matches what Terraform configured.
+
+    Args:
+        client: boto3 DynamoDB client
+        home_table: Name of the home table
+        version_table: Name of the version table
+
+    Returns:
+        bool: True if the capacity matches (or the home table is on-demand)
+    """
+    home_capacity = describe_capacity(
+        client.describe_table(TableName=home_table)['Table'])
+    if home_capacity is None:
+        return True
+
+    try:
+        client.update_table(
+            TableName=version_table,
+            BillingMode='PROVISIONED',
+            ProvisionedThroughput=home_capacity['Table'],
+            GlobalSecondaryIndexUpdates=[
+                {'Update': {'IndexName': name, 'ProvisionedThroughput': units}}
+                for name, units in home_capacity['Indexes'].items()
+            ]
+        )
+        return wait_for_table_active(client, version_table)
+    except Exception as e:
+        logger.warning(
+            f"Could not switch {version_table} to provisioned capacity: {e}")
+        return False
+
+
+def validate_version_table(client, version_table, feature_hashes):
+    """
+    Checks that a version table holds exactly the imported features.
+
+    Args:
+        client: boto3 DynamoDB client
+        version_table: Name of the version table
+        feature_hashes: Dict of AhupuaaPK to FeatureHash recorded during the import
+
+    Returns:
+        bool: True if the feature count and combined hash match
+    """
+    scan_kwargs = {
+        'TableName': version_table,
+        'ProjectionExpression': '#pk, #metadata.#hash',
+        # Feature items are the only items without an ItemType
+        'FilterExpression': 'attribute_not_exists(#type)',
+        'ExpressionAttributeNames': {
+            '#pk': 'AhupuaaPK',
+            '#metadata': 'Metadata',
+            '#hash': 'FeatureHash',
+            '#type': 'ItemType'
+        },
+        'ConsistentRead': True
+    }
+
+    stored_hashes = {}
+    while True:
+        response = client.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            stored_hashes[item['AhupuaaPK']['S']] = \
+                item['Metadata']['M']['FeatureHash']['S']
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    if len(stored_hashes) != len(feature_hashes):
+        logger.error(
+            f"Validation failed: {version_table} holds {len(stored_hashes)} features, "
+            f"expected {len(feature_hashes)}")
+        return False
+
+    if dataset_digest(stored_hashes) != dataset_digest(feature_hashes):
+        mismatched = [pk for pk, h in feature_hashes.items() if stored_hashes.get(pk) != h]
+        logger.error(
+            f"Validation failed: {len(mismatched)} feature hashes differ, e.g. {mismatched[:5]}")
+        return False
+
+    logger.info(
+        f"Validated {version_table}: {len(stored_hashes)} features, hashes match")
+    return True
+
+
+def read_active_pointer(client, home_table):
+    """
+    Reads the pointer naming the active version table.
+
+    Args:
+        client: boto3 DynamoDB client
+        home_table: Name of the home table
+
+    Returns:
+        dict: Pointer item in low-level attribute format, or None if never flipped
+    """
+    return client.get_item(
+        TableName=home_table,
+        Key={'AhupuaaPK': {'S': POINTER_PK}, 'HierarchySK': {'S': POINTER_SK}},
+        ConsistentRead=True
+    ).get('Item')
+
+
+def flip_active_pointer(client, home_table, version_table, data_version, feature_hashes,
+                        previous_pointer):
+    """
+    Points readers at a new version table with a single conditional put.
+
+    The put only succeeds if the pointer is unchanged since it was read at the
+    start of the import, so two overlapping imports cannot both win.
+
+    Args:
+        client: boto3 DynamoDB client
+        home_table: Name of the home table holding the pointer
+        version_table: Name of the validated version table
+        data_version: Import version of the new table
+        feature_hashes: Dict of AhupuaaPK to FeatureHash of the new version
+        previous_pointer: Pointer item read before the import, or None
+
+    Returns:
+        str: Name of the previously active table (the home table if never flipped),
+        or None if the flip failed
+    """
+    previous_table = previous_pointer['ActiveTable']['S'] if previous_pointer else home_table
+
+    item = {
+        'AhupuaaPK': {'S': POINTER_PK},
+        'HierarchySK': {'S': POINTER_SK},
+        'ItemType': {'S': 'Pointer'},
+        'ActiveTable': {'S': version_table},
+        'DataVersion': {'N': str(data_version)},
+        'PreviousTable': {'S': previous_table},
+        'FeatureCount': {'N': str(len(feature_hashes))},
+        'DatasetDigest': {'S': dataset_digest(feature_hashes)},
+        'LastUpdated': {'S': datetime.datetime.now().isoformat()}
+    }
+
+    put_kwargs = {'TableName': home_table, 'Item': item}
+    if previous_pointer:
+        put_kwargs['ConditionExpression'] = 'ActiveTable = :previous'
+        put_kwargs['ExpressionAttributeValues'] = {':previous': {'S': previous_table}}
+    else:
+        put_kwargs['ConditionExpression'] = 'attribute_not_exists(AhupuaaPK)'
+
+    try:
+        client.put_item(**put_kwargs)
+    except client.exceptions.ConditionalCheckFailedException:
+        logger.error(
+            "Active pointer changed during the import; not flipping to "
+            f"{version_table}")
+        return None
+
+    logger.info(f"Active table switched from {previous_table} to {version_table}")
+    return previous_table
+
+
+def garbage_collect_versions(client, home_table, keep_tables):
+    """
+    Deletes version tables of the home table that are no longer needed.
+
+    Args:
+        client: boto3 DynamoDB client
+        home_table: Name of the home table (never deleted)
+        keep_tables: Names of version tables to keep (active and rollback)
+
+    Returns:
+        list: Names of the tables that were deleted
+    """
+    prefix = f"{home_table}{VERSION_TABLE_SEPARATOR}"
+    deleted = []
+
+    paginator = client.get_paginator('list_tables')
+    for page in paginator.paginate():
+        for table_name in page['TableNames']:
+            suffix = table_name[len(prefix):]
+            if not table_name.startswith(prefix) or not suffix.isdigit():
+                continue
+            if table_name in keep_tables:
+                continue
+            try:
+                client.delete_table(TableName=table_name)
+                deleted.append(table_name)
+                logger.info(f"Deleted superseded version table {table_name}")
+            except Exception as e:
+                logger.warning(f"Failed to delete version table {table_name}: {e}")
+
+    return deleted
+
+
+def start_garbage_collection(client, home_table, keep_tables):
+    """
+    Runs garbage_collect_versions on a background thread.
+
+    Args:
+        client: boto3 DynamoDB client
+        home_table: Name of the home table
+        keep_tables: Names of version tables to keep
+
+    Returns:
+        threading.Thread: The started thread; join it before exiting
+    """
+    thread = threading.Thread(
+        target=garbage_collect_versions,
+        args=(client, home_table, set(keep_tables)),
+        name='version-gc')
+    thread.start()
+    return thread
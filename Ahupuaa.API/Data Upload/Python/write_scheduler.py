@@ -0,0 +1,164 @@
+"""
+GSI-Aware Write Scheduling for the Ahupuaa Import
+
+Features arrive in file order, grouped by island and district, so consecutive
+BatchWriteItem calls all land on the same MokupuniIndex and MokuIndex
+partition keys and the same GeohashPrefix. The GSIs then throttle long before
+the base table does. The scheduler buffers a window of built items and fills
+each batch greedily from it. Every slot goes to the group of items that shares
+the fewest GSI hash keys with what the batch already holds. Ties go to the
+largest group, so the heaviest district drains steadily instead of piling up
+at the end.
+
+ZoomLevel is the same for every feature item today, so ZoomLevelIndex cannot
+be spread and is only reported. AhupuaaName and Geohash are close to unique
+per item and spread on their own.
+"""
+
+import logging
+from collections import Counter, deque
+
+from capacity_planner import DEFAULT_INDEX_DEFINITIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_ITEMS = 1000  # Items buffered before the first batch is chosen
+DEFAULT_BATCH_ITEMS = 25  # DynamoDB BatchWriteItem limit
+# Low-cardinality GSI hash keys that file order clusters together
+SPREAD_ATTRIBUTES = ['MokupuniName', 'MokuName', 'GeohashPrefix']
+
+
+def _key_value(item, name):
+    value = item.get(name)
+    if not value:
+        return None
+    return value.get('S', value.get('N'))
+
+
+class WriteScheduler:
+    """
+    Reorders items within a window so each batch spreads across GSI partitions.
+    """
+
+    def __init__(self, window_items=DEFAULT_WINDOW_ITEMS, batch_items=DEFAULT_BATCH_ITEMS,
+                 spread_attributes=None, index_definitions=None):
+        self.window_items = max(window_items, batch_items)
+        self.batch_items = batch_items
+        self.spread_attributes = spread_attributes or SPREAD_ATTRIBUTES
+        self.index_keys = {
+            name: index['HashKey']
+            for name, index in (index_definitions or DEFAULT_INDEX_DEFINITIONS).items()
+        }
+
+        self.groups = {}
+        self.buffered = 0
+        self.ready = []
+
+        # Per-index distribution of the batches as scheduled and in arrival order
+        self.arrival_batch = []
+        self.stats = {
+            order: {name: {'Batches': 0, 'DistinctKeys': 0, 'HottestKey': 0}
+                    for name in self.index_keys}
+            for order in ('Arrival', 'Scheduled')
+        }
+
+    def add(self, item):
+        """
+        Buffers an item, choosing batches once the window is full.
+
+        Args:
+            item: DynamoDB item in low-level attribute format
+        """
+        group = tuple(_key_value(item, name) for name in self.spread_attributes)
+        self.groups.setdefault(group, deque()).append(item)
+        self.buffered += 1
+
+        self.arrival_batch.append(item)
+        if len(self.arrival_batch) >= self.batch_items:
+            self._record('Arrival', self.arrival_batch)
+            self.arrival_batch = []
+
+        while self.buffered >= self.window_items:
+            self.ready.append(self._next_batch())
+
+    def pop_ready(self):
+        """
+        Returns the batches chosen so far and clears them.
+
+        Returns:
+            list: Batches, each a list of up to batch_items items
+        """
+        batches = self.ready
+        self.ready = []
+        return batches
+
+    def flush(self):
+        """
+        Chooses batches for every buffered item.
+
+        Returns:
+            list: The remaining batches, including any not yet popped
+        """
+        if self.arrival_batch:
+            self._record('Arrival', self.arrival_batch)
+            self.arrival_batch = []
+        while self.buffered:
+            self.ready.append(self._next_batch())
+        return self.pop_ready()
+
+    def _next_batch(self):
+        batch = []
+        used = [Counter() for _ in self.spread_attributes]
+
+        while len(batch) < self.batch_items and self.buffered:
+            best_group = None
+            best_rank = None
+            for group, items in self.groups.items():
+                collisions = sum(used[i][value] for i, value in enumerate(group)
+                                 if value is not None)
+                rank = (collisions, -len(items))
+                if best_rank is None or rank < best_rank:
+                    best_group, best_rank = group, rank
+
+            items = self.groups[best_group]
+            batch.append(items.popleft())
+            if not items:
+                del self.groups[best_group]
+            self.buffered -= 1
+            for i, value in enumerate(best_group):
+                if value is not None:
+                    used[i][value] += 1
+
+        self._record('Scheduled', batch)
+        return batch
+
+    def _record(self, order, batch):
+        for name, hash_key in self.index_keys.items():
+            keys = Counter(v for v in (_key_value(item, hash_key) for item in batch)
+                           if v is not None)
+            if not keys:
+                continue
+            stats = self.stats[order][name]
+            stats['Batches'] += 1
+            stats['DistinctKeys'] += len(keys)
+            stats['HottestKey'] += max(keys.values())
+
+        if order == 'Scheduled' and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"Batch of {len(batch)} items: " + ", ".join(
+                    f"{hash_key} {len(set(_key_value(i, hash_key) for i in batch) - {None})} keys"
+                    for hash_key in self.spread_attributes))
+
+    def log_summary(self):
+        """Logs the average GSI key distribution per batch before and after scheduling"""
+        for name, hash_key in self.index_keys.items():
+            arrival = self.stats['Arrival'][name]
+            scheduled = self.stats['Scheduled'][name]
+            if not arrival['Batches'] or not scheduled['Batches']:
+                continue
+            logger.info(
+                f"GSI {name} ({hash_key}) per batch: "
+                f"{arrival['DistinctKeys'] / arrival['Batches']:.1f} -> "
+                f"{scheduled['DistinctKeys'] / scheduled['Batches']:.1f} distinct keys, "
+                f"hottest key {arrival['HottestKey'] / arrival['Batches']:.1f} -> "
+                f"{scheduled['HottestKey'] / scheduled['Batches']:.1f} items")
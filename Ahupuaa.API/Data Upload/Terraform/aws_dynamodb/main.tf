@@ -59,6 +59,16 @@ resource "aws_dynamodb_table" "ahupuaa_gis" {
     type = "S"
   }
 
+  attribute {
+    name = "HilbertBucket"
+    type = "S"
+  }
+
+  attribute {
+    name = "HilbertIndex"
+    type = "N"
+  }
+
   global_secondary_index {
     name            = "AhupuaaIndex"
     hash_key        = "AhupuaaName"
@@ -114,6 +124,16 @@ resource "aws_dynamodb_table" "ahupuaa_gis" {
     write_capacity     = var.write_capacity
   }
 
+  global_secondary_index {
+    name               = "HilbertIndex"
+    hash_key           = "HilbertBucket"
+    range_key          = "HilbertIndex"
+    projection_type    = var.gsi_projections["HilbertIndex"].projection_type
+    non_key_attributes = var.gsi_projections["HilbertIndex"].non_key_attributes
+    read_capacity      = var.read_capacity
+    write_capacity     = var.write_capacity
+  }
+
   tags = {
     Name        = var.table_name
     Environment = var.environment
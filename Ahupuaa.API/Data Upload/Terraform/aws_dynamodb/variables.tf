@@ -77,5 +77,9 @@ variable "gsi_projections" {
       projection_type    = "INCLUDE"
       non_key_attributes = ["SimplifiedBoundaries", "AhupuaaName", "MokupuniName", "MokuName"]
     }
+    HilbertIndex = {
+      projection_type    = "INCLUDE"
+      non_key_attributes = ["SimplifiedBoundaries", "AhupuaaName", "MokupuniName", "MokuName", "MBR", "MinZoom", "MaxZoom"]
+    }
   }
 }
\ No newline at end of file
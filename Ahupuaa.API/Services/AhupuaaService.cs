@@ -2,11 +2,14 @@
 using AWSAttributeValue = Amazon.DynamoDBv2.Model.AttributeValue;
 using Amazon.DynamoDBv2;
 using Amazon.DynamoDBv2.DataModel;
+using Amazon.DynamoDBv2.DocumentModel;
 using Amazon.DynamoDBv2.Model;
 using Microsoft.Extensions.Caching.Memory;
 using Ahupuaa.API.Models;
 using Ahupuaa.API.Utilities;
 using System.Diagnostics;
+using System.IO.Compression;
+using System.Text.Json;
 using Microsoft.AspNetCore.Mvc;
 
 namespace Ahupuaa.API.Services;
@@ -31,7 +34,16 @@ public class AhupuaaService(
 {
 
 
-    private const string TableName = "AhupuaaGIS";
+    // Terraform-managed home table; blue/green imports load versioned copies of it
+    // and point readers at the active one through a pointer item stored here
+    private const string HomeTableName = "AhupuaaGIS";
+    private const string ActivePointerPK = "POINTER#ACTIVE";
+    private const string ActivePointerSK = "POINTER";
+
+    // The importer also writes aggregate, adjacency, catalog and geometry part items
+    // into the table; ahupuaa are the only items without an ItemType
+    private const string FeatureItemFilter = "attribute_not_exists(ItemType)";
+    private const string GeometryPartItemType = "GeometryPart";
 
     /// <summary>
     /// Gets a list of all ahupuaa with their associated moku and mokupuni
@@ -41,7 +53,8 @@ public class AhupuaaService(
     /// <returns>List of ahupuaa with their hierarchical details</returns>
     public async Task<List<AhupuaaListItem>> GetAllAhupuaaAsync(string? mokupuniName = null, string? mokuName = null)
     {
-        var cacheKey = $"ahupuaa_list_{mokupuniName ?? "all"}_{mokuName ?? "all"}";
+        var tableName = await GetActiveTableNameAsync();
+        var cacheKey = $"ahupuaa_list_{tableName}_{mokupuniName ?? "all"}_{mokuName ?? "all"}";
 
         return await cache.GetOrCreateAsync(cacheKey, async entry =>
         {
@@ -49,31 +62,31 @@ public class AhupuaaService(
 
             var scanRequest = new ScanRequest
             {
-                TableName = TableName,
+                TableName = tableName,
                 ProjectionExpression = "AhupuaaPK, AhupuaaName, MokupuniName, MokuName, Centroid",
                 Select = Select.SPECIFIC_ATTRIBUTES,
                 ReturnConsumedCapacity = ReturnConsumedCapacity.TOTAL
             };
 
-            // Add filter if mokupuni or moku specified
-            if (!string.IsNullOrEmpty(mokupuniName) || !string.IsNullOrEmpty(mokuName))
-            {
-                var filterExpressions = new List<string>();
-                var expressionAttributeValues = new Dictionary<string, AWSAttributeValue>();
+            // Only return ahupuaa, plus the mokupuni or moku filter if specified
+            var filterExpressions = new List<string> { FeatureItemFilter };
+            var expressionAttributeValues = new Dictionary<string, AWSAttributeValue>();
 
-                if (!string.IsNullOrEmpty(mokupuniName))
-                {
-                    filterExpressions.Add("MokupuniName = :mokupuni");
-                    expressionAttributeValues.Add(":mokupuni", new AWSAttributeValue { S = mokupuniName });
-                }
+            if (!string.IsNullOrEmpty(mokupuniName))
+            {
+                filterExpressions.Add("MokupuniName = :mokupuni");
+                expressionAttributeValues.Add(":mokupuni", new AWSAttributeValue { S = mokupuniName });
+            }
 
-                if (!string.IsNullOrEmpty(mokuName))
-                {
-                    filterExpressions.Add("MokuName = :moku");
-                    expressionAttributeValues.Add(":moku", new AWSAttributeValue { S = mokuName });
-                }
+            if (!string.IsNullOrEmpty(mokuName))
+            {
+                filterExpressions.Add("MokuName = :moku");
+                expressionAttributeValues.Add(":moku", new AWSAttributeValue { S = mokuName });
+            }
 
-                scanRequest.FilterExpression = string.Join(" AND ", filterExpressions);
+            scanRequest.FilterExpression = string.Join(" AND ", filterExpressions);
+            if (expressionAttributeValues.Count > 0)
+            {
                 scanRequest.ExpressionAttributeValues = expressionAttributeValues;
             }
 
@@ -136,20 +149,71 @@ public class AhupuaaService(
     public async Task<AhupuaaItem?> GetAhupuaaByIdAsync(string id)
     {
         var ahupuaaPk = KeyFormatHelper.FormatAhupuaaPK(id);
+        var tableName = await GetActiveTableNameAsync();
+        var cacheKey = $"{tableName}_{ahupuaaPk}";
 
         // Try to get from cache first
-        if (cache.TryGetValue(ahupuaaPk, out AhupuaaItem? cachedItem))
+        if (cache.TryGetValue(cacheKey, out AhupuaaItem? cachedItem))
         {
             return cachedItem;
         }
 
-        // If not in cache, query DynamoDB
-        var item = await dynamoDbContext.LoadAsync<AhupuaaItem>(ahupuaaPk);
+        // If not in cache, query DynamoDB. Oversized ahupuaa are stored as a head item
+        // plus PART# items under the same partition key, so one query returns them all
+        var queryRequest = new QueryRequest
+        {
+            TableName = tableName,
+            KeyConditionExpression = "AhupuaaPK = :pk",
+            ExpressionAttributeValues = new Dictionary<string, AWSAttributeValue>
+            {
+                { ":pk", new AWSAttributeValue { S = ahupuaaPk } }
+            }
+        };
+
+        var results = new List<Dictionary<string, AWSAttributeValue>>();
+        Dictionary<string, AWSAttributeValue>? lastEvaluatedKey = null;
+
+        do
+        {
+            if (lastEvaluatedKey != null)
+            {
+                queryRequest.ExclusiveStartKey = lastEvaluatedKey;
+            }
+
+            var response = await dynamoDbClient.QueryAsync(queryRequest);
+            results.AddRange(response.Items);
+            lastEvaluatedKey = response.LastEvaluatedKey;
+        }
+        while (lastEvaluatedKey != null && lastEvaluatedKey.Count > 0);
+
+        var head = results.FirstOrDefault(i => !i.ContainsKey("ItemType"));
+        if (head == null)
+        {
+            return null;
+        }
+
+        if (head.TryGetValue("GeometryPartCount", out var partCountValue))
+        {
+            var parts = results
+                .Where(i => i.TryGetValue("ItemType", out var type) && type.S == GeometryPartItemType)
+                .OrderBy(i => i["HierarchySK"].S, StringComparer.Ordinal)
+                .ToList();
+
+            if (parts.Count != int.Parse(partCountValue.N))
+            {
+                logger.LogError($"Missing geometry parts for {ahupuaaPk}: found {parts.Count} of {partCountValue.N}");
+                return null;
+            }
+
+            head = GetReassembledItem(head, parts);
+        }
+
+        var item = dynamoDbContext.FromDocument<AhupuaaItem>(Document.FromAttributeMap(head));
 
         // Cache the result with jitter to prevent cache stampedes
         if (item != null)
         {
-            cache.Set(ahupuaaPk, item, GetCacheExpiration(TimeSpan.FromHours(1)));
+            cache.Set(cacheKey, item, GetCacheExpiration(TimeSpan.FromHours(1)));
         }
 
         return item;
@@ -160,20 +224,37 @@ public class AhupuaaService(
     /// </summary>
     public async Task<List<string?>?> GetIslandsAsync()
     {
-        return await cache.GetOrCreateAsync("islands", async entry =>
+        var tableName = await GetActiveTableNameAsync();
+
+        return await cache.GetOrCreateAsync($"islands_{tableName}", async entry =>
         {
             entry.SetAbsoluteExpiration(GetCacheExpiration(TimeSpan.FromDays(1)));
 
             var scanRequest = new ScanRequest
             {
-                TableName = TableName,
+                TableName = tableName,
                 ProjectionExpression = "MokupuniName",
+                FilterExpression = FeatureItemFilter,
                 Select = Select.SPECIFIC_ATTRIBUTES
             };
 
-            var result = await dynamoDbClient.ScanAsync(scanRequest);
+            var results = new List<Dictionary<string, AWSAttributeValue>>();
+            Dictionary<string, AWSAttributeValue>? lastEvaluatedKey = null;
+
+            do
+            {
+                if (lastEvaluatedKey != null)
+                {
+                    scanRequest.ExclusiveStartKey = lastEvaluatedKey;
+                }
+
+                var response = await dynamoDbClient.ScanAsync(scanRequest);
+                results.AddRange(response.Items);
+                lastEvaluatedKey = response.LastEvaluatedKey;
+            }
+            while (lastEvaluatedKey != null && lastEvaluatedKey.Count > 0);
 
-            var islands = result.Items
+            var islands = results
                 .Select(item => item.TryGetValue("MokupuniName", out var value) ? value.S : null)
                 .Where(i => !string.IsNullOrEmpty(i))
                 .Distinct()
@@ -189,7 +270,8 @@ public class AhupuaaService(
     /// </summary>
     public async Task<List<string?>?> GetDistrictsByIslandAsync(string islandName)
     {
-        var cacheKey = $"districts_{islandName}";
+        var tableName = await GetActiveTableNameAsync();
+        var cacheKey = $"districts_{tableName}_{islandName}";
 
         return await cache.GetOrCreateAsync(cacheKey, async entry =>
         {
@@ -197,7 +279,7 @@ public class AhupuaaService(
 
             var queryRequest = new QueryRequest
             {
-                TableName = TableName,
+                TableName = tableName,
                 IndexName = "MokupuniIndex",
                 KeyConditionExpression = "MokupuniName = :islandName",
                 ExpressionAttributeValues = new Dictionary<string, AWSAttributeValue>
@@ -205,6 +287,7 @@ public class AhupuaaService(
                     { ":islandName", new AWSAttributeValue { S = islandName } }
                 },
                 ProjectionExpression = "MokuName",
+                FilterExpression = FeatureItemFilter,
                 Select = Select.SPECIFIC_ATTRIBUTES
             };
 
@@ -230,6 +313,7 @@ public class AhupuaaService(
         string? paginationToken = null)
     {
         var stopwatch = Stopwatch.StartNew();
+        var tableName = await GetActiveTableNameAsync();
 
         try
         {
@@ -270,7 +354,7 @@ public class AhupuaaService(
 
                     var queryRequest = new QueryRequest
                     {
-                        TableName = TableName,
+                        TableName = tableName,
                         IndexName = "GeoBoundingBoxIndex",
                         KeyConditionExpression = "GeohashPrefix = :prefix",
                         ExpressionAttributeValues = new Dictionary<string, AWSAttributeValue>
@@ -364,6 +448,7 @@ public class AhupuaaService(
         string? paginationToken = null)
     {
         var stopwatch = Stopwatch.StartNew();
+        var tableName = await GetActiveTableNameAsync();
 
         try
         {
@@ -379,7 +464,7 @@ public class AhupuaaService(
 
             var queryRequest = new QueryRequest
             {
-                TableName = TableName,
+                TableName = tableName,
                 IndexName = "ZoomLevelIndex",
                 KeyConditionExpression = "ZoomLevel = :zoomLevel",
                 ExpressionAttributeValues = new Dictionary<string, AWSAttributeValue>
@@ -468,6 +553,48 @@ public class AhupuaaService(
 
     #region Helper Methods
 
+    /// <summary>
+    /// Resolves the table to read from the active pointer in the home table, cached briefly
+    /// so a blue/green flip reaches every instance within a minute
+    /// </summary>
+    private async Task<string> GetActiveTableNameAsync()
+    {
+        var tableName = await cache.GetOrCreateAsync("active_table", async entry =>
+        {
+            entry.SetAbsoluteExpiration(TimeSpan.FromMinutes(1));
+
+            try
+            {
+                var response = await dynamoDbClient.GetItemAsync(new GetItemRequest
+                {
+                    TableName = HomeTableName,
+                    Key = new Dictionary<string, AWSAttributeValue>
+                    {
+                        { "AhupuaaPK", new AWSAttributeValue { S = ActivePointerPK } },
+                        { "HierarchySK", new AWSAttributeValue { S = ActivePointerSK } }
+                    },
+                    ProjectionExpression = "ActiveTable"
+                });
+
+                // Tables that were never loaded blue/green have no pointer and serve from the home table
+                if (response.Item != null && response.Item.TryGetValue("ActiveTable", out var activeTable) &&
+                    !string.IsNullOrEmpty(activeTable.S))
+                {
+                    return activeTable.S;
+                }
+            }
+            catch (AmazonDynamoDBException ex)
+            {
+                logger.LogWarning(ex, $"Could not read the active table pointer, reading from {HomeTableName}");
+                entry.SetAbsoluteExpiration(TimeSpan.FromSeconds(10));
+            }
+
+            return HomeTableName;
+        });
+
+        return tableName ?? HomeTableName;
+    }
+
     private (string fieldName, Func<AhupuaaItem, string?> accessor) GetDetailLevelInfo(string? detailLevel)
     {
         return detailLevel?.ToLower() switch
@@ -533,6 +660,61 @@ public class AhupuaaService(
         return item;
     }
 
+    /// <summary>
+    /// Restores the attributes the importer detached from an oversized item into
+    /// zlib-compressed JSON geometry parts (see item_chunking.py)
+    /// </summary>
+    private static Dictionary<string, AWSAttributeValue> GetReassembledItem(
+        Dictionary<string, AWSAttributeValue> head,
+        List<Dictionary<string, AWSAttributeValue>> parts)
+    {
+        using var payload = new MemoryStream();
+        foreach (var part in parts)
+        {
+            part["Data"].B.WriteTo(payload);
+        }
+        payload.Position = 0;
+
+        using var zlibStream = new ZLibStream(payload, CompressionMode.Decompress);
+        using var detached = JsonDocument.Parse(zlibStream);
+
+        var item = head
+            .Where(kv => kv.Key != "GeometryPartCount" && kv.Key != "DetachedAttributes")
+            .ToDictionary(kv => kv.Key, kv => kv.Value);
+
+        foreach (var attribute in detached.RootElement.EnumerateObject())
+        {
+            item[attribute.Name] = GetConvertFromJsonAttributeValue(attribute.Value);
+        }
+
+        return item;
+    }
+
+    /// <summary>
+    /// Converts an attribute serialized in DynamoDB JSON, e.g. {"S": "..."}, back to an AttributeValue
+    /// </summary>
+    private static AWSAttributeValue GetConvertFromJsonAttributeValue(JsonElement element)
+    {
+        var typed = element.EnumerateObject().First();
+        var value = typed.Value;
+
+        return typed.Name switch
+        {
+            "S" => new AWSAttributeValue { S = value.GetString() },
+            "N" => new AWSAttributeValue { N = value.GetString() },
+            "BOOL" => new AWSAttributeValue { BOOL = value.GetBoolean() },
+            "NULL" => new AWSAttributeValue { NULL = true },
+            "SS" => new AWSAttributeValue { SS = value.EnumerateArray().Select(v => v.GetString()!).ToList() },
+            "NS" => new AWSAttributeValue { NS = value.EnumerateArray().Select(v => v.GetString()!).ToList() },
+            "L" => new AWSAttributeValue { L = value.EnumerateArray().Select(GetConvertFromJsonAttributeValue).ToList() },
+            "M" => new AWSAttributeValue
+            {
+                M = value.EnumerateObject().ToDictionary(p => p.Name, p => GetConvertFromJsonAttributeValue(p.Value))
+            },
+            _ => throw new InvalidOperationException($"Unsupported attribute type {typed.Name} in geometry parts")
+        };
+    }
+
     /// <summary>
     /// Applies a random jitter to cache expiration to prevent cache stampedes
     /// </summary>